@@ -0,0 +1,56 @@
+"""Componentes reutilizáveis do MVP de análise dos setores da B3.
+
+O notebook exportado (mvp_puc_sprint_análise_de_dados_e_boas_práticas.py)
+continua sendo o roteiro da análise; este pacote concentra as etapas pesadas
+(coleta, ingestão, estatísticas e pré-processamento) para que possam ser
+reutilizadas e medidas fora do Colab. As etapas também rodam pela linha de
+comando (``python -m b3analise``, ver ``b3analise.cli``).
+
+Os nomes principais ficam acessíveis direto no pacote, mas os submódulos só
+são importados no primeiro acesso: ``import b3analise`` não carrega pandas,
+sklearn, matplotlib nem yfinance.
+"""
+
+import importlib
+
+
+_NOMES = {
+    "CacheMercado": "cache",
+    "getTickersInfo": "coleta",
+    "IndiceUniverso": "universo",
+    "ingerirPrecos": "ingestao",
+    "DatasetPrecos": "armazenamento",
+    "calcularEstatisticas": "estatisticas",
+    "aplicarEsquemaInfo": "esquema",
+    "ValidadorPrecos": "validacao",
+    "MotorRotulos": "rotulos",
+    "MotorIndicadores": "indicadores",
+    "RollupSetores": "agregados",
+    "RankingCrescimento": "ranking",
+    "PainelPrecos": "painel",
+    "MotorCorrelacao": "painel",
+    "PipelinePreprocessamento": "preprocessamento",
+    "exportarMatrizTreino": "preprocessamento",
+    "DivisaoTemporal": "divisao",
+    "EstagioParalelo": "paralelo",
+    "AtualizacaoIncremental": "incremental",
+    "gerarRelatorio": "relatorio",
+    "CacheAnalises": "memoizacao",
+    "GeradorSintetico": "sintetico",
+    "executarBenchmark": "benchmark",
+    "Instrumentacao": "instrumentacao"
+}
+
+__all__ = list(_NOMES)
+
+
+def __getattr__(nome):
+    if nome in _NOMES:
+        valor = getattr(importlib.import_module(f"b3analise.{_NOMES[nome]}"), nome)
+        globals()[nome] = valor
+        return valor
+    raise AttributeError(f"module 'b3analise' has no attribute '{nome}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,6 @@
+import sys
+
+from b3analise.cli import main
+
+
+sys.exit(main())
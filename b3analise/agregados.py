@@ -0,0 +1,183 @@
+"""Agregados materializados por ticker e setor em dia, mês e ano.
+
+As análises de crescimento por setor refaziam o merge completo com o
+``stock_info_df`` e formatavam 800 mil datas com ``dt.strftime('%m/%y')``
+(lento, e que ordena errado como string) antes de agrupar e calcular o
+``pct_change``. Aqui os agregados por (Ticker, período) são calculados uma vez
+com chaves inteiras de período:
+
+- ``dia``: dias desde 1970-01-01 (a coluna ``Dia`` do esquema compacto);
+- ``mes``: meses desde 1970-01 (``(ano - 1970) * 12 + mes - 1``);
+- ``ano``: o próprio ano.
+
+Os agregados por setor saem dos agregados por ticker (somas e contagens), sem
+voltar às linhas originais, e a chegada de novos pregões atualiza apenas as
+células (ticker, período) afetadas.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from b3analise.esquema import diaInteiro
+from b3analise.instrumentacao import etapa
+
+
+GRAOS = ("dia", "mes", "ano")
+COLUNAS_TICKER = ["Ticker", "periodo", "soma_close", "n", "primeiro_dia", "primeiro_close",
+                  "ultimo_dia", "ultimo_close", "volume"]
+
+
+def periodoInteiro(dias, grao):
+    # Converte dias desde 1970-01-01 na chave inteira do grão pedido
+    dias = np.asarray(dias).astype("datetime64[D]")
+    if grao == "dia":
+        return dias.astype(np.int64).astype(np.int32)
+    if grao == "mes":
+        return dias.astype("datetime64[M]").astype(np.int64).astype(np.int32)
+    if grao == "ano":
+        return (dias.astype("datetime64[Y]").astype(np.int64) + 1970).astype(np.int32)
+    raise ValueError(f"grão desconhecido: {grao}")
+
+
+def rotuloPeriodo(periodos, grao):
+    """Texto de exibição dos períodos (``%d/%m/%y``, ``%m/%y`` ou ``%Y``).
+
+    Formata apenas os períodos distintos, não as linhas da base.
+    """
+    periodos = np.asarray(periodos, dtype=np.int64)
+    unicos, posicoes = np.unique(periodos, return_inverse=True)
+    if grao == "dia":
+        textos = pd.to_datetime(unicos.astype("datetime64[D]")).strftime("%d/%m/%y")
+    elif grao == "mes":
+        textos = pd.to_datetime(unicos.astype("datetime64[M]")).strftime("%m/%y")
+    else:
+        textos = pd.Index(unicos.astype(str))
+    return np.asarray(textos, dtype=object)[posicoes]
+
+
+def _agregarLinhas(stock_price, grao):
+    # Agregado por (Ticker, período) a partir das linhas de preço
+    dias = stock_price["Dia"] if "Dia" in stock_price.columns else diaInteiro(stock_price["Date"])
+    dados = pd.DataFrame({
+        "Ticker": stock_price["Ticker"].to_numpy(),
+        "periodo": periodoInteiro(dias, grao),
+        "dia": np.asarray(dias, dtype=np.int32),
+        "close": stock_price["Close"].to_numpy(dtype=np.float64),
+        "volume": stock_price["Volume"].to_numpy(dtype=np.float64)
+    }).dropna(subset=["close"])
+    dados = dados.sort_values(["Ticker", "periodo", "dia"], kind="stable")
+    agregado = dados.groupby(["Ticker", "periodo"], observed=True, sort=True).agg(
+        soma_close=("close", "sum"),
+        n=("close", "size"),
+        primeiro_dia=("dia", "first"),
+        primeiro_close=("close", "first"),
+        ultimo_dia=("dia", "last"),
+        ultimo_close=("close", "last"),
+        volume=("volume", "sum")
+    ).reset_index()
+    return agregado[COLUNAS_TICKER]
+
+
+def _combinar(agregados):
+    """Combina agregados parciais das mesmas células (ticker, período)."""
+    dados = pd.concat(agregados, ignore_index=True)
+    chaves = ["Ticker", "periodo"]
+    grupos = dados.groupby(chaves, observed=True, sort=True)
+    combinado = grupos.agg(soma_close=("soma_close", "sum"), n=("n", "sum"), volume=("volume", "sum"))
+    primeiros = dados.loc[grupos["primeiro_dia"].idxmin(), chaves + ["primeiro_dia", "primeiro_close"]]
+    ultimos = dados.loc[grupos["ultimo_dia"].idxmax(), chaves + ["ultimo_dia", "ultimo_close"]]
+    combinado = combinado.reset_index().merge(primeiros, on=chaves).merge(ultimos, on=chaves)
+    return combinado[COLUNAS_TICKER]
+
+
+class RollupSetores:
+
+    def __init__(self, stock_info_df, graos=GRAOS):
+        self.stock_info_df = stock_info_df
+        self.graos = tuple(graos)
+        self.setores = stock_info_df[["Ticker", "Setor"]].drop_duplicates("Ticker")
+        self.tickers = {}
+        self._versao = None
+
+    def versaoDados(self):
+        """Hash do conteúdo dos agregados, calculado uma vez por construção/atualização."""
+        if self._versao is None:
+            from b3analise.memoizacao import impressaoDigital
+
+            self._versao = impressaoDigital((self.setores, self.tickers))
+        return self._versao
+
+    def construir(self, stock_price):
+        """Calcula os agregados por ticker de todos os grãos a partir das linhas."""
+        for grao in self.graos:
+            with etapa(f"agregados_{grao}", linhas_entrada=len(stock_price)) as medicao:
+                self.tickers[grao] = _agregarLinhas(stock_price, grao)
+                medicao.linhas_saida = len(self.tickers[grao])
+        self._versao = None
+        return self
+
+    def atualizar(self, novas_linhas):
+        """Incorpora novos pregões recalculando só as células afetadas."""
+        for grao in self.graos:
+            novos = _agregarLinhas(novas_linhas, grao)
+            atual = self.tickers[grao]
+            chave_novos = pd.MultiIndex.from_frame(novos[["Ticker", "periodo"]].astype({"Ticker": object}))
+            chave_atual = pd.MultiIndex.from_frame(atual[["Ticker", "periodo"]].astype({"Ticker": object}))
+            afetadas = chave_atual.isin(chave_novos)
+            combinado = _combinar([atual[afetadas], novos])
+            resultado = pd.concat([atual[~afetadas], combinado], ignore_index=True)
+            self.tickers[grao] = resultado.sort_values(["Ticker", "periodo"], ignore_index=True)
+        self._versao = None
+        return self
+
+    def porTicker(self, grao="mes", tickers=None, inicio=None, fim=None):
+        """Agregados por ticker e período, com média, primeiro e último Close."""
+        dados = self.tickers[grao]
+        if tickers is not None:
+            dados = dados[dados["Ticker"].isin(tickers)]
+        if inicio is not None:
+            dados = dados[dados["periodo"] >= periodoInteiro([diaInteiro([inicio])[0]], grao)[0]]
+        if fim is not None:
+            dados = dados[dados["periodo"] <= periodoInteiro([diaInteiro([fim])[0]], grao)[0]]
+        return dados.assign(media_close=dados["soma_close"] / dados["n"])
+
+    def porSetor(self, grao="mes"):
+        """Média do Close por setor e período e a variação percentual entre períodos.
+
+        A média é sobre todas as linhas do setor no período (soma/contagem),
+        igual ao ``groupby(['Setor', 'MonthYear'])['Close'].mean()`` do notebook.
+        """
+        dados = self.tickers[grao].merge(self.setores, on="Ticker")
+        setor = dados.groupby(["Setor", "periodo"], observed=True, sort=True).agg(
+            soma_close=("soma_close", "sum"), n=("n", "sum"), volume=("volume", "sum")
+        ).reset_index()
+        setor["Close"] = setor["soma_close"] / setor["n"]
+        setor["Valorização"] = setor.groupby("Setor", observed=True)["Close"].pct_change() * 100
+        setor["rotulo"] = rotuloPeriodo(setor["periodo"], grao)
+        return setor
+
+    def crescimentoTickers(self):
+        """Primeiro e último Close de cada ticker no histórico e o crescimento."""
+        anual = self.tickers["ano" if "ano" in self.graos else self.graos[-1]]
+        grupos = anual.groupby("Ticker", observed=True, sort=True)
+        primeiros = anual.loc[grupos["primeiro_dia"].idxmin(), ["Ticker", "primeiro_dia", "primeiro_close"]]
+        ultimos = anual.loc[grupos["ultimo_dia"].idxmax(), ["Ticker", "ultimo_dia", "ultimo_close"]]
+        crescimento = primeiros.merge(ultimos, on="Ticker").rename(columns={
+            "primeiro_close": "preco_inicio", "ultimo_close": "preco_fim"
+        })
+        crescimento["Crescimento"] = crescimento["preco_fim"] - crescimento["preco_inicio"]
+        return crescimento.set_index("Ticker")
+
+    def salvar(self, diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        for grao, dados in self.tickers.items():
+            dados.to_parquet(os.path.join(diretorio, f"tickers_{grao}.parquet"), index=False)
+
+    @classmethod
+    def carregar(cls, diretorio, stock_info_df, graos=GRAOS):
+        rollup = cls(stock_info_df, graos)
+        for grao in graos:
+            rollup.tickers[grao] = pd.read_parquet(os.path.join(diretorio, f"tickers_{grao}.parquet"))
+        return rollup
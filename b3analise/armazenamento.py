@@ -0,0 +1,181 @@
+"""Armazenamento colunar particionado do ``stock_price`` (Ticker/Ano).
+
+O ``stock_price`` é gravado como um dataset Arrow particionado no estilo hive
+(``Ticker=PETR4/Ano=2023/...``). A leitura aplica os filtros de ticker,
+setor e período diretamente nas partições e nas estatísticas dos arquivos, e
+lê apenas as colunas pedidas, de modo que uma análise que só precisa de
+``Close`` para alguns tickers não materializa as 8 colunas de 900 tickers.
+
+No formato ``ipc`` (Feather v2, sem compressão) os arquivos são mapeados em
+memória e os buffers são usados sem cópia; no formato ``parquet`` os arquivos
+também são mapeados, mas as páginas precisam ser decodificadas.
+"""
+
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+
+COLUNAS_CHAVE = ["Date", "Ticker"]
+
+
+def _tickersDosSetores(stock_info, setores):
+    info = stock_info if isinstance(stock_info, pd.DataFrame) else pd.DataFrame(stock_info)
+    return [str(ticker) for ticker in info.loc[info["Setor"].isin(setores), "Ticker"]]
+
+
+class DatasetPrecos:
+
+    def __init__(self, diretorio="dados_b3/precos", formato="parquet"):
+        self.diretorio = diretorio
+        self.formato = formato
+        self.particionamento = ds.partitioning(
+            pa.schema([("Ticker", pa.string()), ("Ano", pa.int32())]),
+            flavor="hive"
+        )
+        self._fs = pafs.LocalFileSystem(use_mmap=True)
+
+    def salvar(self, stock_price, substituir_tudo=True):
+        """Grava ``stock_price`` particionado por Ticker e ano.
+
+        Por padrão o dataset é reconstruído: o diretório é esvaziado antes, e
+        tickers que saíram do ``stock_price`` (quarentena, universo) não ficam
+        no disco. Com ``substituir_tudo=False`` só as partições dos
+        tickers/anos presentes em ``stock_price`` são substituídas e as demais
+        permanecem (usado por ``acrescentar``).
+        """
+        if "Date" not in stock_price.columns:
+            stock_price = stock_price.reset_index()
+        stock_price = stock_price.drop(columns=["index", "level_0"], errors="ignore")
+        tabela = pa.Table.from_pandas(stock_price, preserve_index=False)
+        # a partição é gravada pelo valor do ticker, não pelo código categórico
+        tabela = tabela.set_column(tabela.schema.get_field_index("Ticker"), "Ticker",
+                                   tabela["Ticker"].cast(pa.string()))
+        datas = pd.to_datetime(stock_price["Date"])
+        tabela = tabela.set_column(tabela.schema.get_field_index("Date"), "Date",
+                                   pa.array(datas, type=pa.timestamp("ns")))
+        tabela = tabela.append_column("Ano", pa.array(datas.dt.year, type=pa.int32()))
+
+        if substituir_tudo and os.path.isdir(self.diretorio):
+            shutil.rmtree(self.diretorio)
+        opcoes = None
+        if self.formato == "ipc":
+            opcoes = ds.IpcFileFormat().make_write_options(compression=None)
+        ds.write_dataset(tabela, self.diretorio, format=self.formato,
+                         partitioning=self.particionamento, file_options=opcoes,
+                         existing_data_behavior="delete_matching")
+
+    def acrescentar(self, novas_linhas):
+        """Acrescenta pregões novos regravando só as partições (Ticker, ano) afetadas.
+
+        As partições atingidas são substituídas inteiras, então as linhas já
+        gravadas nelas são lidas e juntadas às novas antes da gravação.
+        """
+        if "Date" not in novas_linhas.columns:
+            novas_linhas = novas_linhas.reset_index()
+        if not len(novas_linhas) or not os.path.isdir(self.diretorio):
+            self.salvar(novas_linhas, substituir_tudo=False)
+            return
+        tickers = novas_linhas["Ticker"].astype(str).unique().tolist()
+        anos = pd.to_datetime(novas_linhas["Date"]).dt.year.unique().tolist()
+        existentes = self.dataset().to_table(
+            filter=ds.field("Ticker").isin(tickers) & ds.field("Ano").isin(anos)
+        ).drop_columns(["Ano"]).to_pandas()
+        juntas = pd.concat([existentes.astype({"Ticker": str}), novas_linhas.astype({"Ticker": str})],
+                           ignore_index=True)
+        # um pregão baixado de novo substitui o que estava gravado
+        juntas = juntas.drop_duplicates(["Ticker", "Date"], keep="last")
+        self.salvar(juntas.sort_values(["Ticker", "Date"], ignore_index=True), substituir_tudo=False)
+
+    def ultimasDatas(self):
+        """Último pregão gravado de cada ticker (vazio se o dataset não existe)."""
+        if not os.path.isdir(self.diretorio):
+            return {}
+        tabela = self.dataset().to_table(columns=["Ticker", "Date"])
+        ultimas = tabela.group_by("Ticker").aggregate([("Date", "max")])
+        return {str(ticker): pd.Timestamp(data)
+                for ticker, data in zip(ultimas["Ticker"].to_pylist(), ultimas["Date_max"].to_pylist())}
+
+    def versaoDados(self):
+        """Versão do dataset a partir do nome, tamanho e data de cada arquivo.
+
+        Muda sempre que uma partição é gravada, sem precisar ler os dados
+        (usada como chave pelo ``CacheAnalises``).
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for raiz, diretorios, arquivos in os.walk(self.diretorio):
+            diretorios.sort()
+            for nome in sorted(arquivos):
+                caminho = os.path.join(raiz, nome)
+                estado = os.stat(caminho)
+                digest.update(f"{os.path.relpath(caminho, self.diretorio)}|{estado.st_size}|{estado.st_mtime_ns};".encode())
+        return digest.hexdigest()
+
+    def dataset(self):
+        return ds.dataset(self.diretorio, format=self.formato,
+                          partitioning=self.particionamento, filesystem=self._fs)
+
+    def filtro(self, tickers=None, inicio=None, fim=None):
+        # Monta a expressão de filtro; Ticker e Ano podam partições inteiras
+        expressao = None
+
+        def juntar(atual, nova):
+            return nova if atual is None else atual & nova
+
+        if tickers is not None:
+            expressao = juntar(expressao, ds.field("Ticker").isin(list(tickers)))
+        if inicio is not None:
+            inicio = pd.Timestamp(inicio)
+            expressao = juntar(expressao, ds.field("Ano") >= inicio.year)
+            expressao = juntar(expressao, ds.field("Date") >= pa.scalar(inicio, type=pa.timestamp("ns")))
+        if fim is not None:
+            fim = pd.Timestamp(fim)
+            expressao = juntar(expressao, ds.field("Ano") <= fim.year)
+            expressao = juntar(expressao, ds.field("Date") <= pa.scalar(fim, type=pa.timestamp("ns")))
+        return expressao
+
+    def carregarTabela(self, colunas=None, tickers=None, setores=None, stock_info=None,
+                       inicio=None, fim=None, incluir_chaves=True):
+        """Lê o dataset como ``pyarrow.Table`` com filtros e colunas podadas.
+
+        ``setores`` exige ``stock_info`` (lista de registros ou DataFrame) para
+        resolver os tickers de cada setor.
+        """
+        if setores is not None:
+            if stock_info is None:
+                raise ValueError("stock_info é obrigatório para filtrar por setor")
+            do_setor = _tickersDosSetores(stock_info, setores)
+            if tickers is not None:
+                do_setor = set(do_setor)
+                do_setor = [ticker for ticker in tickers if ticker in do_setor]
+            tickers = do_setor
+
+        if colunas is not None:
+            colunas = list(colunas)
+            if incluir_chaves:
+                colunas = [c for c in COLUNAS_CHAVE if c not in colunas] + colunas
+
+        return self.dataset().to_table(columns=colunas,
+                                       filter=self.filtro(tickers, inicio, fim))
+
+    def carregar(self, colunas=None, **filtros):
+        # Mesmo que carregarTabela, convertendo para pandas sem duplicar os buffers
+        tabela = self.carregarTabela(colunas=colunas, **filtros)
+        if colunas is None:
+            tabela = tabela.drop_columns(["Ano"])
+        if "Ticker" in tabela.column_names:
+            # Ticker volta como categórico, no mesmo esquema da ingestão: o
+            # dicionário em ordem alfabética (como em ``normalizarTicker``), e
+            # não na ordem em que os tickers aparecem nos arquivos
+            tickers = tabela["Ticker"].combine_chunks()
+            categorias = pc.unique(tickers).sort()
+            codigos = pc.index_in(tickers, value_set=categorias).cast(pa.int32())
+            tabela = tabela.set_column(tabela.schema.get_field_index("Ticker"), "Ticker",
+                                       pa.DictionaryArray.from_arrays(codigos, categorias))
+        return tabela.to_pandas(split_blocks=True, self_destruct=True)
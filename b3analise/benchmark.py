@@ -0,0 +1,203 @@
+"""Suíte de benchmarks das etapas da análise sobre dados sintéticos.
+
+Cada escala gera a base com ``GeradorSintetico`` (sem rede) e mede as etapas
+do notebook na implementação atual do pacote:
+
+- ``ingestao_concat``: o antigo laço de ``pd.concat`` e a montagem em um passo
+  (``montarStockPrice``), sobre uma amostra de tickers;
+- ``merge_groupby_legado`` e ``merge_groupby``: ``benchmarkEsquema`` (merge com
+  o ``stock_info`` e groupbys no formato antigo e no compacto), sobre a mesma
+  amostra, com a memória de cada formato em ``memoria_esquema``;
+- ``estatisticas``: ``calcularEstatisticas`` das colunas de preço;
+- ``agregados_setor``: ``RollupSetores.construir`` (dia, mês e ano);
+- ``crescimento_top_n``: ``RankingCrescimento`` com top 20 e top 3 por setor;
+- ``rotulos``: ``MotorRotulos`` (``resultado``);
+- ``indicadores_rolling_pandas``, ``indicadores_media_desvio`` e
+  ``indicadores``: ``benchmarkIndicadores`` (``groupby().rolling()`` contra o
+  motor de indicadores), sobre a amostra da ingestão;
+- ``ajuste_scaler_encoders`` e ``codificacao``: as duas passadas do
+  ``PipelinePreprocessamento`` (a segunda montando as matrizes esparsas);
+- ``graficos``: ``gerarRelatorio`` com todas as figuras.
+
+O resultado de cada execução é gravado em JSON com a versão do código (commit
+do git, quando disponível), e ``compararBenchmarks`` aponta as etapas que
+ficaram mais lentas entre duas execuções.
+"""
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+
+from b3analise.sintetico import GeradorSintetico
+
+
+ESCALAS = {
+    "pequena": {"n_tickers": 200, "anos": 2},
+    "padrao": {"n_tickers": 900, "anos": 5},
+    "grande": {"n_tickers": 3000, "anos": 10},
+    "maxima": {"n_tickers": 10000, "anos": 20}
+}
+COLUNAS_ESTATISTICAS = ["Open", "Close", "Low", "High", "Adj Close", "Volume"]
+
+
+def versaoCodigo():
+    # Commit atual do repositório, se o pacote estiver dentro de um checkout git
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class _Cronometro:
+
+    def __init__(self):
+        self.estagios = {}
+
+    def medir(self, nome, funcao, linhas=None):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        segundos = time.perf_counter() - inicio
+        self.estagios[nome] = {"segundos": segundos}
+        if linhas:
+            self.estagios[nome]["linhas_por_segundo"] = linhas / segundos if segundos else None
+        return resultado
+
+
+def _concatLegado(frames):
+    stock_price = None
+    for ticker, price_info in frames.items():
+        price_info = price_info.copy()
+        price_info["Ticker"] = ticker
+        stock_price = price_info if stock_price is None else pd.concat([stock_price, price_info])
+    return stock_price
+
+
+def executarBenchmark(escala="padrao", seed=0, amostra_ingestao=900, tickers_por_bloco=200,
+                      max_workers=None, graficos=True, **parametros):
+    """Mede todas as etapas em uma escala (``ESCALAS``) e devolve o resultado.
+
+    ``parametros`` sobrescreve a configuração da escala (``n_tickers``,
+    ``anos``, ``n_setores``...).
+    """
+    from b3analise.agregados import RollupSetores
+    from b3analise.esquema import aplicarEsquemaInfo, benchmarkEsquema
+    from b3analise.estatisticas import calcularEstatisticas
+    from b3analise.indicadores import benchmarkIndicadores
+    from b3analise.ingestao import montarStockPrice
+    from b3analise.preprocessamento import PipelinePreprocessamento, blocosDeDataFrame
+    from b3analise.ranking import RankingCrescimento
+    from b3analise.rotulos import MotorRotulos
+
+    configuracao = {**ESCALAS[escala], **parametros}
+    cronometro = _Cronometro()
+    gerador = cronometro.medir("geracao", lambda: GeradorSintetico(seed=seed, **configuracao))
+    stock_price = cronometro.medir("geracao_precos", gerador.stockPrice)
+    linhas = len(stock_price)
+
+    stock_info_df = pd.DataFrame(gerador.stockInfo())
+    stock_info_df = aplicarEsquemaInfo(stock_info_df[stock_info_df["Setor"] != "N/A"],
+                                       stock_price["Ticker"].cat.categories)
+
+    # ingestão: o laço quadrático só é viável sobre uma amostra de tickers
+    amostra = gerador.tickers[:amostra_ingestao]
+    frames = gerador.download(amostra, gerador.datas[0], gerador.datas[-1])
+    linhas_amostra = sum(len(frame) for frame in frames.values())
+    cronometro.medir("ingestao_concat_legado", lambda: _concatLegado(frames), linhas_amostra)
+    cronometro.medir("ingestao_concat", lambda: montarStockPrice(frames), linhas_amostra)
+    del frames
+
+    # tipos compactos contra o formato antigo (strings com .SA e float64)
+    esquema = benchmarkEsquema(stock_price[stock_price["Ticker"].isin(amostra)], stock_info_df)
+    cronometro.estagios["merge_groupby_legado"] = {"segundos": esquema["segundos_antes"]}
+    cronometro.estagios["merge_groupby"] = {"segundos": esquema["segundos_depois"]}
+    memoria_esquema = {chave: valor for chave, valor in esquema.items() if chave.startswith("memoria")}
+
+    cronometro.medir("estatisticas", lambda: calcularEstatisticas(stock_price, COLUNAS_ESTATISTICAS), linhas)
+    rollup = cronometro.medir("agregados_setor", lambda: RollupSetores(stock_info_df).construir(stock_price), linhas)
+
+    def rankings():
+        ranking = RankingCrescimento(rollup)
+        ranking.top(20)
+        ranking.topPorSetor(3)
+        return ranking
+
+    ranking = cronometro.medir("crescimento_top_n", rankings)
+
+    precos = stock_price.reset_index()
+    cronometro.medir("rotulos", lambda: MotorRotulos(precos, coluna_data="Date").rotulo(), linhas)
+    del precos
+
+    indicadores = benchmarkIndicadores(stock_price[stock_price["Ticker"].isin(amostra)])
+    cronometro.estagios["indicadores_rolling_pandas"] = {"segundos": indicadores["pandas_rolling_segundos"]}
+    cronometro.estagios["indicadores_media_desvio"] = {"segundos": indicadores["motor_segundos"]}
+    cronometro.estagios["indicadores"] = {
+        "segundos": indicadores["motor_todos_indicadores_segundos"],
+        "linhas_por_segundo": indicadores["motor_todos_indicadores_linhas_por_segundo"]
+    }
+
+    pipeline = PipelinePreprocessamento(stock_info_df)
+    gerar_blocos = lambda: blocosDeDataFrame(stock_price, tickers_por_bloco)
+    cronometro.medir("ajuste_scaler_encoders", lambda: pipeline.ajustar(gerar_blocos()), linhas)
+    cronometro.medir("codificacao", lambda: sum(pipeline.matrizesBloco(bloco)[0].shape[0]
+                                                for bloco in gerar_blocos()), linhas)
+
+    if graficos:
+        from b3analise.relatorio import gerarRelatorio
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            cronometro.medir("graficos", lambda: gerarRelatorio(rollup, ranking, stock_info_df, diretorio,
+                                                                max_workers=max_workers))
+
+    return {
+        "escala": escala,
+        "parametros": {"seed": seed, **configuracao},
+        "linhas": linhas,
+        "tickers": gerador.n_tickers,
+        "estagios": cronometro.estagios,
+        "memoria_esquema": memoria_esquema,
+        "versao": versaoCodigo(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "nucleos": os.cpu_count(),
+        "data": datetime.datetime.now().isoformat(timespec="seconds")
+    }
+
+
+def salvarBenchmark(resultado, diretorio="benchmarks"):
+    """Grava o resultado em ``benchmark_<escala>_<data>.json`` e devolve o caminho."""
+    os.makedirs(diretorio, exist_ok=True)
+    carimbo = resultado["data"].replace(":", "").replace("-", "")
+    caminho = os.path.join(diretorio, f"benchmark_{resultado['escala']}_{carimbo}.json")
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    return caminho
+
+
+def compararBenchmarks(anterior, atual, tolerancia=0.1):
+    """Compara dois resultados (dicionários ou caminhos de JSON) etapa a etapa.
+
+    ``regressao`` marca as etapas que ficaram mais de ``tolerancia`` (10%)
+    mais lentas.
+    """
+    resultados = []
+    for resultado in (anterior, atual):
+        if isinstance(resultado, str):
+            with open(resultado, encoding="utf-8") as arquivo:
+                resultado = json.load(arquivo)
+        resultados.append(resultado)
+    anterior, atual = resultados
+    estagios = [nome for nome in atual["estagios"] if nome in anterior["estagios"]]
+    comparacao = pd.DataFrame({
+        "segundos_anterior": [anterior["estagios"][nome]["segundos"] for nome in estagios],
+        "segundos_atual": [atual["estagios"][nome]["segundos"] for nome in estagios]
+    }, index=pd.Index(estagios, name="Etapa"))
+    comparacao["razao"] = comparacao["segundos_atual"] / comparacao["segundos_anterior"]
+    comparacao["regressao"] = comparacao["razao"] > 1 + tolerancia
+    return comparacao
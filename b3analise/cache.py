@@ -0,0 +1,245 @@
+"""Cache local em disco para preços (OHLCV) e informações dos tickers.
+
+Os preços ficam em um arquivo Parquet por ticker, indexado por data, e um
+índice com a última data salva de cada ticker permite que a atualização baixe
+apenas os dias posteriores ao que já está em disco. Um ticker cujo download
+não trouxe linhas (deslistado, ou ainda não listado) também é anotado, com a
+janela consultada: até ``ttl_vazios`` depois da primeira tentativa sem dados
+só os dias posteriores a essa janela são pedidos de novo; passado o prazo, a
+janela inteira é consultada outra vez. As informações cadastrais
+(``stock_info``) ficam em JSON, com data de atualização por ticker; passado o
+TTL configurado, ``atualizarMetadados`` consulta o ticker de novo. Consultas
+que falham não são gravadas (o registro anterior, se houver, continua valendo).
+
+Com o cache preenchido, ``carregarPrecos`` e ``carregarMetadados`` reconstroem
+``stock_price`` e ``stock_info`` sem acessar a rede, com o que estiver em
+disco, mesmo que expirado.
+"""
+
+import json
+import os
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from b3analise.coleta import getTickersInfo
+from b3analise.esquema import SUFIXO_B3
+from b3analise.ingestao import ingerirPrecos, montarStockPrice
+from b3analise.instrumentacao import etapa
+
+
+UM_DIA = 24 * 3600
+UMA_SEMANA = 7 * UM_DIA
+
+
+class CacheMercado:
+
+    def __init__(self, diretorio="cache_b3", ttl_metadados=UMA_SEMANA, ttl_vazios=UM_DIA):
+        self.diretorio = diretorio
+        self.ttl_metadados = ttl_metadados
+        self.ttl_vazios = ttl_vazios
+        self.dir_precos = os.path.join(diretorio, "precos")
+        self.arquivo_indice = os.path.join(self.dir_precos, "_indice.json")
+        self.arquivo_vazios = os.path.join(self.dir_precos, "_vazios.json")
+        self.arquivo_metadados = os.path.join(diretorio, "metadados.json")
+        os.makedirs(self.dir_precos, exist_ok=True)
+
+    # -- utilitários ---------------------------------------------------------
+
+    def _lerJson(self, caminho):
+        if not os.path.exists(caminho):
+            return {}
+        with open(caminho, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+
+    def _gravarJson(self, caminho, conteudo):
+        # grava em arquivo temporário e renomeia para não corromper o cache
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(conteudo, arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    def _arquivoTicker(self, ticker):
+        return os.path.join(self.dir_precos, f"{ticker}.parquet")
+
+    # -- preços --------------------------------------------------------------
+
+    def ultimasDatas(self):
+        return {ticker: pd.Timestamp(data) for ticker, data in self._lerJson(self.arquivo_indice).items()}
+
+    def consultadosSemDados(self, agora=None):
+        """Último dia já consultado sem retorno de cada ticker, dentro do ``ttl_vazios``."""
+        agora = time.time() if agora is None else agora
+        return {ticker: pd.Timestamp(tentativa["ate"])
+                for ticker, tentativa in self._lerJson(self.arquivo_vazios).items()
+                if agora - tentativa["em"] <= self.ttl_vazios}
+
+    def _anotarVazios(self, tickers, ate, agora):
+        # a data da primeira tentativa é mantida enquanto vale o prazo, para
+        # que a janela inteira volte a ser consultada quando ele vencer
+        vazios = self._lerJson(self.arquivo_vazios)
+        for ticker in tickers:
+            anterior = vazios.get(ticker)
+            em = anterior["em"] if anterior is not None and agora - anterior["em"] <= self.ttl_vazios else agora
+            vazios[ticker] = {"ate": ate.strftime("%Y-%m-%d"), "em": em}
+        self._gravarJson(self.arquivo_vazios, vazios)
+
+    def salvarPrecos(self, stock_price):
+        """Grava (ou completa) os arquivos dos tickers presentes em ``stock_price``.
+
+        ``stock_price`` deve estar no formato da ingestão: índice ``Date`` e
+        coluna ``Ticker`` já sem o sufixo ``.SA``.
+        """
+        indice = self._lerJson(self.arquivo_indice)
+        vazios = self._lerJson(self.arquivo_vazios)
+        for ticker, novos in stock_price.groupby("Ticker", sort=False, observed=True):
+            vazios.pop(ticker, None)
+            novos = novos.drop(columns=["Ticker", "Dia"], errors="ignore")
+            arquivo = self._arquivoTicker(ticker)
+            if os.path.exists(arquivo):
+                existentes = pd.read_parquet(arquivo)
+                novos = pd.concat([existentes, novos])
+                novos = novos[~novos.index.duplicated(keep="last")]
+            novos = novos.sort_index()
+            novos.to_parquet(arquivo)
+            indice[ticker] = novos.index.max().strftime("%Y-%m-%d")
+        self._gravarJson(self.arquivo_indice, indice)
+        self._gravarJson(self.arquivo_vazios, vazios)
+
+    def carregarPrecos(self, tickers=None, start_date=None, end_date=None):
+        """Reconstrói stock_price a partir do disco, sem acessar a rede.
+
+        Só entram os pregões entre ``start_date`` e ``end_date`` (inclusive),
+        quando informados: o cache pode ter dias fora da janela da análise
+        (por exemplo, os da atualização diária).
+        """
+        if tickers is None:
+            tickers = list(self._lerJson(self.arquivo_indice))
+        inicio = None if start_date is None else pd.Timestamp(start_date)
+        fim = None if end_date is None else pd.Timestamp(end_date)
+        frames = {}
+        for ticker in tickers:
+            arquivo = self._arquivoTicker(ticker)
+            if os.path.exists(arquivo):
+                frame = pd.read_parquet(arquivo)
+                if inicio is not None or fim is not None:
+                    frame = frame.loc[inicio:fim]
+                frames[ticker] = frame
+        return montarStockPrice(frames)
+
+    def baixarFaltantes(self, tickers, downloader=None, start_date="2019-01-01",
+                        end_date="2024-12-31", sufixo=SUFIXO_B3, **kwargs):
+        """Baixa e grava só os dias que faltam para cada ticker.
+
+        Tickers sem cache são baixados na janela inteira; os demais a partir do
+        dia seguinte à última data salva ou, se for posterior, ao último dia
+        consultado sem dados (``consultadosSemDados``). Retorna
+        ``(novas_linhas, relatorio)``, com apenas as linhas baixadas nesta
+        chamada.
+        """
+        agora = time.time()
+        ultimas = self.ultimasDatas()
+        for ticker, ate in self.consultadosSemDados(agora).items():
+            ultimas[ticker] = max(ultimas.get(ticker, ate), ate)
+        fim = pd.Timestamp(end_date)
+
+        # agrupa os tickers pela data de início para baixar em lotes
+        grupos = defaultdict(list)
+        for ticker in tickers:
+            ultima = ultimas.get(ticker)
+            inicio = pd.Timestamp(start_date) if ultima is None else ultima + pd.Timedelta(days=1)
+            if inicio < fim:
+                grupos[inicio].append(ticker)
+
+        relatorio = {"tickers_atualizados": 0, "tickers_sem_dados": 0, "linhas_novas": 0,
+                     "segundos_download": 0.0}
+        partes = []
+        for inicio, grupo in grupos.items():
+            novos, parcial = ingerirPrecos(grupo, downloader=downloader,
+                                           start_date=inicio.strftime("%Y-%m-%d"),
+                                           end_date=end_date, sufixo=sufixo, **kwargs)
+            if len(novos):
+                with etapa("gravacao_cache", linhas_entrada=len(novos)):
+                    self.salvarPrecos(novos)
+                partes.append(novos)
+            # o dia final fica de fora: no yfinance o ``end`` é exclusivo
+            sem_dados = set(grupo) - set(novos["Ticker"].astype(str).unique())
+            if sem_dados:
+                self._anotarVazios(sorted(sem_dados), fim - pd.Timedelta(days=1), agora)
+            relatorio["tickers_sem_dados"] += len(sem_dados)
+            relatorio["tickers_atualizados"] += parcial["tickers_com_dados"]
+            relatorio["linhas_novas"] += parcial["linhas"]
+            relatorio["segundos_download"] += parcial["segundos_download"]
+
+        if len(partes) > 1:
+            # junta os lotes com categorias de Ticker unificadas
+            categorias = sorted(set().union(*(parte["Ticker"].cat.categories for parte in partes)))
+            partes = [parte.assign(Ticker=parte["Ticker"].cat.set_categories(categorias)) for parte in partes]
+        novas_linhas = pd.concat(partes) if partes else montarStockPrice({})
+        return novas_linhas, relatorio
+
+    def atualizarPrecos(self, tickers, downloader=None, start_date="2019-01-01",
+                        end_date="2024-12-31", sufixo=SUFIXO_B3, **kwargs):
+        """Baixa só os dias que faltam para cada ticker e devolve o stock_price completo.
+
+        Retorna ``(stock_price, relatorio)``.
+        """
+        _, relatorio = self.baixarFaltantes(tickers, downloader=downloader, start_date=start_date,
+                                            end_date=end_date, sufixo=sufixo, **kwargs)
+        inicio = time.perf_counter()
+        stock_price = self.carregarPrecos(tickers, start_date=start_date, end_date=end_date)
+        relatorio["segundos_leitura"] = time.perf_counter() - inicio
+        relatorio["linhas"] = len(stock_price)
+        return stock_price, relatorio
+
+    # -- informações dos tickers ---------------------------------------------
+
+    def expirados(self, tickers=None, agora=None):
+        # Tickers sem registro ou com registro mais antigo que o TTL
+        agora = time.time() if agora is None else agora
+        metadados = self._lerJson(self.arquivo_metadados)
+        if tickers is None:
+            tickers = list(metadados)
+        return [ticker for ticker in tickers
+                if ticker not in metadados or agora - metadados[ticker]["atualizado_em"] > self.ttl_metadados]
+
+    def evictarMetadados(self, agora=None):
+        """Remove do cache os registros com mais tempo que o TTL.
+
+        Só é feito quando pedido: a leitura e a atualização nunca apagam
+        registros, para que um cache antigo continue servindo offline.
+        """
+        agora = time.time() if agora is None else agora
+        metadados = self._lerJson(self.arquivo_metadados)
+        validos = {ticker: registro for ticker, registro in metadados.items()
+                   if agora - registro["atualizado_em"] <= self.ttl_metadados}
+        if len(validos) != len(metadados):
+            self._gravarJson(self.arquivo_metadados, validos)
+        return len(metadados) - len(validos)
+
+    def salvarMetadados(self, stock_info, agora=None):
+        agora = time.time() if agora is None else agora
+        metadados = self._lerJson(self.arquivo_metadados)
+        for registro in stock_info:
+            metadados[registro["Ticker"]] = {"registro": registro, "atualizado_em": agora}
+        self._gravarJson(self.arquivo_metadados, metadados)
+
+    def carregarMetadados(self, tickers=None):
+        # Retorna a lista stock_info com o que está em disco (sem aplicar o TTL)
+        metadados = self._lerJson(self.arquivo_metadados)
+        if tickers is None:
+            tickers = list(metadados)
+        return [metadados[ticker]["registro"] for ticker in tickers if ticker in metadados]
+
+    def atualizarMetadados(self, tickers, backend=None, **kwargs):
+        """Consulta apenas os tickers ausentes ou expirados e devolve ``stock_info``.
+
+        Tickers cuja consulta falhou mantêm o registro anterior (se houver) e
+        são consultados de novo na próxima chamada.
+        """
+        faltantes = self.expirados(tickers)
+        if faltantes:
+            registros = getTickersInfo(faltantes, backend=backend, fallback=False, **kwargs)
+            self.salvarMetadados([registro for registro in registros if registro is not None])
+        return self.carregarMetadados(tickers)
@@ -0,0 +1,267 @@
+"""Linha de comando com as etapas da análise.
+
+Uso::
+
+    python -m b3analise fetch build stats report features [opções]
+
+Cada etapa lê o que a anterior gravou em disco (cache em ``--cache`` e
+dataset, agregados e features em ``--dados``), então é possível rodar só as
+etapas necessárias:
+
+- ``fetch``: lista de tickers (``--tickers``/``--arquivo-tickers`` ou
+  investpy), informações cadastrais e preços para o cache; os preços só são
+  baixados para o universo que passa nos filtros de metadados (``--setores``,
+  ``--industrias``, ``--idade-minima``, ``--janela-completa``, ``--excluir``;
+  tickers sem setor sempre ficam de fora);
+- ``build``: validação, dataset particionado, ``stock_info`` e agregados;
+- ``stats``: estatísticas descritivas das colunas de preço (com
+  ``--aproximado``, lidas em lotes do dataset com ``EsbocoEstatisticas``, sem
+  carregar as colunas inteiras);
+- ``report``: figuras do relatório, sem tela;
+- ``features``: ``final_df`` (e, opcionalmente, a matriz de treino); com
+  ``--processos N`` rótulos e indicadores de cada bloco rodam em N processos;
+- ``benchmark``: suíte de benchmarks sobre dados sintéticos (``--escala``).
+
+Com ``--sintetico`` o ``fetch`` usa o ``GeradorSintetico`` no lugar do Yahoo e
+do Investing.com, para rodar todas as etapas sem rede.
+
+As dependências pesadas são importadas dentro de cada etapa: ``stats`` não
+carrega matplotlib, sklearn, yfinance nem investpy, e ``features`` não
+carrega bibliotecas de gráficos nem de rede.
+
+Ao fim de toda execução a tabela de tempo por etapa (e subetapa) vai para o
+stderr e o resumo em JSON para ``<dados>/execucao.json``; ``--perfil`` grava um
+``cProfile`` de cada etapa em ``<dados>/perfis`` e ``--memoria`` mede os bytes
+alocados com ``tracemalloc``.
+"""
+
+import argparse
+import datetime
+import os
+import sys
+
+from b3analise.instrumentacao import Instrumentacao
+
+
+def _caminhos(args):
+    return {
+        "precos": os.path.join(args.dados, "precos"),
+        "stock_info": os.path.join(args.dados, "stock_info.parquet"),
+        "quarentena": os.path.join(args.dados, "quarentena.parquet"),
+        "agregados": os.path.join(args.dados, "agregados"),
+        "estatisticas": os.path.join(args.dados, "estatisticas.csv"),
+        "relatorio": os.path.join(args.dados, "relatorio"),
+        "final_df": os.path.join(args.dados, "final_df.parquet"),
+        "pipeline": os.path.join(args.dados, "pipeline.pkl"),
+        "treino": os.path.join(args.dados, "treino"),
+        "execucao": os.path.join(args.dados, "execucao.json"),
+        "perfis": os.path.join(args.dados, "perfis")
+    }
+
+
+def _lerTickers(args):
+    if args.tickers:
+        return args.tickers
+    if args.arquivo_tickers:
+        with open(args.arquivo_tickers, encoding="utf-8") as arquivo:
+            return [linha.strip() for linha in arquivo if linha.strip()]
+    import investpy
+
+    return investpy.stocks.get_stocks(country="brazil")["symbol"].tolist()
+
+
+def _anos(inicio, fim):
+    # Duração do período em anos (o gerador sintético trabalha com 252 pregões/ano)
+    return (datetime.date.fromisoformat(fim) - datetime.date.fromisoformat(inicio)).days / 365.25
+
+
+def _lerStockInfo(args):
+    import pandas as pd
+
+    return pd.read_parquet(_caminhos(args)["stock_info"])
+
+
+def etapaFetch(args):
+    from b3analise.cache import CacheMercado
+    from b3analise.universo import IndiceUniverso
+
+    cache = CacheMercado(args.cache)
+    backend = downloader = None
+    if args.sintetico:
+        from b3analise.sintetico import GeradorSintetico
+
+        backend = downloader = GeradorSintetico(n_tickers=args.n_tickers, inicio=args.inicio,
+                                                anos=_anos(args.inicio, args.fim))
+        tickers = args.tickers or backend.tickers
+    else:
+        tickers = _lerTickers(args)
+    stock_info = cache.atualizarMetadados(tickers, backend=backend, max_workers=args.workers or 16,
+                                          max_por_segundo=None if args.sintetico else 20)
+    universo, poda = IndiceUniverso(stock_info).selecionar(
+        setores=args.setores, industrias=args.industrias, excluir=args.excluir,
+        listado_ate=args.inicio if args.janela_completa else None,
+        idade_minima_anos=args.idade_minima, data_referencia=args.fim)
+    _, relatorio = cache.baixarFaltantes(universo, downloader=downloader, start_date=args.inicio, end_date=args.fim)
+    motivos = ", ".join(f"{nome}={quantidade}" for nome, quantidade in poda.items()
+                        if nome not in ("tickers", "selecionados", "podados") and quantidade)
+    print(f"fetch: {len(stock_info)} tickers | {poda['podados']} podados ({motivos or '-'}) | "
+          f"{relatorio['tickers_atualizados']} atualizados | {relatorio['linhas_novas']} linhas novas")
+    return relatorio["linhas_novas"]
+
+
+def etapaBuild(args):
+    import pandas as pd
+
+    from b3analise.agregados import RollupSetores
+    from b3analise.armazenamento import DatasetPrecos
+    from b3analise.cache import CacheMercado
+    from b3analise.coleta import VALOR_AUSENTE
+    from b3analise.esquema import aplicarEsquemaInfo
+    from b3analise.validacao import ValidadorPrecos
+
+    caminhos = _caminhos(args)
+    os.makedirs(args.dados, exist_ok=True)
+    cache = CacheMercado(args.cache)
+    stock_info = cache.carregarMetadados()
+    stock_price = cache.carregarPrecos(start_date=args.inicio, end_date=args.fim).reset_index()
+
+    stock_price, quarentena, relatorio = ValidadorPrecos(stock_info).validar(stock_price)
+    quarentena.to_parquet(caminhos["quarentena"], index=False)
+    DatasetPrecos(caminhos["precos"]).salvar(stock_price)
+
+    stock_info_df = pd.DataFrame(stock_info)
+    stock_info_df = stock_info_df[stock_info_df["Setor"] != VALOR_AUSENTE]
+    stock_info_df = aplicarEsquemaInfo(stock_info_df, stock_price["Ticker"].cat.categories)
+    stock_info_df.to_parquet(caminhos["stock_info"], index=False)
+
+    RollupSetores(stock_info_df).construir(stock_price).salvar(caminhos["agregados"])
+    print(f"build: {len(stock_price)} linhas | {relatorio['linhas_quarentena']} em quarentena")
+    return len(stock_price)
+
+
+def etapaStats(args):
+    from b3analise.armazenamento import DatasetPrecos
+    from b3analise.estatisticas import EsbocoEstatisticas, calcularEstatisticas
+
+    caminhos = _caminhos(args)
+    colunas = args.colunas
+    dataset_precos = DatasetPrecos(caminhos["precos"])
+    if args.aproximado:
+        esboco = EsbocoEstatisticas(colunas)
+        linhas = 0
+        for lote in dataset_precos.dataset().to_batches(columns=colunas):
+            esboco.atualizar(lote.to_pandas())
+            linhas += lote.num_rows
+        estatisticas = esboco.resultado()
+    else:
+        stock_price = dataset_precos.carregar(colunas=colunas, incluir_chaves=False)
+        estatisticas = calcularEstatisticas(stock_price, colunas)
+        linhas = len(stock_price)
+    estatisticas.to_csv(caminhos["estatisticas"])
+    print(estatisticas.to_string())
+    return linhas
+
+
+def etapaReport(args):
+    from b3analise.agregados import GRAOS, RollupSetores
+    from b3analise.ranking import RankingCrescimento
+    from b3analise.relatorio import gerarRelatorio
+
+    caminhos = _caminhos(args)
+    stock_info_df = _lerStockInfo(args)
+    rollup = RollupSetores.carregar(caminhos["agregados"], stock_info_df, GRAOS)
+    resultado = gerarRelatorio(rollup, RankingCrescimento(rollup), stock_info_df,
+                               diretorio=caminhos["relatorio"], max_workers=args.workers)
+    print(f"report: {resultado['figuras']} figuras em {caminhos['relatorio']}")
+    return resultado["figuras"]
+
+
+def etapaFeatures(args):
+    from b3analise.armazenamento import DatasetPrecos
+    from b3analise.preprocessamento import PipelinePreprocessamento, blocosPorTicker, exportarMatrizTreino
+
+    caminhos = _caminhos(args)
+    dataset_precos = DatasetPrecos(caminhos["precos"])
+    gerar_blocos = lambda: blocosPorTicker(dataset_precos, tickers_por_bloco=args.tickers_por_bloco)
+    pipeline = PipelinePreprocessamento(_lerStockInfo(args), indicadores=args.indicadores or None,
+                                        processos=args.processos)
+    linhas = pipeline.executar(gerar_blocos, caminhos["final_df"])
+    pipeline.salvar(caminhos["pipeline"])
+    if args.matriz:
+        exportarMatrizTreino(pipeline, gerar_blocos, caminhos["treino"], formato=args.matriz)
+    print(f"features: {linhas} linhas em {caminhos['final_df']}")
+    return linhas
+
+
+def etapaBenchmark(args):
+    from b3analise.benchmark import executarBenchmark, salvarBenchmark
+
+    for escala in args.escala:
+        resultado = executarBenchmark(escala, max_workers=args.workers)
+        caminho = salvarBenchmark(resultado, os.path.join(args.dados, "benchmarks"))
+        print(f"benchmark {escala}: {resultado['linhas']} linhas -> {caminho}")
+        for nome, medida in resultado["estagios"].items():
+            print(f"  {nome:<24} {medida['segundos']:9.3f}s")
+
+
+ETAPAS = {
+    "fetch": etapaFetch,
+    "build": etapaBuild,
+    "stats": etapaStats,
+    "report": etapaReport,
+    "features": etapaFeatures,
+    "benchmark": etapaBenchmark
+}
+
+
+def criarParser():
+    parser = argparse.ArgumentParser(prog="python -m b3analise",
+                                     description="Etapas da análise dos setores da B3.")
+    parser.add_argument("etapas", nargs="+", choices=list(ETAPAS), help="etapas a executar, em ordem")
+    parser.add_argument("--cache", default="cache_b3", help="diretório do cache de coleta")
+    parser.add_argument("--dados", default="dados_b3", help="diretório dos dados gerados")
+    parser.add_argument("--inicio", default="2019-01-01", help="data inicial dos preços")
+    parser.add_argument("--fim", default="2024-12-31", help="data final dos preços")
+    parser.add_argument("--tickers", nargs="*", help="tickers a coletar (padrão: lista do investpy)")
+    parser.add_argument("--arquivo-tickers", help="arquivo com um ticker por linha")
+    parser.add_argument("--setores", nargs="*", help="setores do universo (padrão: todos)")
+    parser.add_argument("--industrias", nargs="*", help="indústrias do universo (padrão: todas)")
+    parser.add_argument("--excluir", nargs="*", help="tickers fora do universo")
+    parser.add_argument("--idade-minima", type=float, help="anos mínimos de listagem na data --fim")
+    parser.add_argument("--janela-completa", action="store_true",
+                        help="só tickers listados até --inicio (histórico completo na janela)")
+    parser.add_argument("--workers", type=int, default=None, help="threads/processos das etapas paralelas")
+    parser.add_argument("--colunas", nargs="*", default=["Open", "Close", "Low", "High", "Adj Close", "Volume"],
+                        help="colunas das estatísticas")
+    parser.add_argument("--aproximado", action="store_true",
+                        help="estatísticas em lotes, com mediana e moda aproximadas")
+    parser.add_argument("--indicadores", action="store_true", help="inclui os indicadores técnicos nas features")
+    parser.add_argument("--tickers-por-bloco", type=int, default=50, help="tickers por bloco do pré-processamento")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="processos de rótulos e indicadores nas features (use blocos maiores)")
+    parser.add_argument("--matriz", choices=["npz", "memmap"], help="exporta também a matriz de treino")
+    parser.add_argument("--sintetico", action="store_true", help="fetch com dados sintéticos, sem rede")
+    parser.add_argument("--n-tickers", type=int, default=900, help="tickers do fetch sintético")
+    parser.add_argument("--escala", nargs="+", default=["padrao"],
+                        choices=["pequena", "padrao", "grande", "maxima"], help="escalas do benchmark")
+    parser.add_argument("--perfil", action="store_true", help="grava um cProfile de cada etapa")
+    parser.add_argument("--memoria", action="store_true", help="mede os bytes alocados com tracemalloc")
+    return parser
+
+
+def main(argv=None):
+    args = criarParser().parse_args(argv)
+    caminhos = _caminhos(args)
+    instrumentacao = Instrumentacao(perfil=args.perfil, memoria=args.memoria,
+                                    diretorio_perfis=caminhos["perfis"])
+    try:
+        with instrumentacao.ativar():
+            for nome in args.etapas:
+                with instrumentacao.etapa(nome) as medicao:
+                    # cada etapa devolve as linhas (ou figuras) que produziu
+                    medicao.linhas_saida = ETAPAS[nome](args)
+    finally:
+        # a tabela sai mesmo quando uma etapa falha, com o que foi medido até ali
+        print(instrumentacao.tabela(), file=sys.stderr)
+        instrumentacao.salvarResumo(caminhos["execucao"])
+    return 0
@@ -0,0 +1,157 @@
+"""Coleta concorrente das informações cadastrais dos tickers.
+
+Substitui o laço serial ``for ticker in tickers: getTickerInfo(ticker)``, que
+fazia uma chamada bloqueante ao ``yf.Ticker(...).info`` por ação, por um pool
+de threads limitado, com limite de requisições por segundo e novas tentativas
+com backoff exponencial.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from b3analise.instrumentacao import etapa
+
+
+# Valores usados quando o Yahoo não retorna o campo (mesmo fallback do notebook)
+VALOR_AUSENTE = "N/A"
+
+
+def montarRegistro(ticker, info):
+    # Mesmo formato dos registros de stock_info montados no notebook
+    return {
+        "Ticker": ticker,
+        "Nome": info.get("longName", VALOR_AUSENTE),
+        "Setor": info.get("sector", VALOR_AUSENTE),
+        "Indústria": info.get("industry", VALOR_AUSENTE),
+        "Data": info.get("firstTradeDateEpochUtc", VALOR_AUSENTE)
+    }
+
+
+class YFinanceBackend:
+    """Backend padrão, consulta o Yahoo Finance através do yfinance.
+
+    Nenhuma sessão HTTP é criada aqui: sem ``session`` cada ``yf.Ticker`` usa a
+    sessão interna do próprio yfinance; uma ``session`` informada (por exemplo,
+    com proxy ou cabeçalhos próprios) é repassada a todas as consultas.
+    """
+
+    def __init__(self, sufixo=".SA", session=None):
+        import yfinance as yf
+
+        self._yf = yf
+        self.sufixo = sufixo
+        self.session = session
+
+    def info(self, ticker):
+        if self.session is None:
+            stock = self._yf.Ticker(ticker + self.sufixo)
+        else:
+            stock = self._yf.Ticker(ticker + self.sufixo, session=self.session)
+        return stock.info
+
+
+class FakeBackend:
+    """Provedor local para benchmarks, com latência e falhas injetadas."""
+
+    def __init__(self, infos=None, latencia=0.05, taxa_falha=0.0, seed=0):
+        self.infos = infos or {}
+        self.latencia = latencia
+        self.taxa_falha = taxa_falha
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chamadas = 0
+
+    def info(self, ticker):
+        with self._lock:
+            self.chamadas += 1
+            falhou = self._random.random() < self.taxa_falha
+        time.sleep(self.latencia)
+        if falhou:
+            raise ConnectionError(f"falha simulada para {ticker}")
+        return self.infos.get(ticker, {
+            "longName": f"Empresa {ticker}",
+            "sector": "Industrials",
+            "industry": "Conglomerates",
+            "firstTradeDateEpochUtc": 1262304000
+        })
+
+
+class RateLimiter:
+    """Limita a quantidade de requisições por segundo entre todas as threads."""
+
+    def __init__(self, max_por_segundo):
+        self.intervalo = 1.0 / max_por_segundo if max_por_segundo else 0.0
+        self._proximo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+def getTickerInfo(ticker, backend, limiter=None, tentativas=3, backoff=0.5, fallback=True):
+    """Faz a consulta com novas tentativas.
+
+    Se todas falharem devolve o registro com os campos "N/A" ou, com
+    ``fallback=False``, ``None`` (para quem precisa distinguir uma falha de
+    um ticker que de fato não tem setor, como o cache).
+    """
+    for tentativa in range(tentativas):
+        if limiter is not None:
+            limiter.aguardar()
+        try:
+            return montarRegistro(ticker, backend.info(ticker) or {})
+        except Exception:
+            if tentativa == tentativas - 1:
+                break
+            time.sleep(backoff * (2 ** tentativa) * (1 + random.random() / 2))
+    return montarRegistro(ticker, {}) if fallback else None
+
+
+def getTickersInfo(tickers, backend=None, max_workers=16, max_por_segundo=20,
+                   tentativas=3, backoff=0.5, fallback=True):
+    """Obtém as informações de todos os tickers de forma concorrente.
+
+    Retorna a lista de registros de ``stock_info`` na mesma ordem de
+    ``tickers``; com ``fallback=False`` os tickers cuja consulta falhou
+    ficam como ``None``.
+    """
+    if backend is None:
+        backend = YFinanceBackend()
+    limiter = RateLimiter(max_por_segundo)
+
+    def buscar(ticker):
+        return getTickerInfo(ticker, backend, limiter, tentativas, backoff, fallback)
+
+    with etapa("metadados", linhas_entrada=len(tickers)) as medicao:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            stock_info = list(executor.map(buscar, tickers))
+        medicao.linhas_saida = len(stock_info)
+    return stock_info
+
+
+def benchmarkColeta(n_tickers=200, latencia=0.05, max_workers=16,
+                    max_por_segundo=None, taxa_falha=0.0):
+    # Compara o laço serial original com a coleta concorrente no FakeBackend
+    tickers = [f"TCK{i:04d}" for i in range(n_tickers)]
+    resultados = {}
+    for nome, workers in (("serial", 1), ("concorrente", max_workers)):
+        backend = FakeBackend(latencia=latencia, taxa_falha=taxa_falha)
+        inicio = time.perf_counter()
+        getTickersInfo(tickers, backend=backend, max_workers=workers,
+                       max_por_segundo=max_por_segundo, backoff=0.01)
+        duracao = time.perf_counter() - inicio
+        resultados[nome] = {
+            "segundos": duracao,
+            "tickers_por_segundo": n_tickers / duracao,
+            "chamadas": backend.chamadas
+        }
+    return resultados
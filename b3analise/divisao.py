@@ -0,0 +1,184 @@
+"""Divisão temporal (walk-forward) de treino e teste sobre o ``final_df``.
+
+O ``final_df`` terminava como uma única tabela sem estratégia de divisão, e
+qualquer modelo treinado com uma divisão aleatória via o futuro. Aqui as
+dobras são definidas sobre o calendário de pregões:
+
+- ``expansivo``: o treino vai do início da base até o teste de cada dobra;
+- ``deslizante``: o treino tem tamanho fixo (``tamanho_treino`` pregões) e
+  anda junto com o teste;
+- ``purgado``: k dobras de teste cobrindo o calendário, com treino dos dois
+  lados do teste (validação cruzada purgada).
+
+``purga`` pregões antes do teste ficam fora do treino (o ``resultado`` de um
+dia usa o preço do dia seguinte, então o último dia do treino já olharia o
+teste) e, quando há treino depois do teste (``purgado``), ``embargo`` pregões
+após o teste também ficam de fora.
+
+A base é lida como está: linhas em blocos de tickers e ordenadas por data em
+cada bloco, como o ``PipelinePreprocessamento`` grava. Dentro de cada trecho
+com datas não decrescentes uma janela de datas é uma faixa contígua de
+linhas, então cada dobra é só um par de arrays ``(inicios, fins)`` com uma
+faixa por trecho, encontrado com ``searchsorted`` para todos os trechos de
+uma vez. ``Faixas.visoes`` devolve fatias (sem cópia) de arrays NumPy,
+memmaps, DataFrames ou tabelas do pyarrow alinhados com o ``final_df``.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+COLUNA_DATA = "Data Negociacao B3"
+MODOS = ("expansivo", "deslizante", "purgado")
+
+
+class Faixas:
+    """Conjunto de faixas ``[inicio, fim)`` de linhas."""
+
+    def __init__(self, inicios, fins):
+        self.inicios = inicios
+        self.fins = fins
+
+    def __len__(self):
+        return int((self.fins - self.inicios).sum())
+
+    def fatias(self):
+        return [slice(int(inicio), int(fim)) for inicio, fim in zip(self.inicios, self.fins)]
+
+    def visoes(self, dados):
+        """Fatias de ``dados`` sem cópia, uma por faixa."""
+        if hasattr(dados, "iloc"):
+            return [dados.iloc[fatia] for fatia in self.fatias()]
+        if hasattr(dados, "num_rows"):  # pyarrow.Table
+            return [dados.slice(int(inicio), int(fim - inicio)) for inicio, fim in zip(self.inicios, self.fins)]
+        return [dados[fatia] for fatia in self.fatias()]
+
+    def indices(self):
+        # Posições de todas as linhas (para quem precisa de um índice único)
+        tamanhos = self.fins - self.inicios
+        deslocamentos = np.repeat(self.inicios - np.cumsum(tamanhos) + tamanhos, tamanhos)
+        return np.arange(len(self), dtype=np.int64) + deslocamentos
+
+    def mascara(self, n):
+        mascara = np.zeros(n, dtype=bool)
+        for fatia in self.fatias():
+            mascara[fatia] = True
+        return mascara
+
+
+class Dobra:
+
+    def __init__(self, numero, treino, teste, periodos_treino, periodo_teste):
+        self.numero = numero
+        self.treino = treino
+        self.teste = teste
+        self.periodos_treino = periodos_treino
+        self.periodo_teste = periodo_teste
+
+    def __repr__(self):
+        treino = ", ".join(f"{inicio.date()}..{fim.date()}" for inicio, fim in self.periodos_treino)
+        teste = f"{self.periodo_teste[0].date()}..{self.periodo_teste[1].date()}"
+        return (f"Dobra({self.numero}: treino [{treino}] {len(self.treino)} linhas, "
+                f"teste [{teste}] {len(self.teste)} linhas)")
+
+
+def _dias(datas):
+    datas = np.asarray(datas)
+    if np.issubdtype(datas.dtype, np.integer):
+        return datas.astype(np.int64)  # já em dias (coluna Dia / dias.i32)
+    return pd.to_datetime(datas).to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+class DivisaoTemporal:
+
+    def __init__(self, n_dobras=5, modo="expansivo", tamanho_teste=None, tamanho_treino=None,
+                 purga=1, embargo=0):
+        """Tamanhos, ``purga`` e ``embargo`` em pregões do calendário da base.
+
+        Sem ``tamanho_teste`` o calendário é dividido em ``n_dobras + 1``
+        partes (``n_dobras`` no modo ``purgado``); sem ``tamanho_treino`` o
+        modo ``deslizante`` usa o treino da primeira dobra.
+        """
+        if modo not in MODOS:
+            raise ValueError(f"modo desconhecido: {modo}")
+        self.n_dobras = n_dobras
+        self.modo = modo
+        self.tamanho_teste = tamanho_teste
+        self.tamanho_treino = tamanho_treino
+        self.purga = purga
+        self.embargo = embargo
+
+    def intervalos(self, n_pregoes):
+        """Lista de ``(intervalos_treino, intervalo_teste)`` em posições do calendário."""
+        partes = self.n_dobras if self.modo == "purgado" else self.n_dobras + 1
+        tamanho_teste = self.tamanho_teste or n_pregoes // partes
+        if tamanho_teste <= 0 or tamanho_teste * self.n_dobras > n_pregoes:
+            raise ValueError(f"{n_pregoes} pregões não comportam {self.n_dobras} dobras de teste")
+
+        resultado = []
+        for k in range(self.n_dobras):
+            if self.modo == "purgado":
+                inicio_teste = k * tamanho_teste
+                fim_teste = n_pregoes if k == self.n_dobras - 1 else inicio_teste + tamanho_teste
+                treino = [(0, inicio_teste - self.purga), (fim_teste + self.embargo, n_pregoes)]
+            else:
+                inicio_teste = n_pregoes - (self.n_dobras - k) * tamanho_teste
+                fim_teste = inicio_teste + tamanho_teste
+                fim_treino = inicio_teste - self.purga
+                if self.modo == "deslizante":
+                    tamanho_treino = self.tamanho_treino or (n_pregoes - self.n_dobras * tamanho_teste - self.purga)
+                    treino = [(fim_treino - tamanho_treino, fim_treino)]
+                else:
+                    treino = [(0, fim_treino)]
+            treino = [(max(inicio, 0), min(fim, n_pregoes)) for inicio, fim in treino]
+            resultado.append(([(inicio, fim) for inicio, fim in treino if inicio < fim], (inicio_teste, fim_teste)))
+        return resultado
+
+    def dividir(self, datas):
+        """Gera as ``Dobra`` para as datas de cada linha da base (na ordem da base).
+
+        ``datas``: a coluna de data do ``final_df`` (ou os dias inteiros do
+        ``dias.i32`` da matriz de treino).
+        """
+        dias = _dias(datas)
+        if not len(dias):
+            return
+        # trechos com datas não decrescentes; a chave (trecho, dia) é crescente na base toda
+        trecho = np.concatenate(([0], np.cumsum(np.diff(dias) < 0)))
+        deslocamento = dias.min()
+        chave = trecho * np.int64(2 ** 32) + (dias - deslocamento)
+        base_trecho = np.arange(trecho[-1] + 1, dtype=np.int64) * np.int64(2 ** 32)
+        calendario = np.unique(dias)
+        n = len(calendario)
+
+        def posicoes(pregao):
+            # primeira linha de cada trecho com data >= calendario[pregao]
+            if pregao >= n:
+                return np.searchsorted(chave, base_trecho + np.int64(2 ** 32))
+            return np.searchsorted(chave, base_trecho + (calendario[pregao] - deslocamento))
+
+        def faixas(intervalos):
+            inicios, fins = [], []
+            for inicio, fim in intervalos:
+                a, b = posicoes(inicio), posicoes(fim)
+                validas = a < b
+                inicios.append(a[validas])
+                fins.append(b[validas])
+            if not inicios:
+                return Faixas(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+            inicios, fins = np.concatenate(inicios), np.concatenate(fins)
+            ordem = np.argsort(inicios, kind="stable")
+            return Faixas(inicios[ordem], fins[ordem])
+
+        def periodo(inicio, fim):
+            return (pd.Timestamp(calendario[inicio], unit="D"), pd.Timestamp(calendario[fim - 1], unit="D"))
+
+        for numero, (treino, teste) in enumerate(self.intervalos(n)):
+            yield Dobra(numero, faixas(treino), faixas([teste]),
+                        [periodo(inicio, fim) for inicio, fim in treino], periodo(*teste))
+
+
+def datasFinalDf(caminho, coluna=COLUNA_DATA):
+    # Lê só a coluna de data do final_df gravado em Parquet
+    return pq.read_table(caminho, columns=[coluna])[coluna].to_numpy()
@@ -0,0 +1,128 @@
+"""Esquema compacto de tipos aplicado na ingestão.
+
+``Ticker``, ``Setor``, ``Indústria`` e ``Nome`` eram strings Python em todos os
+merges e groupbys, e o sufixo ``.SA`` era removido com ``str.replace`` em 800
+mil linhas três vezes ao longo do notebook. Aqui o Ticker é normalizado uma
+única vez (sem o ``.SA``) e guardado como categórico, os campos textuais do
+``stock_info_df`` também viram categóricos, os preços passam a float32 e a data
+ganha uma chave inteira (``Dia``, dias desde 1970-01-01) para agrupamentos.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+
+SUFIXO_B3 = ".SA"
+COLUNAS_FLOAT32 = ["Open", "High", "Low", "Close", "Adj Close"]
+COLUNAS_CATEGORICAS_INFO = ["Nome", "Setor", "Indústria"]
+
+
+def removerSufixo(tickers, sufixo=SUFIXO_B3):
+    return [ticker[:-len(sufixo)] if sufixo and ticker.endswith(sufixo) else ticker for ticker in tickers]
+
+
+def normalizarTicker(serie, sufixo=SUFIXO_B3):
+    """Converte a coluna de tickers para categórica, sem o sufixo ``.SA``.
+
+    O sufixo é removido das categorias (uma vez por ticker), não das linhas, e
+    as categorias ficam em ordem alfabética para que ordenar pelo Ticker dê o
+    mesmo resultado que com strings.
+    """
+    categorica = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype("category")
+    novas = removerSufixo(categorica.cat.categories, sufixo)
+    if len(set(novas)) == len(novas):
+        categorica = categorica.cat.rename_categories(novas)
+        return categorica.cat.reorder_categories(sorted(novas))
+    # "XPTO" e "XPTO.SA" na mesma coluna: recodifica juntando as duas
+    return pd.Series(pd.Categorical(np.asarray(novas, dtype=object)[categorica.cat.codes]),
+                     index=serie.index, name=serie.name)
+
+
+def diaInteiro(datas):
+    # Dias desde 1970-01-01 em int32
+    return (pd.to_datetime(datas).to_numpy(dtype="datetime64[D]").astype(np.int64)).astype(np.int32)
+
+
+def aplicarEsquemaPrecos(stock_price, sufixo=SUFIXO_B3):
+    """Aplica o esquema compacto a um ``stock_price`` no formato antigo."""
+    stock_price = stock_price.copy()
+    stock_price["Ticker"] = normalizarTicker(stock_price["Ticker"], sufixo)
+    for coluna in COLUNAS_FLOAT32:
+        if coluna in stock_price.columns:
+            stock_price[coluna] = pd.to_numeric(stock_price[coluna], errors="coerce").astype(np.float32)
+    datas = stock_price["Date"] if "Date" in stock_price.columns else stock_price.index
+    stock_price["Dia"] = diaInteiro(datas)
+    return stock_price
+
+
+def aplicarEsquemaInfo(stock_info_df, categorias_ticker=None):
+    """Converte o ``stock_info_df`` para categóricos.
+
+    Com ``categorias_ticker`` (normalmente ``stock_price['Ticker'].cat.categories``)
+    os dois lados do merge compartilham as mesmas categorias e o merge é
+    feito pelos códigos inteiros.
+    """
+    stock_info_df = stock_info_df.copy()
+    tickers = stock_info_df["Ticker"].astype(str)
+    if categorias_ticker is not None:
+        categorias = pd.Index(categorias_ticker).union(pd.Index(tickers.unique()))
+        stock_info_df["Ticker"] = pd.Categorical(tickers, categories=categorias)
+    else:
+        stock_info_df["Ticker"] = tickers.astype("category")
+    for coluna in COLUNAS_CATEGORICAS_INFO:
+        if coluna in stock_info_df.columns:
+            stock_info_df[coluna] = stock_info_df[coluna].astype("category")
+    stock_info_df["Data"] = pd.to_numeric(stock_info_df["Data"], errors="coerce")
+    return stock_info_df
+
+
+def unificarTickers(stock_price, stock_info_df):
+    # Garante as mesmas categorias de Ticker nos dois DataFrames
+    categorias = stock_price["Ticker"].cat.categories.union(stock_info_df["Ticker"].cat.categories)
+    stock_price["Ticker"] = stock_price["Ticker"].cat.set_categories(categorias)
+    stock_info_df["Ticker"] = stock_info_df["Ticker"].cat.set_categories(categorias)
+    return stock_price, stock_info_df
+
+
+def usoMemoria(df):
+    # Memória ocupada pelo DataFrame em MB, contando o conteúdo das strings
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+
+def formatoLegado(stock_price, sufixo=SUFIXO_B3):
+    """Reconstrói o formato antigo (strings com ``.SA`` e float64), para comparação."""
+    legado = stock_price.drop(columns=["Dia"], errors="ignore").copy()
+    legado["Ticker"] = legado["Ticker"].astype(str) + sufixo
+    for coluna in COLUNAS_FLOAT32:
+        legado[coluna] = legado[coluna].astype(np.float64)
+    return legado
+
+
+def benchmarkEsquema(stock_price, stock_info_df, sufixo=SUFIXO_B3):
+    """Mede memória e tempo do merge + groupby no formato antigo e no compacto."""
+    legado = formatoLegado(stock_price, sufixo)
+    info_legado = stock_info_df.copy()
+    for coluna in ["Ticker"] + COLUNAS_CATEGORICAS_INFO:
+        info_legado[coluna] = info_legado[coluna].astype(str)
+
+    def executar(precos, info, normalizar):
+        inicio = time.perf_counter()
+        if normalizar:
+            precos = precos.assign(Ticker=precos["Ticker"].str.replace(sufixo, "", regex=False))
+        dados = precos.merge(info, on="Ticker")
+        dados.groupby("Setor", observed=True)["Close"].mean()
+        dados.groupby("Ticker", observed=True)["Close"].agg(["first", "last"])
+        return time.perf_counter() - inicio, usoMemoria(dados)
+
+    tempo_antes, memoria_dados_antes = executar(legado, info_legado, True)
+    tempo_depois, memoria_dados_depois = executar(stock_price, stock_info_df, False)
+    return {
+        "memoria_precos_antes_mb": usoMemoria(legado),
+        "memoria_precos_depois_mb": usoMemoria(stock_price),
+        "memoria_merge_antes_mb": memoria_dados_antes,
+        "memoria_merge_depois_mb": memoria_dados_depois,
+        "segundos_antes": tempo_antes,
+        "segundos_depois": tempo_depois
+    }
@@ -0,0 +1,245 @@
+"""Estatísticas descritivas de várias colunas numéricas de uma só vez.
+
+O ``calcEstatisticas`` do notebook era chamado uma vez por coluna e, em cada
+chamada, fazia passadas separadas para mínimo, máximo, mediana, moda, média,
+desvio padrão e ausentes (a moda montando um ``value_counts`` completo). Aqui
+as colunas são copiadas uma única vez para uma matriz NumPy e cada coluna é
+ordenada uma vez: mínimo, máximo, mediana e moda saem do vetor ordenado, e
+média/desvio padrão de reduções vetorizadas sobre a mesma matriz.
+
+Para dados maiores que a memória, ``EsbocoEstatisticas`` processa o dataset em
+blocos e mantém apenas resumos de tamanho fixo (amostra para os quantis e
+contadores de Misra-Gries para a moda).
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+
+NOMES_ESTATISTICAS = ["Mínimo", "Máximo", "Mediana", "Moda", "Média", "Desvio Padrão", "Ausentes"]
+
+
+def _modaOrdenada(valores):
+    # Moda de um vetor já ordenado e sem NaN; em empate vale o menor valor,
+    # igual ao df[coluna].mode().iloc[0]
+    if len(valores) == 0:
+        return np.nan
+    inicios = np.concatenate(([0], np.flatnonzero(np.diff(valores)) + 1))
+    tamanhos = np.diff(np.append(inicios, len(valores)))
+    return valores[inicios[np.argmax(tamanhos)]]
+
+
+def calcularEstatisticas(df, colunas):
+    """Calcula as estatísticas de todas as ``colunas`` de ``df`` de uma vez.
+
+    Retorna um DataFrame com uma linha por coluna e as estatísticas de
+    ``NOMES_ESTATISTICAS`` nas colunas (desvio padrão amostral, como no pandas).
+    """
+    matriz = np.column_stack([df[coluna].to_numpy(dtype=np.float64, na_value=np.nan) for coluna in colunas])
+    ausentes = np.isnan(matriz).sum(axis=0)
+    validos = len(matriz) - ausentes
+
+    # NaN vai para o fim de cada coluna na ordenação
+    ordenada = np.sort(matriz, axis=0)
+    soma = np.nansum(matriz, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = soma / validos
+        desvio = np.sqrt(np.nansum((matriz - media) ** 2, axis=0) / (validos - 1))
+
+    resultado = []
+    for j, coluna in enumerate(colunas):
+        valores = ordenada[:validos[j], j]
+        if len(valores):
+            meio = (len(valores) - 1) // 2
+            mediana = (valores[meio] + valores[len(valores) // 2]) / 2
+            minimo, maximo = valores[0], valores[-1]
+        else:
+            mediana = minimo = maximo = np.nan
+        resultado.append([minimo, maximo, mediana, _modaOrdenada(valores),
+                          media[j], desvio[j], int(ausentes[j])])
+
+    return pd.DataFrame(resultado, index=pd.Index(colunas, name="Coluna"), columns=NOMES_ESTATISTICAS)
+
+
+def calcularEstatisticasPorGrupo(df, colunas, por):
+    """Estatísticas de cada coluna por grupo (ex.: ``por='Ticker'`` ou ``'Setor'``).
+
+    Uma ordenação por (grupo, valor) por coluna; os limites de cada grupo são
+    usados diretamente, sem ``groupby`` em Python. Retorna um DataFrame com
+    índice (grupo, coluna).
+    """
+    codigos, grupos = pd.factorize(df[por], sort=True)
+    n_grupos = len(grupos)
+    tabelas = []
+    for coluna in colunas:
+        valores = df[coluna].to_numpy(dtype=np.float64, na_value=np.nan)
+        validos_linha = ~np.isnan(valores) & (codigos >= 0)
+
+        validos = np.bincount(codigos[validos_linha], minlength=n_grupos)
+        totais = np.bincount(codigos[codigos >= 0], minlength=n_grupos)
+        soma = np.bincount(codigos[validos_linha], weights=valores[validos_linha], minlength=n_grupos)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            media = soma / validos
+            desvios = (valores[validos_linha] - media[codigos[validos_linha]]) ** 2
+            desvio = np.sqrt(np.bincount(codigos[validos_linha], weights=desvios, minlength=n_grupos) / (validos - 1))
+
+        # ordena por grupo e, dentro do grupo, por valor (apenas linhas válidas)
+        v = valores[validos_linha]
+        g = codigos[validos_linha]
+        ordem = np.lexsort((v, g))
+        v, g = v[ordem], g[ordem]
+        inicio_grupo = np.concatenate(([0], np.cumsum(validos)[:-1]))
+        tem_dados = validos > 0
+        ultimo = inicio_grupo + validos - 1
+
+        minimo = np.full(n_grupos, np.nan)
+        maximo = np.full(n_grupos, np.nan)
+        mediana = np.full(n_grupos, np.nan)
+        minimo[tem_dados] = v[inicio_grupo[tem_dados]]
+        maximo[tem_dados] = v[ultimo[tem_dados]]
+        meio_baixo = inicio_grupo + (validos - 1) // 2
+        meio_alto = inicio_grupo + validos // 2
+        mediana[tem_dados] = (v[meio_baixo[tem_dados]] + v[meio_alto[tem_dados]]) / 2
+
+        # moda: sequências de valores iguais dentro do mesmo grupo
+        moda = np.full(n_grupos, np.nan)
+        if len(v):
+            quebra = np.flatnonzero((np.diff(v) != 0) | (np.diff(g) != 0)) + 1
+            inicios = np.concatenate(([0], quebra))
+            tamanhos = np.diff(np.append(inicios, len(v)))
+            grupo_seq = g[inicios]
+            # maior sequência de cada grupo, com empate para o menor valor
+            ordem_seq = np.lexsort((inicios, -tamanhos, grupo_seq))
+            primeiro = np.concatenate(([True], np.diff(grupo_seq[ordem_seq]) != 0))
+            escolhidas = ordem_seq[primeiro]
+            moda[grupo_seq[escolhidas]] = v[inicios[escolhidas]]
+
+        tabelas.append(pd.DataFrame({
+            "Mínimo": minimo, "Máximo": maximo, "Mediana": mediana, "Moda": moda,
+            "Média": media, "Desvio Padrão": desvio, "Ausentes": totais - validos
+        }, index=pd.MultiIndex.from_product([grupos, [coluna]], names=[por, "Coluna"])))
+
+    return pd.concat(tabelas).sort_index(level=0, sort_remaining=False)
+
+
+class EsbocoEstatisticas:
+    """Estatísticas aproximadas acumuladas bloco a bloco.
+
+    Mínimo, máximo, média, desvio padrão e ausentes são exatos (combinação de
+    momentos por bloco). A mediana vem de uma amostra uniforme de tamanho fixo
+    (bottom-k por chave aleatória) e a moda dos contadores de Misra-Gries
+    sobre os valores arredondados em ``casas_decimais``. Quando nenhum valor
+    aparece em mais de ``1/(k_moda + 1)`` das linhas os contadores podem
+    zerar todos (não há valor frequente o bastante para ser garantido), e a
+    moda sai da amostra.
+    """
+
+    def __init__(self, colunas, tamanho_amostra=100_000, k_moda=1_000, casas_decimais=2, seed=0):
+        self.colunas = list(colunas)
+        self.tamanho_amostra = tamanho_amostra
+        self.k_moda = k_moda
+        self.casas_decimais = casas_decimais
+        self._rng = np.random.default_rng(seed)
+        self._estado = {coluna: {
+            "n": 0, "ausentes": 0, "media": 0.0, "m2": 0.0,
+            "minimo": np.inf, "maximo": -np.inf,
+            "amostra": np.empty(0), "chaves": np.empty(0), "contadores": {}
+        } for coluna in self.colunas}
+
+    def atualizar(self, bloco):
+        for coluna in self.colunas:
+            valores = bloco[coluna].to_numpy(dtype=np.float64, na_value=np.nan)
+            estado = self._estado[coluna]
+            nulos = np.isnan(valores)
+            estado["ausentes"] += int(nulos.sum())
+            valores = valores[~nulos]
+            if len(valores) == 0:
+                continue
+
+            # média e variância combinadas (Chan et al.)
+            n_bloco = len(valores)
+            media_bloco = valores.mean()
+            m2_bloco = ((valores - media_bloco) ** 2).sum()
+            n = estado["n"] + n_bloco
+            delta = media_bloco - estado["media"]
+            estado["media"] += delta * n_bloco / n
+            estado["m2"] += m2_bloco + delta ** 2 * estado["n"] * n_bloco / n
+            estado["n"] = n
+            estado["minimo"] = min(estado["minimo"], valores.min())
+            estado["maximo"] = max(estado["maximo"], valores.max())
+
+            # amostra uniforme: mantém os valores com as menores chaves aleatórias
+            amostra = np.concatenate((estado["amostra"], valores))
+            chaves = np.concatenate((estado["chaves"], self._rng.random(n_bloco)))
+            if len(amostra) > self.tamanho_amostra:
+                manter = np.argpartition(chaves, self.tamanho_amostra)[:self.tamanho_amostra]
+                amostra, chaves = amostra[manter], chaves[manter]
+            estado["amostra"], estado["chaves"] = amostra, chaves
+
+            # Misra-Gries combinável: soma os contadores e desconta o (k+1)-ésimo
+            unicos, contagens = np.unique(np.round(valores, self.casas_decimais), return_counts=True)
+            contadores = estado["contadores"]
+            for valor, contagem in zip(unicos.tolist(), contagens.tolist()):
+                contadores[valor] = contadores.get(valor, 0) + contagem
+            if len(contadores) > self.k_moda:
+                corte = sorted(contadores.values(), reverse=True)[self.k_moda]
+                contadores = {valor: contagem - corte for valor, contagem in contadores.items() if contagem > corte}
+            estado["contadores"] = contadores
+
+    def resultado(self):
+        linhas = []
+        for coluna in self.colunas:
+            estado = self._estado[coluna]
+            if estado["n"] == 0:
+                linhas.append([np.nan] * 6 + [estado["ausentes"]])
+                continue
+            contadores = estado["contadores"]
+            if contadores:
+                maior = max(contadores.values())
+                moda = min(valor for valor, contagem in contadores.items() if contagem == maior)
+            else:
+                moda = _modaOrdenada(np.sort(np.round(estado["amostra"], self.casas_decimais)))
+            desvio = np.sqrt(estado["m2"] / (estado["n"] - 1)) if estado["n"] > 1 else np.nan
+            linhas.append([estado["minimo"], estado["maximo"], np.median(estado["amostra"]),
+                           moda, estado["media"], desvio, estado["ausentes"]])
+        return pd.DataFrame(linhas, index=pd.Index(self.colunas, name="Coluna"), columns=NOMES_ESTATISTICAS)
+
+    def quantis(self, q):
+        # Quantis aproximados a partir da amostra de cada coluna
+        return pd.DataFrame({coluna: np.quantile(self._estado[coluna]["amostra"], q)
+                             for coluna in self.colunas}, index=np.atleast_1d(q))
+
+
+def calcularEstatisticasAproximadas(blocos, colunas, **kwargs):
+    # blocos: qualquer iterável de DataFrames (ex.: lotes lidos do dataset particionado)
+    esboco = EsbocoEstatisticas(colunas, **kwargs)
+    for bloco in blocos:
+        esboco.atualizar(bloco)
+    return esboco.resultado()
+
+
+def _estatisticasPorColuna(df, coluna):
+    # Cálculo equivalente ao calcEstatisticas original, usado como referência
+    return [df[coluna].min(), df[coluna].max(), df[coluna].median(),
+            df[coluna].mode().iloc[0], df[coluna].mean(), df[coluna].std(),
+            df[coluna].isnull().sum()]
+
+
+def benchmarkEstatisticas(df, colunas, repeticoes=3):
+    # Compara as chamadas coluna a coluna do notebook com o cálculo único
+    tempos = {"original": [], "vetorizado": []}
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for coluna in colunas:
+            _estatisticasPorColuna(df, coluna)
+        tempos["original"].append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        calcularEstatisticas(df, colunas)
+        tempos["vetorizado"].append(time.perf_counter() - inicio)
+
+    melhor = {nome: min(valores) for nome, valores in tempos.items()}
+    melhor["aceleracao"] = melhor["original"] / melhor["vetorizado"]
+    return melhor
@@ -0,0 +1,220 @@
+"""Atualização diária incremental de preços, agregados e features.
+
+Incluir um novo pregão exigia rodar o script inteiro: todos os downloads, os
+merges, o novo ajuste do MinMaxScaler e dos encoders e o ``final_df``
+completo. ``AtualizacaoIncremental`` trabalha só com as linhas novas:
+
+1. ``CacheMercado.baixarFaltantes`` baixa apenas os dias posteriores à última
+   data de cada ticker no cache;
+2. as linhas novas são os pregões do cache posteriores ao último pregão de
+   cada ticker no próprio ``DatasetPrecos`` (``pendentes``): o índice do cache
+   é compartilhado e pode estar à frente do dataset, por exemplo depois de o
+   dataset ser semeado de novo a partir de uma base mais antiga;
+3. ``ValidadorPrecos.validarIncremento`` aplica as regras da validação às
+   linhas novas, com o último pregão gravado de cada ticker como contexto; as
+   reprovadas vão para a tabela de quarentena, onde substituem o que havia
+   para os mesmos (Ticker, data). Como as linhas em quarentena não entram no
+   dataset, elas voltam a ser validadas junto com as novas: um ticker listado
+   depois da base sai da quarentena quando completa o histórico mínimo;
+4. ``DatasetPrecos.acrescentar`` regrava só as partições (Ticker, ano)
+   atingidas;
+5. ``RollupSetores.atualizar`` recalcula só as células (ticker, período)
+   atingidas, de onde saem crescimento por ticker e agregados por setor;
+6. rótulos e indicadores são recalculados para as linhas novas e para o
+   último pregão anterior de cada ticker (cujo ``resultado`` passa a ter dia
+   seguinte), lendo apenas os pregões de contexto que as janelas exigem;
+7. essas linhas passam pelo scaler e pelos encoders já ajustados e são
+   gravadas como um incremento ao lado do ``final_df``.
+
+O ajuste completo (``reajustar``) só é feito quando pedido ou quando surgem
+categorias que os encoders não conhecem (um ticker, setor ou indústria novos).
+"""
+
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from b3analise.ingestao import montarStockPrice
+from b3analise.preprocessamento import blocosPorTicker
+from b3analise.validacao import ValidadorPrecos
+
+
+def pregoesContexto(pipeline):
+    """Quantos pregões anteriores as janelas do pipeline precisam enxergar."""
+    janelas = [1]
+    configuracao = pipeline.indicadores
+    if configuracao:
+        janelas += list(configuracao["janelas_media"]) + list(configuracao["lags"])
+        # volatilidade e RSI usam variações, que consomem um pregão a mais
+        janelas += [configuracao["janela_vol"] + 1, configuracao["janela_rsi"] + 1,
+                    configuracao["janela_volume"]]
+    return max(janelas)
+
+
+class AtualizacaoIncremental:
+
+    def __init__(self, cache, dataset_precos, rollup, pipeline, diretorio="dados_b3",
+                 tickers_por_bloco=50, validador=None):
+        """``pipeline`` é um ``PipelinePreprocessamento`` já ajustado.
+
+        Sem ``validador`` as linhas novas passam por um ``ValidadorPrecos``
+        com a configuração padrão e o ``stock_info_df`` do pipeline.
+        """
+        self.cache = cache
+        self.dataset_precos = dataset_precos
+        self.rollup = rollup
+        self.pipeline = pipeline
+        self.tickers_por_bloco = tickers_por_bloco
+        self.validador = validador or ValidadorPrecos(pipeline.stock_info_df)
+        self.arquivo_features = os.path.join(diretorio, "final_df.parquet")
+        self.dir_incrementos = os.path.join(diretorio, "final_df_incrementos")
+        self.dir_rollup = os.path.join(diretorio, "rollup")
+        self.arquivo_pipeline = os.path.join(diretorio, "pipeline.pkl")
+        self.arquivo_quarentena = os.path.join(diretorio, "quarentena.parquet")
+        os.makedirs(self.dir_incrementos, exist_ok=True)
+
+    def _incrementos(self):
+        return sorted(glob.glob(os.path.join(self.dir_incrementos, "incremento_*.parquet")))
+
+    def carregarContexto(self, tickers, ultimas):
+        """Linhas novas dos ``tickers`` mais os pregões de contexto das janelas."""
+        anteriores = [ultimas[ticker] for ticker in tickers if ticker in ultimas]
+        inicio = None
+        if len(anteriores) == len(tickers):
+            # pregões viram dias corridos com folga para fins de semana e feriados
+            dias = int(np.ceil(pregoesContexto(self.pipeline) * 7 / 5)) + 15
+            inicio = min(anteriores) - pd.Timedelta(days=dias)
+        return self.dataset_precos.carregar(tickers=tickers, inicio=inicio)
+
+    def pendentes(self, tickers, ultimas, start_date=None, end_date=None):
+        """Pregões do cache ainda não gravados no dataset (``ultimas`` vem do dataset)."""
+        no_cache = self.cache.ultimasDatas()
+        atrasados = [ticker for ticker in tickers
+                     if ticker in no_cache and (ticker not in ultimas or no_cache[ticker] > ultimas[ticker])]
+        if not atrasados:
+            return montarStockPrice({})
+        inicio = start_date
+        if all(ticker in ultimas for ticker in atrasados):
+            inicio = min(ultimas[ticker] for ticker in atrasados) + pd.Timedelta(days=1)
+        novas = self.cache.carregarPrecos(atrasados, start_date=inicio, end_date=end_date)
+        corte = novas["Ticker"].astype(str).map(ultimas)
+        return novas[(corte.isna() | (novas.index > corte)).to_numpy()]
+
+    def validar(self, novas, ultimas):
+        """Separa as linhas novas aprovadas e grava as reprovadas na quarentena.
+
+        Linhas já em quarentena com o mesmo (Ticker, data) de uma linha nova
+        são substituídas pelo resultado desta validação.
+        """
+        afetados = novas["Ticker"].astype(str).unique().tolist()
+        if os.path.isdir(self.dataset_precos.diretorio):
+            contexto = self.carregarContexto(afetados, ultimas)
+        else:
+            contexto = novas.iloc[:0]
+        validos, quarentena, relatorio = self.validador.validarIncremento(novas, contexto)
+        if "Date" not in quarentena.columns:
+            quarentena = quarentena.reset_index()
+        if os.path.exists(self.arquivo_quarentena):
+            anterior = pd.read_parquet(self.arquivo_quarentena)
+            colunas = novas.reset_index() if "Date" not in novas.columns else novas
+            revalidadas = pd.MultiIndex.from_arrays([colunas["Ticker"].astype(str), colunas["Date"]])
+            chaves = pd.MultiIndex.from_arrays([anterior["Ticker"].astype(str), anterior["Date"]])
+            quarentena = pd.concat([anterior[~chaves.isin(revalidadas)], quarentena], ignore_index=True)
+            quarentena.to_parquet(self.arquivo_quarentena, index=False)
+        elif len(quarentena):
+            quarentena.to_parquet(self.arquivo_quarentena, index=False)
+        return validos, relatorio
+
+    def categoriasNovas(self, stock_data):
+        # Valores que os encoders ajustados não conhecem, por coluna
+        conhecidas = dict(zip(self.pipeline.colunas_one_hot, self.pipeline.encoder.categories_))
+        conhecidas[self.pipeline.coluna_label] = self.pipeline.label_encoder.classes_
+        novas = {}
+        for coluna, categorias in conhecidas.items():
+            desconhecidas = set(stock_data[coluna].dropna().unique()) - set(categorias)
+            if desconhecidas:
+                novas[coluna] = sorted(map(str, desconhecidas))
+        return novas
+
+    def atualizarFeatures(self, stock_data, ultimas):
+        """Codifica as linhas a partir do último pregão anterior de cada ticker e grava o incremento."""
+        corte = stock_data["Ticker"].astype(str).map(ultimas)
+        manter = (corte.isna() | (stock_data["Data Negociacao B3"] >= corte)).to_numpy()
+        linhas = stock_data[manter]
+        if not len(linhas):
+            return 0
+        final_df = self.pipeline.codificarBloco(linhas)
+        # a chave do ticker fica no incremento para substituir as linhas antigas
+        final_df.insert(0, "Ticker", linhas["Ticker"].astype(str).to_numpy())
+        destino = os.path.join(self.dir_incrementos, f"incremento_{len(self._incrementos()) + 1:05d}.parquet")
+        final_df.to_parquet(destino, index=False)
+        return len(final_df)
+
+    def reajustar(self):
+        """Ajuste completo: refaz scaler, encoders e o ``final_df`` e descarta os incrementos."""
+        gerar_blocos = lambda: blocosPorTicker(self.dataset_precos, tickers_por_bloco=self.tickers_por_bloco)
+        linhas = self.pipeline.executar(gerar_blocos, self.arquivo_features)
+        for arquivo in self._incrementos():
+            os.remove(arquivo)
+        self.pipeline.salvar(self.arquivo_pipeline)
+        return linhas
+
+    def atualizar(self, tickers, downloader=None, start_date="2019-01-01", end_date="2024-12-31",
+                  reajustar=False, **kwargs):
+        """Incorpora os pregões que faltam e devolve um relatório com os tempos de cada etapa."""
+        ultimas = self.dataset_precos.ultimasDatas()
+        _, relatorio = self.cache.baixarFaltantes(tickers, downloader=downloader, start_date=start_date,
+                                                  end_date=end_date, **kwargs)
+        novas = self.pendentes(tickers, ultimas, start_date=start_date, end_date=end_date)
+        relatorio.update({"linhas_pendentes": len(novas), "linhas_features": 0, "linhas_quarentena": 0,
+                          "reajuste": False, "categorias_novas": {}})
+        if not len(novas):
+            return relatorio
+
+        inicio = time.perf_counter()
+        novas, validacao = self.validar(novas, ultimas)
+        relatorio["linhas_quarentena"] = validacao["linhas_quarentena"]
+        relatorio["segundos_validacao"] = time.perf_counter() - inicio
+        if not len(novas):
+            return relatorio
+
+        inicio = time.perf_counter()
+        self.dataset_precos.acrescentar(novas)
+        relatorio["segundos_armazenamento"] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        self.rollup.atualizar(novas)
+        self.rollup.salvar(self.dir_rollup)
+        relatorio["segundos_rollup"] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        afetados = novas["Ticker"].astype(str).unique().tolist()
+        stock_data = self.pipeline.prepararBloco(self.carregarContexto(afetados, ultimas))
+        relatorio["categorias_novas"] = self.categoriasNovas(stock_data)
+        if reajustar or relatorio["categorias_novas"]:
+            relatorio["reajuste"] = True
+            relatorio["linhas_features"] = self.reajustar()
+        else:
+            relatorio["linhas_features"] = self.atualizarFeatures(stock_data, ultimas)
+        relatorio["segundos_features"] = time.perf_counter() - inicio
+        return relatorio
+
+    def lerFeatures(self):
+        """``final_df`` completo: a base mais os incrementos, sem linhas repetidas.
+
+        Uma linha de um incremento substitui a de mesmo (Ticker, data) gravada
+        antes (por exemplo, o último pregão cujo ``resultado`` foi recalculado).
+        """
+        base = pd.read_parquet(self.arquivo_features)
+        # na base o ticker está no one-hot; recupera o nome pela coluna ativa
+        posicao = self.pipeline.colunas_one_hot.index("Ticker")
+        categorias = self.pipeline.encoder.categories_[posicao]
+        colunas = [f"Ticker_{categoria}" for categoria in categorias]
+        base.insert(0, "Ticker", np.asarray(categorias, dtype=object)[base[colunas].to_numpy().argmax(axis=1)])
+        partes = [base] + [pd.read_parquet(arquivo) for arquivo in self._incrementos()]
+        final_df = pd.concat(partes, ignore_index=True)
+        final_df = final_df.drop_duplicates(["Ticker", "Data Negociacao B3"], keep="last")
+        return final_df.sort_values(["Ticker", "Data Negociacao B3"], ignore_index=True)
@@ -0,0 +1,202 @@
+"""Ingestão em lotes dos preços diários (OHLCV) dos tickers.
+
+O notebook fazia ``stock_price = pd.concat([stock_price, price_info])`` a cada
+ticker baixado, copiando o DataFrame inteiro a cada iteração (O(n²) sobre as
+~800 mil linhas). Aqui os tickers são baixados em lotes paralelos, os quadros
+de cada ticker são guardados em uma lista e o resultado é montado uma única
+vez, preenchendo arrays colunares pré-alocados.
+"""
+
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from b3analise.esquema import COLUNAS_FLOAT32, SUFIXO_B3, diaInteiro, normalizarTicker
+from b3analise.instrumentacao import etapa
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+COLUNAS_PRECO = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+class YFinanceDownloader:
+    """Baixa um lote de tickers em uma única chamada ao ``yf.download``."""
+
+    def __init__(self, session=None):
+        import yfinance as yf
+
+        self._yf = yf
+        self.session = session
+
+    def download(self, symbols, start_date, end_date):
+        kwargs = {"session": self.session} if self.session is not None else {}
+        dados = self._yf.download(symbols, start=start_date, end=end_date,
+                                  group_by="ticker", auto_adjust=False,
+                                  threads=False, progress=False, **kwargs)
+        frames = {}
+        for symbol in symbols:
+            if isinstance(dados.columns, pd.MultiIndex):
+                if symbol not in dados.columns.get_level_values(0):
+                    continue
+                frame = dados[symbol]
+            else:
+                frame = dados
+            frame = frame.dropna(how="all")
+            if len(frame):
+                frames[symbol] = frame
+        return frames
+
+
+class FakeDownloader:
+    """Gera OHLCV sintético com latência injetada, para benchmarks."""
+
+    def __init__(self, latencia=0.0, seed=0):
+        self.latencia = latencia
+        self.seed = seed
+
+    def download(self, symbols, start_date, end_date):
+        time.sleep(self.latencia)
+        datas = pd.bdate_range(start_date, end_date, name="Date")
+        frames = {}
+        for symbol in symbols:
+            rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(datas))))
+            abertura = close * (1 + rng.normal(0, 0.005, len(datas)))
+            frames[symbol] = pd.DataFrame({
+                "Open": abertura,
+                # máxima/mínima envolvem abertura e fechamento (OHLC consistente)
+                "High": np.maximum(abertura, close) * 1.01,
+                "Low": np.minimum(abertura, close) * 0.99,
+                "Close": close,
+                "Adj Close": close,
+                "Volume": rng.integers(0, 10 ** 6, len(datas))
+            }, index=datas)
+        return frames
+
+
+def montarStockPrice(frames, sufixo=SUFIXO_B3):
+    """Monta o ``stock_price`` a partir de ``{ticker: DataFrame}`` em um passo.
+
+    Os arrays de cada coluna são alocados uma única vez com o total de linhas
+    e preenchidos por fatia, sem concatenações intermediárias. O resultado tem
+    o mesmo formato do antigo laço de ``pd.concat`` (índice ``Date`` e coluna
+    ``Ticker``), já no esquema compacto de ``b3analise.esquema``: Ticker
+    categórico sem o sufixo ``.SA``, preços em float32 e a chave ``Dia``.
+    """
+    frames = {ticker: frame for ticker, frame in frames.items() if frame is not None and len(frame)}
+    tamanhos = np.array([len(frame) for frame in frames.values()], dtype=np.int64)
+    total = int(tamanhos.sum())
+
+    datas = np.empty(total, dtype="datetime64[ns]")
+    colunas = {coluna: np.empty(total, dtype=np.float32 if coluna in COLUNAS_FLOAT32 else np.float64)
+               for coluna in COLUNAS_PRECO}
+    inicio = 0
+    for frame in frames.values():
+        fim = inicio + len(frame)
+        datas[inicio:fim] = frame.index.values
+        for coluna in COLUNAS_PRECO:
+            if coluna in frame.columns:
+                colunas[coluna][inicio:fim] = frame[coluna].to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                colunas[coluna][inicio:fim] = np.nan
+        inicio = fim
+
+    stock_price = pd.DataFrame(colunas, index=pd.DatetimeIndex(datas, name="Date"))
+    # cada ticker vira um código inteiro; as strings existem uma vez só
+    codigos = np.repeat(np.arange(len(frames), dtype=np.int32), tamanhos)
+    tickers = pd.Categorical.from_codes(codigos, categories=pd.Index(list(frames), dtype=object))
+    stock_price["Ticker"] = normalizarTicker(pd.Series(tickers), sufixo).array
+    stock_price["Dia"] = diaInteiro(datas)
+    return stock_price
+
+
+def _picoRss():
+    if resource is None:
+        return None
+    # ru_maxrss é informado em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ingerirPrecos(tickers, downloader=None, start_date="2019-01-01",
+                  end_date="2024-12-31", tamanho_lote=50, max_workers=8,
+                  sufixo=SUFIXO_B3, medir_memoria=True):
+    """Baixa os preços de ``tickers`` em lotes paralelos e monta ``stock_price``.
+
+    Retorna ``(stock_price, relatorio)``, onde o relatório traz a quantidade
+    de linhas, linhas por segundo e o pico de memória da etapa.
+    """
+    if downloader is None:
+        downloader = YFinanceDownloader()
+    symbols = [ticker + sufixo for ticker in tickers]
+    lotes = [symbols[i:i + tamanho_lote] for i in range(0, len(symbols), tamanho_lote)]
+
+    # com o tracemalloc já ligado (instrumentação com memória) o pico fica com ela
+    medir_memoria = medir_memoria and not tracemalloc.is_tracing()
+    if medir_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+
+    frames = {}
+    with etapa("download", linhas_entrada=len(symbols)) as medicao:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for resultado in executor.map(lambda lote: downloader.download(lote, start_date, end_date), lotes):
+                frames.update(resultado)
+        # mantém a ordem original dos tickers
+        frames = {symbol: frames[symbol] for symbol in symbols if symbol in frames}
+        medicao.linhas_saida = sum(len(frame) for frame in frames.values())
+    tempo_download = time.perf_counter() - inicio
+
+    with etapa("montagem", linhas_entrada=len(frames)) as medicao:
+        stock_price = montarStockPrice(frames, sufixo)
+        medicao.linhas_saida = len(stock_price)
+    duracao = time.perf_counter() - inicio
+
+    pico_alocado = None
+    if medir_memoria:
+        pico_alocado = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+    relatorio = {
+        "tickers_solicitados": len(symbols),
+        "tickers_com_dados": len(frames),
+        "linhas": len(stock_price),
+        "segundos_download": tempo_download,
+        "segundos_total": duracao,
+        "linhas_por_segundo": len(stock_price) / duracao if duracao else float("inf"),
+        "pico_alocado_mb": pico_alocado,
+        "pico_rss_mb": _picoRss()
+    }
+    return stock_price, relatorio
+
+
+def benchmarkIngestao(n_tickers=300, start_date="2019-01-01", end_date="2024-12-31"):
+    # Compara o laço original de pd.concat com a montagem em um passo
+    frames = FakeDownloader().download([f"T{i:04d}.SA" for i in range(n_tickers)], start_date, end_date)
+
+    inicio = time.perf_counter()
+    stock_price = None
+    for price_info in frames.values():
+        price_info = price_info.copy()
+        price_info["Ticker"] = "x"
+        stock_price = price_info if stock_price is None else pd.concat([stock_price, price_info])
+    tempo_concat = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    stock_price = montarStockPrice(frames)
+    tempo_lote = time.perf_counter() - inicio
+
+    return {
+        "linhas": len(stock_price),
+        "concat_segundos": tempo_concat,
+        "lote_segundos": tempo_lote,
+        "concat_linhas_por_segundo": len(stock_price) / tempo_concat,
+        "lote_linhas_por_segundo": len(stock_price) / tempo_lote
+    }
@@ -0,0 +1,241 @@
+"""Instrumentação por etapa: tempo, CPU, linhas e memória.
+
+Quando uma execução ficava lenta não havia como saber se o tempo foi para a
+rede, para o laço de concat, para o ``strftime`` das datas, para os merges ou
+para o OneHotEncoder. ``Instrumentacao`` registra, para cada etapa:
+
+- tempo de parede e tempo de CPU do processo;
+- linhas de entrada e de saída (quando a etapa informa);
+- pico de RSS do processo ao fim da etapa e a variação do RSS na etapa;
+- com ``memoria=True``, o pico de bytes alocados na etapa (``tracemalloc``);
+- com ``perfil=True``, um ``cProfile`` de cada etapa de primeiro nível, com as
+  funções mais caras no resumo e o ``.prof`` em ``diretorio_perfis``.
+
+As etapas podem ser aninhadas (o nome registrado é o caminho, por exemplo
+``features/ajuste/merge``) e repetidas (blocos): as medições de mesmo nome são
+somadas. Os módulos do pacote marcam os seus trechos caros com
+``etapa(nome)``, que não faz nada quando não há instrumentação ativa::
+
+    instrumentacao = Instrumentacao()
+    with instrumentacao.ativar():
+        with instrumentacao.etapa("build") as medicao:
+            ...
+            medicao.linhas_saida = len(stock_price)
+    print(instrumentacao.tabela())
+    instrumentacao.salvarResumo("dados_b3/execucao.json")
+"""
+
+import contextlib
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+_ativa = None
+
+
+def _picoRssMb():
+    if resource is None:
+        return None
+    # ru_maxrss é informado em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _rssAtualMb():
+    try:
+        with open("/proc/self/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MedicaoEtapa:
+    """Medição em andamento; a etapa pode preencher ``linhas_entrada``/``linhas_saida``."""
+
+    def __init__(self, nome, linhas_entrada=None):
+        self.nome = nome
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+        self.pico_alocado = 0
+
+
+class _MedicaoVazia:
+    # Usada quando não há instrumentação ativa; aceita os mesmos atributos
+    linhas_entrada = None
+    linhas_saida = None
+
+
+class Instrumentacao:
+
+    def __init__(self, perfil=False, memoria=False, diretorio_perfis=None, funcoes_perfil=10):
+        self.perfil = perfil
+        self.memoria = memoria
+        self.diretorio_perfis = diretorio_perfis
+        self.funcoes_perfil = funcoes_perfil
+        self.registros = {}
+        self.inicio = datetime.datetime.now().isoformat(timespec="seconds")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _pilha(self):
+        if not hasattr(self._local, "pilha"):
+            self._local.pilha = []
+        return self._local.pilha
+
+    @contextlib.contextmanager
+    def ativar(self):
+        """Torna esta instrumentação a ativa para as chamadas a ``etapa`` do pacote."""
+        global _ativa
+        anterior, _ativa = _ativa, self
+        iniciou_tracemalloc = self.memoria and not tracemalloc.is_tracing()
+        if iniciou_tracemalloc:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if iniciou_tracemalloc:
+                tracemalloc.stop()
+            _ativa = anterior
+
+    def _atualizarPicos(self, pilha):
+        # propaga o pico do tracemalloc para todas as etapas abertas e zera o pico
+        _, pico = tracemalloc.get_traced_memory()
+        for medicao in pilha:
+            medicao.pico_alocado = max(medicao.pico_alocado, pico)
+        tracemalloc.reset_peak()
+
+    @contextlib.contextmanager
+    def etapa(self, nome, linhas_entrada=None):
+        pilha = self._pilha()
+        caminho = "/".join([m.nome for m in pilha] + [nome])
+        medicao = MedicaoEtapa(nome, linhas_entrada)
+
+        memoria = self.memoria and tracemalloc.is_tracing()
+        if memoria:
+            self._atualizarPicos(pilha)
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+            medicao.pico_alocado = memoria_inicial
+        perfil = None
+        if self.perfil and not pilha:
+            # um único profiler pode estar ativo, então só as etapas de primeiro nível
+            perfil = cProfile.Profile()
+            perfil.enable()
+
+        with self._lock:
+            # reserva a posição para a tabela listar a etapa antes das internas
+            self.registros.setdefault(caminho, None)
+        pilha.append(medicao)
+        rss_inicial = _rssAtualMb()
+        cpu_inicial = time.process_time()
+        parede_inicial = time.perf_counter()
+        try:
+            yield medicao
+        finally:
+            parede = time.perf_counter() - parede_inicial
+            cpu = time.process_time() - cpu_inicial
+            rss_final = _rssAtualMb()
+            if perfil is not None:
+                perfil.disable()
+            if memoria:
+                self._atualizarPicos(pilha)
+            pilha.pop()
+
+            registro = {
+                "segundos": parede,
+                "cpu_segundos": cpu,
+                "chamadas": 1,
+                "linhas_entrada": medicao.linhas_entrada,
+                "linhas_saida": medicao.linhas_saida,
+                "pico_rss_mb": _picoRssMb(),
+                "variacao_rss_mb": rss_final - rss_inicial if rss_final is not None and rss_inicial is not None else None,
+                "alocado_pico_mb": (medicao.pico_alocado - memoria_inicial) / 2 ** 20 if memoria else None
+            }
+            if perfil is not None:
+                registro["funcoes_mais_lentas"] = self._resumoPerfil(perfil, caminho)
+            self._registrar(caminho, registro)
+
+    def _resumoPerfil(self, perfil, caminho):
+        if self.diretorio_perfis:
+            os.makedirs(self.diretorio_perfis, exist_ok=True)
+            perfil.dump_stats(os.path.join(self.diretorio_perfis, caminho.replace("/", "_") + ".prof"))
+        estatisticas = pstats.Stats(perfil, stream=io.StringIO()).sort_stats("cumulative")
+        funcoes = []
+        for (arquivo, linha, funcao), (_, chamadas, proprio, acumulado, _) in estatisticas.stats.items():
+            funcoes.append({"funcao": f"{os.path.basename(arquivo)}:{linha}({funcao})", "chamadas": chamadas,
+                            "segundos_proprios": proprio, "segundos_acumulados": acumulado})
+        funcoes.sort(key=lambda item: item["segundos_acumulados"], reverse=True)
+        return funcoes[:self.funcoes_perfil]
+
+    def _registrar(self, caminho, registro):
+        with self._lock:
+            atual = self.registros.get(caminho)
+            if atual is None:
+                self.registros[caminho] = registro
+                return
+            # etapas repetidas (por bloco) são somadas
+            for chave in ("segundos", "cpu_segundos", "chamadas", "linhas_entrada", "linhas_saida",
+                          "variacao_rss_mb"):
+                if registro[chave] is not None:
+                    atual[chave] = (atual[chave] or 0) + registro[chave]
+            for chave in ("pico_rss_mb", "alocado_pico_mb"):
+                if registro[chave] is not None:
+                    atual[chave] = max(atual[chave] or 0, registro[chave])
+
+    def resumo(self):
+        """Resumo da execução em formato serializável (JSON)."""
+        with self._lock:
+            etapas = [{"etapa": caminho, **registro} for caminho, registro in self.registros.items()
+                      if registro is not None]
+        total = sum(etapa["segundos"] for etapa in etapas if "/" not in etapa["etapa"])
+        return {
+            "inicio": self.inicio,
+            "segundos_total": total,
+            "pico_rss_mb": _picoRssMb(),
+            "etapas": etapas
+        }
+
+    def salvarResumo(self, caminho):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(self.resumo(), arquivo, ensure_ascii=False, indent=2)
+        return caminho
+
+    def tabela(self):
+        """Tabela de texto com a divisão do tempo entre as etapas."""
+        resumo = self.resumo()
+        total = resumo["segundos_total"] or 1.0
+
+        def formatar(valor, formato):
+            return "-" if valor is None else format(valor, formato)
+
+        linhas = [f"{'Etapa':<40} {'Chamadas':>8} {'Parede(s)':>10} {'CPU(s)':>9} {'%':>6} "
+                  f"{'Entrada':>11} {'Saída':>11} {'RSS pico':>9} {'Alocado':>9}"]
+        for etapa in resumo["etapas"]:
+            profundidade = etapa["etapa"].count("/")
+            nome = "  " * profundidade + etapa["etapa"].rsplit("/", 1)[-1]
+            linhas.append(
+                f"{nome:<40} {etapa['chamadas']:>8} {etapa['segundos']:>10.3f} {etapa['cpu_segundos']:>9.3f} "
+                f"{100 * etapa['segundos'] / total:>6.1f} {formatar(etapa['linhas_entrada'], ','):>11} "
+                f"{formatar(etapa['linhas_saida'], ','):>11} {formatar(etapa['pico_rss_mb'], '.0f'):>9} "
+                f"{formatar(etapa['alocado_pico_mb'], '.1f'):>9}"
+            )
+        linhas.append(f"{'Total':<40} {'':>8} {resumo['segundos_total']:>10.3f}")
+        return "\n".join(linhas)
+
+
+def etapa(nome, linhas_entrada=None):
+    """Marca um trecho como etapa da instrumentação ativa (sem efeito se não houver)."""
+    if _ativa is None:
+        return contextlib.nullcontext(_MedicaoVazia())
+    return _ativa.etapa(nome, linhas_entrada)
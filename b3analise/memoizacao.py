@@ -0,0 +1,219 @@
+"""Memoização das tabelas derivadas, chaveada pela versão dos dados.
+
+Cada célula de análise recalculava a partir das linhas brutas toda vez que
+era executada: o crescimento por ticker, a média por setor, o top 3 de cada
+setor e a série mensal com ``pct_change``. ``CacheAnalises`` guarda o
+resultado de cada análise sob uma chave formada por:
+
+- o nome da análise e o bytecode da função chamada;
+- a versão do código do pacote (``versaoCodigo``, um hash dos fontes de
+  ``b3analise``): o bytecode cobre só a função de nível mais alto, não as
+  funções e classes do pacote que ela usa, então qualquer mudança nos fontes
+  do pacote invalida as chaves; código de fora do pacote chamado pela função
+  não entra na chave;
+- a impressão digital de cada entrada: ``versaoDados()`` quando o objeto a
+  oferece (o ``DatasetPrecos`` usa tamanho e data dos arquivos, sem ler os
+  dados) ou um hash do conteúdo (``hash_pandas_object`` para DataFrames,
+  bytes para arrays, recursivo para listas, dicionários e objetos simples);
+- os parâmetros da análise.
+
+Os resultados ficam em memória com descarte LRU (``max_itens``) e,
+opcionalmente, em disco (``diretorio``), de onde são lidos em uma nova
+sessão enquanto dados e parâmetros não mudarem. Como cada nova versão dos
+dados gera arquivos novos, o disco tem limites próprios: ``max_bytes_disco``
+(os arquivos usados há mais tempo saem primeiro) e ``max_idade_disco``, em
+segundos desde o último uso.
+"""
+
+import functools
+import hashlib
+import os
+import pickle
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+@functools.lru_cache(maxsize=None)
+def versaoCodigo(diretorio=None):
+    """Hash dos fontes ``.py`` do pacote (calculado uma vez por sessão)."""
+    diretorio = diretorio or os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.blake2b(digest_size=16)
+    for raiz, diretorios, arquivos in os.walk(diretorio):
+        diretorios[:] = sorted(nome for nome in diretorios if nome != "__pycache__")
+        for nome in sorted(arquivos):
+            if nome.endswith(".py"):
+                caminho = os.path.join(raiz, nome)
+                digest.update(os.path.relpath(caminho, diretorio).encode())
+                with open(caminho, "rb") as arquivo:
+                    digest.update(hashlib.blake2b(arquivo.read(), digest_size=16).digest())
+    return digest.hexdigest()
+
+
+def _hashPandas(valor):
+    if isinstance(valor, pd.DataFrame):
+        cabecalho = repr([(str(coluna), str(tipo)) for coluna, tipo in valor.dtypes.items()])
+    else:
+        cabecalho = repr((str(valor.name), str(valor.dtype)))
+    digest = hashlib.blake2b(cabecalho.encode(), digest_size=16)
+    digest.update(pd.util.hash_pandas_object(valor, index=not isinstance(valor, pd.Index)).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _impressaoCodigo(codigo):
+    # Bytecode, nomes e constantes (inclusive das funções internas)
+    constantes = [_impressaoCodigo(c) if hasattr(c, "co_code") else repr(c) for c in codigo.co_consts]
+    return (codigo.co_code.hex(), codigo.co_names, constantes)
+
+
+def impressaoDigital(valor):
+    """Hash estável (entre sessões) do conteúdo de ``valor``."""
+    versao = getattr(valor, "versaoDados", None)
+    if callable(versao):
+        partes = ("versao", type(valor).__qualname__, versao())
+    elif isinstance(valor, (pd.DataFrame, pd.Series, pd.Index)):
+        try:
+            partes = ("pandas", _hashPandas(valor))
+        except TypeError:  # colunas com objetos não hasheáveis
+            partes = ("pickle", hashlib.blake2b(pickle.dumps(valor), digest_size=16).hexdigest())
+    elif isinstance(valor, np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(valor).view(np.uint8), digest_size=16) \
+            if valor.dtype != object else hashlib.blake2b(pickle.dumps(valor), digest_size=16)
+        partes = ("array", str(valor.dtype), valor.shape, digest.hexdigest())
+    elif isinstance(valor, dict):
+        partes = ("dict", sorted((repr(chave), impressaoDigital(item)) for chave, item in valor.items()))
+    elif isinstance(valor, (list, tuple, set, frozenset)):
+        itens = sorted(map(impressaoDigital, valor)) if isinstance(valor, (set, frozenset)) else \
+            [impressaoDigital(item) for item in valor]
+        partes = (type(valor).__name__, itens)
+    elif valor is None or isinstance(valor, (bool, int, float, str, bytes, np.generic, pd.Timestamp)):
+        partes = ("valor", type(valor).__name__, repr(valor))
+    elif hasattr(valor, "__func__") and hasattr(valor, "__self__"):
+        # método: a função e o objeto ao qual está ligado
+        partes = ("metodo", impressaoDigital(valor.__func__), impressaoDigital(valor.__self__))
+    elif hasattr(valor, "__code__"):
+        # função: o código e os valores capturados (closure)
+        capturados = [celula.cell_contents for celula in valor.__closure__ or ()]
+        partes = ("funcao", valor.__qualname__, _impressaoCodigo(valor.__code__), impressaoDigital(capturados))
+    elif isinstance(valor, type):
+        partes = ("tipo", valor.__module__, valor.__qualname__)
+    elif hasattr(valor, "__dict__"):
+        partes = ("objeto", type(valor).__qualname__, impressaoDigital(vars(valor)))
+    else:
+        partes = ("pickle", hashlib.blake2b(pickle.dumps(valor), digest_size=16).hexdigest())
+    return hashlib.blake2b(repr(partes).encode(), digest_size=16).hexdigest()
+
+
+class CacheAnalises:
+
+    def __init__(self, max_itens=64, diretorio=None, max_bytes_disco=None, max_idade_disco=None,
+                 versao_codigo=None):
+        """Sem ``versao_codigo`` as chaves usam ``versaoCodigo()`` do pacote instalado."""
+        self.max_itens = max_itens
+        self.versao_codigo = versao_codigo or versaoCodigo()
+        self.diretorio = diretorio
+        self.max_bytes_disco = max_bytes_disco
+        self.max_idade_disco = max_idade_disco
+        self._itens = OrderedDict()
+        self.estatisticas = {"acertos_memoria": 0, "acertos_disco": 0, "calculos": 0, "descartes": 0,
+                             "descartes_disco": 0}
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            self.podarDisco()
+
+    def chave(self, nome, funcao, entradas=(), parametros=None):
+        return impressaoDigital((self.versao_codigo, nome, funcao, list(entradas), parametros or {}))
+
+    def _arquivo(self, nome, chave):
+        return os.path.join(self.diretorio, f"{re.sub(r'[^0-9A-Za-z_]+', '_', nome)}_{chave}.pkl")
+
+    def podarDisco(self, agora=None):
+        """Remove os arquivos sem uso há mais de ``max_idade_disco`` e, acima de
+        ``max_bytes_disco``, os usados há mais tempo. Retorna quantos saíram."""
+        if not self.diretorio:
+            return 0
+        agora = time.time() if agora is None else agora
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(".pkl"):
+                caminho = os.path.join(self.diretorio, nome)
+                estado = os.stat(caminho)
+                arquivos.append((estado.st_mtime, estado.st_size, caminho))
+        # a data de modificação é a do último uso (as leituras a renovam)
+        arquivos.sort()
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        removidos = 0
+        for usado_em, tamanho, caminho in arquivos:
+            velho = self.max_idade_disco is not None and agora - usado_em > self.max_idade_disco
+            excede = self.max_bytes_disco is not None and total > self.max_bytes_disco
+            if not (velho or excede):
+                continue
+            os.remove(caminho)
+            total -= tamanho
+            removidos += 1
+        self.estatisticas["descartes_disco"] += removidos
+        return removidos
+
+    def _guardar(self, chave, resultado):
+        self._itens[chave] = resultado
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+            self.estatisticas["descartes"] += 1
+
+    def obter(self, nome, funcao, *entradas, **parametros):
+        """Resultado de ``funcao(*entradas, **parametros)``, recalculado só se
+        os dados ou os parâmetros mudaram desde a última vez."""
+        chave = self.chave(nome, funcao, entradas, parametros)
+        if chave in self._itens:
+            self._itens.move_to_end(chave)
+            self.estatisticas["acertos_memoria"] += 1
+            return self._entregar(self._itens[chave])
+
+        if self.diretorio and os.path.exists(self._arquivo(nome, chave)):
+            with open(self._arquivo(nome, chave), "rb") as arquivo:
+                resultado = pickle.load(arquivo)
+            os.utime(self._arquivo(nome, chave))
+            self.estatisticas["acertos_disco"] += 1
+        else:
+            resultado = funcao(*entradas, **parametros)
+            self.estatisticas["calculos"] += 1
+            if self.diretorio:
+                # grava em um temporário e troca, para não deixar arquivo pela metade
+                temporario = self._arquivo(nome, chave) + ".tmp"
+                with open(temporario, "wb") as arquivo:
+                    pickle.dump(resultado, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporario, self._arquivo(nome, chave))
+                self.podarDisco()
+        self._guardar(chave, resultado)
+        return self._entregar(resultado)
+
+    @staticmethod
+    def _entregar(resultado):
+        # cópia rasa (copy-on-write) para que alterar o DataFrame devolvido não altere o cache
+        if isinstance(resultado, (pd.DataFrame, pd.Series)):
+            return resultado.copy(deep=False)
+        if isinstance(resultado, tuple):
+            return tuple(CacheAnalises._entregar(item) for item in resultado)
+        return resultado
+
+    def memoizar(self, nome=None):
+        """Decorador: as chamadas da função passam pelo cache."""
+        def decorador(funcao):
+            nome_analise = nome or funcao.__qualname__
+
+            @functools.wraps(funcao)
+            def memoizada(*entradas, **parametros):
+                return self.obter(nome_analise, funcao, *entradas, **parametros)
+            return memoizada
+        return decorador
+
+    def limpar(self, disco=False):
+        self._itens.clear()
+        if disco and self.diretorio:
+            for nome in os.listdir(self.diretorio):
+                if nome.endswith(".pkl"):
+                    os.remove(os.path.join(self.diretorio, nome))
@@ -0,0 +1,251 @@
+"""Painel denso ticker × pregão e motor de correlação, covariância e beta.
+
+Toda pergunta que cruza tickers no notebook partia da base longa
+(Ticker, Date) e exigia um ``pivot`` ou um merge. ``PainelPrecos`` é montado
+uma única vez a partir do ``stock_price``: uma matriz float32 por coluna
+(Close e Volume), com uma linha por código de ticker e uma coluna por pregão
+do calendário comum, e ``NaN`` (máscara ``negociado``) nos dias em que o
+ticker não negociou.
+
+``MotorCorrelacao`` trabalha direto sobre as matrizes:
+
+- retornos diários por ticker (só entre pregões consecutivos negociados);
+- correlação e covariância entre todos os tickers com observações em comum
+  (pairwise), por produtos de matrizes em blocos de linhas, sem laço por par;
+- retorno médio de cada setor e as matrizes entre setores;
+- beta móvel de cada ticker contra a média do seu setor, com somas
+  acumuladas ao longo dos pregões (janela deslizante em O(1) por pregão).
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from b3analise.coleta import VALOR_AUSENTE
+from b3analise.esquema import diaInteiro
+from b3analise.instrumentacao import etapa
+
+
+class PainelPrecos:
+
+    def __init__(self, tickers, datas, valores, setores=None):
+        """``valores``: ``{coluna: matriz (tickers × datas)}``; ``setores``: setor de cada ticker."""
+        self.tickers = pd.Index(tickers, name="Ticker")
+        self.datas = pd.DatetimeIndex(datas, name="Date")
+        self.valores = valores
+        self.setores = setores
+
+    @classmethod
+    def deStockPrice(cls, stock_price, stock_info_df=None, colunas=("Close", "Volume")):
+        """Monta o painel a partir do ``stock_price`` no esquema compacto.
+
+        Com ``stock_info_df`` cada ticker recebe o seu setor (``'N/A'`` e
+        tickers fora do ``stock_info_df`` ficam sem setor).
+        """
+        with etapa("painel", linhas_entrada=len(stock_price)) as medicao:
+            ticker = stock_price["Ticker"]
+            if not isinstance(ticker.dtype, pd.CategoricalDtype):
+                ticker = ticker.astype("category")
+            # só os tickers presentes viram linhas
+            codigos = ticker.cat.codes.to_numpy()
+            usados, linhas = np.unique(codigos, return_inverse=True)
+            tickers = ticker.cat.categories[usados].astype(str)
+
+            if "Dia" in stock_price.columns:
+                dias = stock_price["Dia"].to_numpy()
+            else:
+                dias = diaInteiro(stock_price["Date"] if "Date" in stock_price.columns else stock_price.index)
+            calendario, colunas_painel = np.unique(dias, return_inverse=True)
+
+            valores = {}
+            for coluna in colunas:
+                matriz = np.full((len(tickers), len(calendario)), np.nan, dtype=np.float32)
+                matriz[linhas, colunas_painel] = stock_price[coluna].to_numpy(dtype=np.float32, na_value=np.nan)
+                valores[coluna] = matriz
+
+            setores = None
+            if stock_info_df is not None:
+                mapa = stock_info_df.assign(Ticker=stock_info_df["Ticker"].astype(str)) \
+                    .drop_duplicates("Ticker").set_index("Ticker")["Setor"].astype(object)
+                setores = pd.Categorical(mapa.reindex(tickers).to_numpy(),
+                                         categories=sorted(set(mapa.dropna()) - {VALOR_AUSENTE}))
+            medicao.linhas_saida = len(tickers)
+        return cls(tickers, calendario.astype("datetime64[D]"), valores, setores)
+
+    @property
+    def close(self):
+        return self.valores["Close"]
+
+    @property
+    def volume(self):
+        return self.valores["Volume"]
+
+    @property
+    def negociado(self):
+        return ~np.isnan(self.close)
+
+    def retornos(self, coluna="Close"):
+        """Retorno simples entre pregões consecutivos do calendário (NaN se algum não negociou)."""
+        precos = self.valores[coluna]
+        retornos = np.full(precos.shape, np.nan, dtype=np.float32)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            retornos[:, 1:] = precos[:, 1:] / precos[:, :-1] - 1
+        retornos[~np.isfinite(retornos)] = np.nan
+        return retornos
+
+    def paraDataFrame(self, coluna="Close"):
+        return pd.DataFrame(self.valores[coluna], index=self.tickers, columns=self.datas)
+
+
+def _matrizesPares(retornos, min_periodos=20, tamanho_bloco=256):
+    """Covariância e correlação pairwise entre as linhas de ``retornos``.
+
+    Para cada par só entram os pregões em que os dois têm retorno; as somas
+    sobre as observações em comum saem de produtos de matrizes com a máscara.
+    """
+    mascara = ~np.isnan(retornos)
+    m = mascara.astype(np.float64)
+    x = np.where(mascara, retornos, 0).astype(np.float64)
+    xx = x * x
+    k = len(retornos)
+    covariancia = np.empty((k, k))
+    correlacao = np.empty((k, k))
+    for inicio in range(0, k, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, k)
+        mi, xi = m[inicio:fim], x[inicio:fim]
+        n = mi @ m.T
+        soma_i = xi @ m.T
+        soma_j = mi @ x.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = (xi @ x.T - soma_i * soma_j / n) / (n - 1)
+            var_i = (xx[inicio:fim] @ m.T - soma_i ** 2 / n) / (n - 1)
+            var_j = (mi @ xx.T - soma_j ** 2 / n) / (n - 1)
+            corr = cov / np.sqrt(var_i * var_j)
+        insuficiente = n < max(min_periodos, 2)
+        cov[insuficiente] = np.nan
+        corr[insuficiente] = np.nan
+        covariancia[inicio:fim] = cov
+        correlacao[inicio:fim] = np.clip(corr, -1, 1)
+    return covariancia, correlacao
+
+
+class MotorCorrelacao:
+
+    def __init__(self, painel, min_periodos=20, tamanho_bloco=256):
+        self.painel = painel
+        self.min_periodos = min_periodos
+        self.tamanho_bloco = tamanho_bloco
+        self.retornos = painel.retornos()
+        self._tickers = None
+        self._setores = None
+
+    def _matrizesTickers(self):
+        if self._tickers is None:
+            with etapa("correlacao_tickers", linhas_entrada=len(self.retornos)):
+                self._tickers = _matrizesPares(self.retornos, self.min_periodos, self.tamanho_bloco)
+        return self._tickers
+
+    def covarianciaTickers(self):
+        tickers = self.painel.tickers
+        return pd.DataFrame(self._matrizesTickers()[0], index=tickers, columns=tickers)
+
+    def correlacaoTickers(self):
+        tickers = self.painel.tickers
+        return pd.DataFrame(self._matrizesTickers()[1], index=tickers, columns=tickers)
+
+    def retornosSetores(self):
+        """Retorno médio de cada setor por pregão (média dos tickers que negociaram)."""
+        setores = self.painel.setores
+        if setores is None:
+            raise ValueError("o painel foi montado sem stock_info_df; não há setores")
+        codigos = setores.codes
+        com_setor = codigos >= 0
+        # matriz indicadora setor × ticker: a soma por setor vira um produto de matrizes
+        indicadora = np.zeros((len(setores.categories), len(codigos)), dtype=np.float64)
+        indicadora[codigos[com_setor], np.flatnonzero(com_setor)] = 1
+        mascara = ~np.isnan(self.retornos)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            medias = (indicadora @ np.where(mascara, self.retornos, 0)) / (indicadora @ mascara)
+        return pd.DataFrame(medias.astype(np.float32), index=pd.Index(setores.categories, name="Setor"),
+                            columns=self.painel.datas)
+
+    def _matrizesSetores(self):
+        if self._setores is None:
+            retornos = self.retornosSetores().to_numpy()
+            self._setores = _matrizesPares(retornos, self.min_periodos, self.tamanho_bloco)
+        return self._setores
+
+    def covarianciaSetores(self):
+        setores = pd.Index(self.painel.setores.categories, name="Setor")
+        return pd.DataFrame(self._matrizesSetores()[0], index=setores, columns=setores)
+
+    def correlacaoSetores(self):
+        setores = pd.Index(self.painel.setores.categories, name="Setor")
+        return pd.DataFrame(self._matrizesSetores()[1], index=setores, columns=setores)
+
+    def betasMoveis(self, janela=60, min_periodos=None):
+        """Beta móvel de cada ticker contra o retorno médio do seu setor.
+
+        O beta no pregão ``t`` usa os ``janela`` pregões terminando em ``t``
+        em que ticker e setor têm retorno; com menos de ``min_periodos``
+        (padrão: metade da janela) observações o beta fica NaN. Tickers sem
+        setor ficam NaN.
+        """
+        min_periodos = janela // 2 if min_periodos is None else min_periodos
+        retornos_setor = self.retornosSetores().to_numpy()
+        codigos = self.painel.setores.codes
+        betas = np.full(self.retornos.shape, np.nan, dtype=np.float32)
+        with etapa("betas_moveis", linhas_entrada=len(self.retornos)):
+            for inicio in range(0, len(codigos), self.tamanho_bloco):
+                fim = min(inicio + self.tamanho_bloco, len(codigos))
+                bloco = np.arange(inicio, fim)[codigos[inicio:fim] >= 0]
+                if not len(bloco):
+                    continue
+                x = retornos_setor[codigos[bloco]].astype(np.float64)
+                y = self.retornos[bloco].astype(np.float64)
+                mascara = ~(np.isnan(x) | np.isnan(y))
+                x, y = np.where(mascara, x, 0), np.where(mascara, y, 0)
+                # somas na janela = diferença de somas acumuladas
+                somas = []
+                for termo in (mascara.astype(np.float64), x, y, x * y, x * x):
+                    acumulada = np.cumsum(termo, axis=1)
+                    acumulada[:, janela:] -= acumulada[:, :-janela].copy()
+                    somas.append(acumulada)
+                n, sx, sy, sxy, sxx = somas
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    beta = (sxy - sx * sy / n) / (sxx - sx ** 2 / n)
+                beta[(n < max(min_periodos, 2)) | ~np.isfinite(beta)] = np.nan
+                betas[bloco] = beta
+        return pd.DataFrame(betas, index=self.painel.tickers, columns=self.painel.datas)
+
+
+def benchmarkPainel(n_tickers=900, anos=5, janela=60):
+    # Compara o pivot + DataFrame.corr do pandas com o painel e o motor em blocos
+    from b3analise.sintetico import GeradorSintetico
+
+    gerador = GeradorSintetico(n_tickers=n_tickers, anos=anos)
+    stock_price = gerador.stockPrice()
+    stock_info_df = pd.DataFrame(gerador.stockInfo())
+    resultados = {}
+
+    inicio = time.perf_counter()
+    pivot = stock_price.reset_index().pivot_table(index="Date", columns="Ticker", values="Close",
+                                                  observed=True)
+    pivot.pct_change(fill_method=None).corr(min_periods=20)
+    resultados["pivot_corr_pandas"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    painel = PainelPrecos.deStockPrice(stock_price, stock_info_df)
+    resultados["painel"] = time.perf_counter() - inicio
+    motor = MotorCorrelacao(painel)
+    inicio = time.perf_counter()
+    motor.correlacaoTickers()
+    resultados["correlacao_covariancia_tickers"] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    motor.correlacaoSetores()
+    resultados["correlacao_covariancia_setores"] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    motor.betasMoveis(janela)
+    resultados["betas_moveis"] = time.perf_counter() - inicio
+    return resultados
@@ -0,0 +1,186 @@
+"""Estágio paralelo por ticker com pool de processos e memória compartilhada.
+
+Depois da ingestão, ordenação, rótulos e indicadores rodavam em um único
+núcleo sobre a base inteira, embora quase tudo seja independente entre
+tickers. ``EstagioParalelo`` divide o ``stock_price`` em fatias de tickers
+inteiros e as distribui para um ``ProcessPoolExecutor``:
+
+- a base é ordenada uma vez por (Ticker, data) e as colunas de entrada são
+  copiadas para blocos de ``SharedMemory`` (uma linha por coluna, contígua);
+- cada processo anexa os blocos uma única vez (no ``initializer``) e cada
+  tarefa recebe apenas o intervalo de linhas ``(inicio, fim)`` das suas
+  fatias, sem DataFrames serializados;
+- o resultado de cada tarefa é gravado direto no bloco de saída
+  compartilhado, na mesma posição das linhas de entrada.
+
+A transformação é uma função de nível de módulo (para poder ser enviada aos
+processos) que recebe o DataFrame de uma fatia, com ``Ticker``, ``Date`` e as
+colunas de entrada, e devolve um DataFrame com as ``colunas_saida`` e o mesmo
+número de linhas.
+
+O ``PipelinePreprocessamento`` usa o estágio com ``transformacaoRotulos``
+quando criado com ``processos > 1`` (``python -m b3analise features
+--processos N``), para calcular o ``resultado`` e os indicadores de cada
+bloco de tickers.
+"""
+
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from b3analise.indicadores import CONFIGURACAO_PADRAO, calcularIndicadores, nomesIndicadores
+from b3analise.rotulos import MotorRotulos, blocosContiguos
+
+
+COLUNAS_ENTRADA = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+# blocos compartilhados anexados por cada processo do pool
+_compartilhado = {}
+
+
+def transformacaoPadrao(bloco, indicadores=None, horizonte=1):
+    """Indicadores técnicos e o rótulo ``resultado`` de uma fatia de tickers."""
+    saida = calcularIndicadores(bloco, coluna_data="Date", **(indicadores or CONFIGURACAO_PADRAO))
+    saida["resultado"] = MotorRotulos(bloco, coluna_data="Date").rotulo(horizonte=horizonte, coluna="Adj Close")
+    return saida
+
+
+def transformacaoRotulos(bloco, indicadores=None, horizonte=1):
+    """``resultado`` e, se configurados, os indicadores, nas colunas do pipeline."""
+    saida = pd.DataFrame({"resultado": MotorRotulos(bloco, coluna_data="Date").rotulo(
+        horizonte=horizonte, coluna="Adj Close")}, index=bloco.index)
+    if indicadores:
+        saida = pd.concat([saida, calcularIndicadores(bloco, coluna_data="Date", **indicadores)], axis=1)
+    return saida
+
+
+def _criarBloco(forma, dtype):
+    tamanho = max(int(np.prod(forma)) * np.dtype(dtype).itemsize, 1)
+    memoria = SharedMemory(create=True, size=tamanho)
+    return memoria, np.ndarray(forma, dtype=dtype, buffer=memoria.buf)
+
+
+def _anexar(descricao):
+    """Anexa os blocos compartilhados no processo do pool."""
+    for chave, (nome, forma, dtype) in descricao.items():
+        # o rastreador de recursos é o do processo principal, que cria e
+        # remove os blocos; aqui eles são só anexados
+        memoria = SharedMemory(name=nome)
+        _compartilhado[chave] = (memoria, np.ndarray(forma, dtype=dtype, buffer=memoria.buf))
+
+
+def _executarTarefa(intervalo, transformacao, colunas_entrada, colunas_saida, categorias):
+    inicio, fim = intervalo
+    entrada = _compartilhado["entrada"][1]
+    chaves = _compartilhado["chaves"][1]
+    saida = _compartilhado["saida"][1]
+
+    bloco = pd.DataFrame({
+        "Ticker": pd.Categorical.from_codes(chaves[0, inicio:fim], categories=categorias),
+        "Date": chaves[1, inicio:fim].view("datetime64[ns]"),
+        **{coluna: entrada[i, inicio:fim] for i, coluna in enumerate(colunas_entrada)}
+    }, copy=False)
+    resultado = transformacao(bloco)
+    for i, coluna in enumerate(colunas_saida):
+        saida[i, inicio:fim] = resultado[coluna].to_numpy(dtype=np.float64, na_value=np.nan)
+    return fim - inicio
+
+
+class EstagioParalelo:
+
+    def __init__(self, transformacao=None, colunas_saida=None, colunas_entrada=COLUNAS_ENTRADA,
+                 max_workers=None, tickers_por_tarefa=25):
+        """Sem ``transformacao`` usa ``transformacaoPadrao`` (indicadores + resultado)."""
+        if transformacao is None:
+            transformacao = functools.partial(transformacaoPadrao, indicadores=CONFIGURACAO_PADRAO)
+            colunas_saida = nomesIndicadores(**CONFIGURACAO_PADRAO) + ["resultado"]
+        if colunas_saida is None:
+            raise ValueError("informe as colunas_saida da transformação")
+        self.transformacao = transformacao
+        self.colunas_saida = list(colunas_saida)
+        self.colunas_entrada = list(colunas_entrada)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.tickers_por_tarefa = tickers_por_tarefa
+
+    def _tarefas(self, inicios, fins):
+        # fatias com ``tickers_por_tarefa`` tickers inteiros cada
+        return [(int(inicios[i]), int(fins[min(i + self.tickers_por_tarefa, len(fins)) - 1]))
+                for i in range(0, len(inicios), self.tickers_por_tarefa)]
+
+    def executar(self, stock_price):
+        """Aplica a transformação por fatias de tickers e devolve as colunas de saída.
+
+        O DataFrame devolvido tem o mesmo índice (e ordem) do ``stock_price``.
+        """
+        dados = stock_price.reset_index() if "Date" not in stock_price.columns else stock_price
+        ticker = dados["Ticker"]
+        if not isinstance(ticker.dtype, pd.CategoricalDtype):
+            ticker = ticker.astype("category")
+        ordem, inicios, fins = blocosContiguos(pd.DataFrame({"Ticker": ticker, "Date": dados["Date"]}),
+                                               "Ticker", "Date")
+        n = len(dados)
+        posicoes = np.arange(n) if ordem is None else ordem
+
+        blocos = {}
+        try:
+            memoria, entrada = _criarBloco((len(self.colunas_entrada), n), np.float64)
+            blocos["entrada"] = (memoria, entrada)
+            for i, coluna in enumerate(self.colunas_entrada):
+                entrada[i] = dados[coluna].to_numpy(dtype=np.float64, na_value=np.nan)[posicoes]
+            memoria, chaves = _criarBloco((2, n), np.int64)
+            blocos["chaves"] = (memoria, chaves)
+            chaves[0] = ticker.cat.codes.to_numpy()[posicoes]
+            chaves[1] = dados["Date"].to_numpy(dtype="datetime64[ns]").view(np.int64)[posicoes]
+            memoria, saida = _criarBloco((len(self.colunas_saida), n), np.float64)
+            blocos["saida"] = (memoria, saida)
+
+            tarefa = functools.partial(_executarTarefa, transformacao=self.transformacao,
+                                       colunas_entrada=self.colunas_entrada,
+                                       colunas_saida=self.colunas_saida,
+                                       categorias=ticker.cat.categories)
+            tarefas = self._tarefas(inicios, fins)
+            if self.max_workers == 1:
+                _compartilhado.update(blocos)
+                try:
+                    list(map(tarefa, tarefas))
+                finally:
+                    _compartilhado.clear()
+            else:
+                descricao = {chave: (memoria.name, array.shape, array.dtype.str)
+                             for chave, (memoria, array) in blocos.items()}
+                with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_anexar,
+                                         initargs=(descricao,)) as executor:
+                    list(executor.map(tarefa, tarefas))
+
+            # volta para a ordem original das linhas
+            valores = np.empty((n, len(self.colunas_saida)))
+            valores[posicoes] = saida.T
+        finally:
+            for memoria, _ in blocos.values():
+                memoria.close()
+                memoria.unlink()
+
+        resultado = pd.DataFrame(valores, columns=self.colunas_saida, index=stock_price.index)
+        if "resultado" in resultado.columns:
+            resultado["resultado"] = resultado["resultado"].astype(np.int8)
+        return resultado
+
+
+def benchmarkParalelo(stock_price, workers=(1, 2, 4, 8), tickers_por_tarefa=25):
+    """Tempo do estágio padrão com diferentes números de processos."""
+    tempos = {}
+    for max_workers in workers:
+        estagio = EstagioParalelo(max_workers=max_workers, tickers_por_tarefa=tickers_por_tarefa)
+        inicio = time.perf_counter()
+        estagio.executar(stock_price)
+        tempos[max_workers] = time.perf_counter() - inicio
+    return {
+        "linhas": len(stock_price),
+        "segundos": tempos,
+        "aceleracao": {max_workers: tempos[workers[0]] / tempo for max_workers, tempo in tempos.items()}
+    }
@@ -0,0 +1,335 @@
+"""Pré-processamento em blocos de tickers para montar o ``final_df``.
+
+No notebook a cadeia merge → drop_duplicates/dropna → conversões de data →
+MinMaxScaler → LabelEncoder → OneHotEncoder mantinha várias cópias completas
+da base em memória ao mesmo tempo (o OneHotEncoder de Ticker/Indústria chegou
+a estourar a memória do Colab). Aqui a mesma cadeia é aplicada bloco a bloco,
+cada bloco contendo todas as linhas de um grupo de tickers:
+
+1. primeira passada: prepara cada bloco e acumula o que os transformadores
+   precisam (mínimo/máximo do scaler e categorias dos encoders);
+2. segunda passada: prepara o bloco de novo, aplica os transformadores já
+   ajustados e grava o resultado no Parquet de saída.
+
+O pico de memória passa a depender do tamanho do bloco, não da base inteira.
+Com ``processos > 1`` rótulos e indicadores de cada bloco são calculados por
+fatias de tickers em um pool de processos (``b3analise.paralelo``); como o
+pool é criado por bloco, vale usar blocos maiores nesse modo.
+
+Para o treino, ``exportarMatrizTreino`` grava X/y sem densificar as categorias:
+em ``npz`` cada bloco vira uma matriz CSR (numéricas + one-hot esparso) e em
+``memmap`` as numéricas (float32) e os códigos inteiros das categorias são
+gravados em arrays mapeados em memória.
+
+Categorias que os encoders não viram no ajuste (o pipeline pode ter sido
+ajustado sobre outra base) seguem o ``handle_unknown="ignore"`` do
+OneHotEncoder: nenhuma coluna do one-hot é ativada, e os códigos inteiros
+(inclusive o da indústria) ficam em -1.
+"""
+
+import functools
+import json
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler, OneHotEncoder
+
+from b3analise.esquema import diaInteiro, normalizarTicker
+from b3analise.indicadores import CONFIGURACAO_PADRAO, calcularIndicadores, nomesIndicadores
+from b3analise.instrumentacao import etapa
+from b3analise.rotulos import MotorRotulos
+
+
+COLUNAS_NUMERICAS = ["Open", "High", "Low", "Adj Close", "Close", "Volume"]
+
+
+def blocosDeDataFrame(stock_price, tickers_por_bloco=50):
+    """Divide um ``stock_price`` já em memória em blocos de tickers inteiros."""
+    tickers = stock_price["Ticker"].unique()
+    for i in range(0, len(tickers), tickers_por_bloco):
+        yield stock_price[stock_price["Ticker"].isin(tickers[i:i + tickers_por_bloco])]
+
+
+def blocosPorTicker(dataset_precos, tickers=None, tickers_por_bloco=50):
+    """Lê do ``DatasetPrecos`` um grupo de tickers por vez."""
+    if tickers is None:
+        tickers = dataset_precos.dataset().to_table(columns=["Ticker"])["Ticker"].unique().to_pylist()
+    for i in range(0, len(tickers), tickers_por_bloco):
+        yield dataset_precos.carregar(tickers=tickers[i:i + tickers_por_bloco])
+
+
+class PipelinePreprocessamento:
+
+    def __init__(self, stock_info_df, colunas_numericas=COLUNAS_NUMERICAS,
+                 colunas_one_hot=("Ticker", "Setor"), coluna_label="Indústria",
+                 indicadores=None, processos=1):
+        """``indicadores``: configuração de ``b3analise.indicadores`` (ou ``True``
+        para a padrão); os indicadores entram como colunas numéricas e são
+        normalizados junto com os preços. ``processos``: processos do cálculo
+        de rótulos e indicadores de cada bloco (1 roda no próprio processo)."""
+        self.stock_info_df = stock_info_df
+        self.indicadores = dict(CONFIGURACAO_PADRAO) if indicadores is True else indicadores
+        self.colunas_numericas = list(colunas_numericas)
+        if self.indicadores:
+            self.colunas_numericas += nomesIndicadores(**self.indicadores)
+        self.colunas_one_hot = list(colunas_one_hot)
+        self.coluna_label = coluna_label
+        self.scaler = MinMaxScaler()
+        self.label_encoder = LabelEncoder()
+        self.encoder = None
+        self.processos = processos
+        self.linhas_ = 0
+
+    def prepararBloco(self, bloco):
+        """Merge com ``stock_info``, limpeza, datas, tipos numéricos e ``resultado``."""
+        with etapa("merge", linhas_entrada=len(bloco)) as medicao:
+            stock_data = bloco.drop(columns=["index", "level_0", "Ano"], errors="ignore")
+            if "Date" not in stock_data.columns:
+                stock_data = stock_data.reset_index()
+            stock_data = stock_data.assign(Ticker=normalizarTicker(stock_data["Ticker"]))
+            stock_data = stock_data.merge(self.stock_info_df, on="Ticker")
+            stock_data = stock_data.drop(columns=["Nome", "Dia"], errors="ignore")
+
+            stock_data = stock_data.drop_duplicates().dropna()
+
+            stock_data["Data Entrada B3"] = pd.to_datetime(stock_data["Data"], unit="s")
+            stock_data["Data Negociacao B3"] = pd.to_datetime(stock_data["Date"])
+            stock_data = stock_data.drop(columns=["Data", "Date"])
+
+            for coluna in self.colunas_numericas:
+                if coluna in stock_data.columns:
+                    stock_data[coluna] = pd.to_numeric(stock_data[coluna], errors="coerce")
+            medicao.linhas_saida = len(stock_data)
+
+        # o bloco tem todas as linhas de cada ticker, então o dia seguinte é
+        # buscado dentro do próprio ticker
+        stock_data = stock_data.sort_values(by=["Ticker", "Data Negociacao B3"]).reset_index(drop=True)
+        if self.processos > 1:
+            return self._rotulosParalelos(stock_data)
+        with etapa("rotulos", linhas_entrada=len(stock_data)):
+            stock_data["resultado"] = MotorRotulos(stock_data).rotulo(horizonte=1, coluna="Adj Close")
+        if self.indicadores:
+            # janelas iniciais de cada ticker ficam NaN (ignoradas pelo MinMaxScaler)
+            with etapa("indicadores", linhas_entrada=len(stock_data)):
+                stock_data = pd.concat([stock_data, calcularIndicadores(
+                    stock_data, coluna_data="Data Negociacao B3", **self.indicadores)], axis=1)
+        return stock_data
+
+    def _rotulosParalelos(self, stock_data):
+        # Mesmas colunas de rótulo e indicadores, calculadas pelo EstagioParalelo
+        from b3analise.paralelo import COLUNAS_ENTRADA, EstagioParalelo, transformacaoRotulos
+
+        colunas = ["resultado"] + (nomesIndicadores(**self.indicadores) if self.indicadores else [])
+        estagio = EstagioParalelo(functools.partial(transformacaoRotulos, indicadores=self.indicadores),
+                                  colunas_saida=colunas, max_workers=self.processos)
+        with etapa("rotulos_indicadores_paralelo", linhas_entrada=len(stock_data)):
+            entrada = stock_data[["Ticker"] + COLUNAS_ENTRADA].assign(Date=stock_data["Data Negociacao B3"])
+            return pd.concat([stock_data, estagio.executar(entrada)], axis=1)
+
+    def ajustar(self, blocos):
+        """Primeira passada: ajusta scaler e encoders sem manter os blocos."""
+        categorias = {coluna: set() for coluna in self.colunas_one_hot + [self.coluna_label]}
+        self.linhas_ = 0
+        minimos = np.full(len(self.colunas_numericas), np.nan)
+        maximos = np.full(len(self.colunas_numericas), np.nan)
+        for bloco in blocos:
+            stock_data = self.prepararBloco(bloco)
+            if not len(stock_data):
+                continue
+            self.linhas_ += len(stock_data)
+            # mínimo/máximo acumulados ignorando NaN (um bloco com uma coluna
+            # toda NaN não pode contaminar o ajuste, como no partial_fit)
+            valores = stock_data[self.colunas_numericas].to_numpy(dtype=np.float64)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                minimos = np.fmin(minimos, np.nanmin(valores, axis=0))
+                maximos = np.fmax(maximos, np.nanmax(valores, axis=0))
+            for coluna, valores in categorias.items():
+                valores.update(stock_data[coluna].dropna().unique().tolist())
+
+        self.scaler.fit(pd.DataFrame([minimos, maximos], columns=self.colunas_numericas))
+
+        self.label_encoder.fit(sorted(categorias[self.coluna_label]))
+        lista_categorias = [sorted(categorias[coluna]) for coluna in self.colunas_one_hot]
+        self.encoder = OneHotEncoder(categories=lista_categorias, sparse_output=False,
+                                     handle_unknown="ignore")
+        exemplo = pd.DataFrame({coluna: [valores[0]] for coluna, valores in zip(self.colunas_one_hot, lista_categorias)})
+        self.encoder.fit(exemplo)
+        return self
+
+    def transformarBloco(self, bloco):
+        return self.codificarBloco(self.prepararBloco(bloco))
+
+    def codificarBloco(self, stock_data):
+        # Aplica scaler e encoders já ajustados a um bloco já preparado
+        with etapa("scaler", linhas_entrada=len(stock_data)):
+            stock_data = stock_data.copy()
+            stock_data[self.colunas_numericas] = self.scaler.transform(stock_data[self.colunas_numericas])
+            stock_data[self.coluna_label] = self.codigosLabel(stock_data)
+
+        with etapa("one_hot", linhas_entrada=len(stock_data)) as medicao:
+            encoded_features = self.encoder.transform(stock_data[self.colunas_one_hot])
+            encoded_df = pd.DataFrame(encoded_features.astype(np.float32),
+                                      columns=self.encoder.get_feature_names_out(self.colunas_one_hot),
+                                      index=stock_data.index)
+            final_df = pd.concat([stock_data, encoded_df], axis=1)
+            medicao.linhas_saida = len(final_df)
+        return final_df.drop(columns=self.colunas_one_hot)
+
+    def codigosLabel(self, stock_data):
+        # Código de cada linha no LabelEncoder (-1 para uma classe que ele não viu)
+        return pd.Index(self.label_encoder.classes_).get_indexer(stock_data[self.coluna_label]).astype(np.int64)
+
+    def codigosBloco(self, stock_data):
+        # Códigos inteiros de cada coluna one-hot, na ordem das categorias do
+        # encoder (-1 para uma categoria que ele não viu)
+        return np.column_stack([
+            pd.Index(categorias).get_indexer(stock_data[coluna]).astype(np.int32)
+            for coluna, categorias in zip(self.colunas_one_hot, self.encoder.categories_)
+        ])
+
+    def nomesFeatures(self, modo="esparso"):
+        nomes = self.colunas_numericas + [self.coluna_label]
+        if modo == "esparso":
+            return nomes + list(self.encoder.get_feature_names_out(self.colunas_one_hot))
+        return nomes + self.colunas_one_hot
+
+    def matrizesBloco(self, bloco, modo="esparso", dias=False):
+        """Features e alvo de um bloco sem densificar as categorias.
+
+        ``modo="esparso"``: retorna ``(X_csr, y)``, com as numéricas
+        normalizadas, o código da indústria e o one-hot de Ticker/Setor.
+        ``modo="codigos"``: retorna ``(X_numerico, X_codigos, y)``, com os
+        códigos inteiros das colunas categóricas no lugar do one-hot.
+        Com ``dias=True`` o dia de cada linha (int32, dias desde 1970) vem
+        como último elemento, para a divisão temporal.
+        """
+        stock_data = self.prepararBloco(bloco)
+        numerico = np.column_stack([
+            self.scaler.transform(stock_data[self.colunas_numericas]),
+            self.codigosLabel(stock_data)
+        ]).astype(np.float32)
+        codigos = self.codigosBloco(stock_data)
+        y = stock_data["resultado"].to_numpy(dtype=np.int8)
+        extra = (diaInteiro(stock_data["Data Negociacao B3"]),) if dias else ()
+        if modo == "codigos":
+            return (numerico, codigos, y) + extra
+
+        # one-hot montado direto em CSR: uma coluna ativa por categoria
+        # conhecida; código -1 (categoria nova) não ativa nenhuma
+        n, n_colunas = codigos.shape
+        deslocamentos = np.cumsum([0] + [len(c) for c in self.encoder.categories_[:-1]])
+        conhecidos = codigos >= 0
+        colunas = (codigos + deslocamentos)[conhecidos]
+        one_hot = sp.csr_matrix(
+            (np.ones(len(colunas), dtype=np.float32), colunas,
+             np.concatenate(([0], np.cumsum(conhecidos.sum(axis=1))))),
+            shape=(n, sum(len(c) for c in self.encoder.categories_))
+        )
+        return (sp.hstack([sp.csr_matrix(numerico), one_hot], format="csr"), y) + extra
+
+    def transformar(self, blocos):
+        for bloco in blocos:
+            yield self.transformarBloco(bloco)
+
+    def executar(self, gerar_blocos, destino):
+        """Executa as duas passadas e grava o ``final_df`` em ``destino`` (Parquet).
+
+        ``gerar_blocos`` é uma função sem argumentos que devolve um novo
+        iterável de blocos a cada chamada (o dataset é lido duas vezes).
+        Retorna a quantidade de linhas gravadas.
+        """
+        with etapa("ajuste") as medicao:
+            self.ajustar(gerar_blocos())
+            medicao.linhas_saida = self.linhas_
+        linhas = 0
+        writer = None
+        with etapa("transformacao") as medicao:
+            try:
+                for final_df in self.transformar(gerar_blocos()):
+                    with etapa("gravacao", linhas_entrada=len(final_df)):
+                        tabela = pa.Table.from_pandas(final_df, preserve_index=False)
+                        if writer is None:
+                            writer = pq.ParquetWriter(destino, tabela.schema)
+                        writer.write_table(tabela.cast(writer.schema))
+                    linhas += len(final_df)
+            finally:
+                if writer is not None:
+                    writer.close()
+            medicao.linhas_saida = linhas
+        return linhas
+
+    def salvar(self, caminho):
+        # Guarda o pipeline ajustado (scaler e encoders) para as atualizações diárias
+        with open(caminho, "wb") as arquivo:
+            pickle.dump(self, arquivo)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with open(caminho, "rb") as arquivo:
+            return pickle.load(arquivo)
+
+
+def exportarMatrizTreino(pipeline, gerar_blocos, destino, formato="npz"):
+    """Grava X/y de treino em ``destino`` sem materializar o one-hot denso.
+
+    ``formato="npz"``: um ``X_<bloco>.npz`` (CSR) e um ``y_<bloco>.npy`` por
+    bloco, para o treino ler bloco a bloco.
+    ``formato="memmap"``: ``X_numerico.f32``, ``X_codigos.i32``, ``y.i8`` e
+    ``dias.i32`` (dia de cada linha, para ``b3analise.divisao``) com todas as
+    linhas, abertos com ``np.memmap`` usando os formatos de ``metadados.json``.
+    """
+    os.makedirs(destino, exist_ok=True)
+    if pipeline.encoder is None:
+        pipeline.ajustar(gerar_blocos())
+
+    metadados = {
+        "formato": formato,
+        "codigo_desconhecido": -1,
+        "categorias": {coluna: [str(c) for c in categorias]
+                       for coluna, categorias in zip(pipeline.colunas_one_hot, pipeline.encoder.categories_)}
+    }
+    if formato == "npz":
+        metadados["features"] = pipeline.nomesFeatures("esparso")
+        metadados["blocos"] = []
+        for i, bloco in enumerate(gerar_blocos()):
+            X, y = pipeline.matrizesBloco(bloco, "esparso")
+            sp.save_npz(os.path.join(destino, f"X_{i:05d}.npz"), X)
+            np.save(os.path.join(destino, f"y_{i:05d}.npy"), y)
+            metadados["blocos"].append(X.shape[0])
+        metadados["linhas"] = sum(metadados["blocos"])
+    elif formato == "memmap":
+        # as linhas são contadas nos próprios blocos exportados (o pipeline pode
+        # ter sido ajustado sobre outra base, ou carregado do pipeline.pkl):
+        # cada bloco é acrescentado ao fim dos arquivos, lidos depois com np.memmap
+        n = 0
+        n_numericas = len(pipeline.colunas_numericas) + 1
+        n_codigos = len(pipeline.colunas_one_hot)
+        arquivos = {nome: open(os.path.join(destino, nome), "wb")
+                    for nome in ("X_numerico.f32", "X_codigos.i32", "y.i8", "dias.i32")}
+        try:
+            for bloco in gerar_blocos():
+                numerico, codigos, y, dias = pipeline.matrizesBloco(bloco, "codigos", dias=True)
+                np.ascontiguousarray(numerico, dtype=np.float32).tofile(arquivos["X_numerico.f32"])
+                np.ascontiguousarray(codigos, dtype=np.int32).tofile(arquivos["X_codigos.i32"])
+                np.ascontiguousarray(y, dtype=np.int8).tofile(arquivos["y.i8"])
+                np.ascontiguousarray(dias, dtype=np.int32).tofile(arquivos["dias.i32"])
+                n += len(y)
+        finally:
+            for arquivo in arquivos.values():
+                arquivo.close()
+        metadados["features"] = pipeline.nomesFeatures("codigos")
+        metadados["formas"] = {"X_numerico": [n, n_numericas], "X_codigos": [n, n_codigos], "y": [n], "dias": [n]}
+        metadados["linhas"] = n
+    else:
+        raise ValueError(f"formato desconhecido: {formato}")
+
+    with open(os.path.join(destino, "metadados.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(metadados, arquivo, ensure_ascii=False)
+    return metadados
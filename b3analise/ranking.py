@@ -0,0 +1,131 @@
+"""Rankings de crescimento (top/bottom N geral e por setor).
+
+As respostas "top 20" e "top 3 por setor" reordenavam a tabela inteira de
+tickers com ``sort_values(...).head(...)`` e o gráfico filtrava
+``df_sorted[df_sorted['Setor'] == setor]`` uma vez por setor. Aqui:
+
+- a seleção dos N maiores/menores usa ``np.argpartition`` (O(n)) e só os N
+  escolhidos são ordenados;
+- um índice por setor (tickers agrupados por código de setor e os
+  deslocamentos de cada setor) evita as máscaras booleanas repetidas;
+- o crescimento em qualquer janela de datas vem dos fechamentos diários já
+  agregados, ordenados por (ticker, dia): uma busca binária por ticker acha o
+  primeiro e o último pregão da janela, sem voltar aos preços brutos.
+"""
+
+import numpy as np
+import pandas as pd
+
+from b3analise.esquema import diaInteiro
+
+
+METRICAS = {"absoluto": "Crescimento", "percentual": "Crescimento (%)"}
+
+
+def _selecionar(valores, n, maiores):
+    # Índices dos n maiores (ou menores) valores, já ordenados; NaN fica de fora
+    chave = -valores if maiores else valores.copy()
+    chave[np.isnan(chave)] = np.inf
+    n = min(n, int(np.isfinite(chave).sum()))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    escolhidos = np.argpartition(chave, n - 1)[:n] if n < len(chave) else np.arange(len(chave))
+    return escolhidos[np.argsort(chave[escolhidos], kind="stable")]
+
+
+class RankingCrescimento:
+
+    def __init__(self, rollup):
+        """Monta o ranking a partir de um ``RollupSetores`` já construído."""
+        diario = rollup.tickers["dia"].sort_values(["Ticker", "periodo"], ignore_index=True)
+        self.tickers = pd.Index(diario["Ticker"].unique().astype(str), name="Ticker")
+        codigos = pd.Categorical(diario["Ticker"].astype(str), categories=self.tickers).codes.astype(np.int64)
+
+        # chave única crescente (ticker, dia) para as buscas por janela
+        self._deslocamento = np.int64(1) << 32
+        self.dias = diario["periodo"].to_numpy(dtype=np.int64)
+        self.closes = diario["ultimo_close"].to_numpy(dtype=np.float64)
+        self._chaves = codigos * self._deslocamento + self.dias
+        self._codigos_tickers = np.arange(len(self.tickers), dtype=np.int64)
+
+        # índice por setor: tickers ordenados por setor + início de cada setor
+        setores = rollup.setores.assign(Ticker=rollup.setores["Ticker"].astype(str)).set_index("Ticker")["Setor"]
+        setor_ticker = setores.reindex(self.tickers)
+        self.setores = pd.Index(sorted(setor_ticker.dropna().astype(str).unique()), name="Setor")
+        self.codigo_setor = pd.Categorical(setor_ticker.astype(object), categories=self.setores).codes
+        ordem = np.argsort(self.codigo_setor, kind="stable")
+        com_setor = ordem[self.codigo_setor[ordem] >= 0]
+        contagens = np.bincount(self.codigo_setor[com_setor], minlength=len(self.setores))
+        self._tickers_por_setor = np.split(com_setor, np.cumsum(contagens)[:-1])
+
+        self._completo = self.crescimento()
+        self._versao = None
+
+    def versaoDados(self):
+        # O ranking não muda depois de montado: o hash é calculado uma única vez
+        if self._versao is None:
+            from b3analise.memoizacao import impressaoDigital
+
+            self._versao = impressaoDigital((self._chaves, self.closes, self.tickers, self.codigo_setor))
+        return self._versao
+
+    def crescimento(self, inicio=None, fim=None):
+        """Tabela por ticker com preço inicial, final e crescimento na janela.
+
+        Sem ``inicio``/``fim`` usa o histórico inteiro de cada ticker.
+        """
+        dia_inicio = np.iinfo(np.int32).min if inicio is None else diaInteiro([inicio])[0]
+        dia_fim = np.iinfo(np.int32).max if fim is None else diaInteiro([fim])[0]
+        base = self._codigos_tickers * self._deslocamento
+        primeiro = np.searchsorted(self._chaves, base + dia_inicio, side="left")
+        ultimo = np.searchsorted(self._chaves, base + dia_fim, side="right") - 1
+        # a janela só é válida se o primeiro pregão achado for do próprio ticker
+        valido = (primeiro <= ultimo) & (primeiro < len(self._chaves))
+        primeiro = np.minimum(primeiro, len(self._chaves) - 1)
+        valido &= (self._chaves[primeiro] >> 32) == self._codigos_tickers
+
+        preco_inicio = np.where(valido, self.closes[primeiro], np.nan)
+        preco_fim = np.where(valido, self.closes[np.maximum(ultimo, 0)], np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            percentual = (preco_fim / preco_inicio - 1) * 100
+        setor = np.where(self.codigo_setor >= 0,
+                         np.asarray(self.setores, dtype=object)[np.maximum(self.codigo_setor, 0)], None)
+        return pd.DataFrame({
+            "Setor": setor,
+            "preco_inicio": preco_inicio,
+            "preco_fim": preco_fim,
+            "Crescimento": preco_fim - preco_inicio,
+            "Crescimento (%)": percentual
+        }, index=self.tickers)
+
+    def _tabela(self, inicio, fim):
+        if inicio is None and fim is None:
+            return self._completo
+        return self.crescimento(inicio, fim)
+
+    def top(self, n=20, metrica="absoluto", maiores=True, inicio=None, fim=None):
+        """Os ``n`` tickers com maior (ou menor) crescimento."""
+        tabela = self._tabela(inicio, fim)
+        escolhidos = _selecionar(tabela[METRICAS[metrica]].to_numpy(), n, maiores)
+        return tabela.iloc[escolhidos].reset_index()
+
+    def topPorSetor(self, n=3, metrica="absoluto", maiores=True, inicio=None, fim=None):
+        """Os ``n`` melhores (ou piores) tickers de cada setor.
+
+        São os mesmos tickers do ``groupby('Setor').head(n)`` sobre a tabela
+        ordenada do notebook, mas agrupados: os setores vêm na ordem do seu
+        melhor ticker, e dentro do setor os tickers ficam do melhor para o pior.
+        """
+        tabela = self._tabela(inicio, fim)
+        valores = tabela[METRICAS[metrica]].to_numpy()
+        partes = []
+        for indices in self._tickers_por_setor:
+            escolhidos = indices[_selecionar(valores[indices], n, maiores)]
+            if len(escolhidos):
+                partes.append(escolhidos)
+        # ordena os setores pelo primeiro (melhor) ticker de cada um
+        sinal = -1 if maiores else 1
+        partes.sort(key=lambda escolhidos: sinal * valores[escolhidos[0]])
+        if not partes:
+            return tabela.iloc[[]].reset_index()
+        return tabela.iloc[np.concatenate(partes)].reset_index()
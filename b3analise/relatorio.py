@@ -0,0 +1,191 @@
+"""Relatório de figuras gerado em lote, sem tela, direto para arquivos.
+
+No notebook as figuras (pizza de setores, top 20, crescimento por setor, top 3
+de cada setor e o FacetGrid mensal) eram desenhadas uma após a outra com
+``plt.show()``, o top 3 anotava cada barra em um laço Python e filtrava o
+DataFrame uma vez por setor. Aqui:
+
+- as figuras usam ``matplotlib.figure.Figure`` com o canvas Agg, sem
+  ``pyplot`` (nada de estado global nem janela), e são gravadas em arquivo;
+- os dados de cada figura saem dos agregados já calculados (``RollupSetores``
+  e ``RankingCrescimento``) e são separados por setor com um único groupby;
+- as anotações das barras usam ``bar_label`` em uma chamada por eixo;
+- as figuras são independentes e são renderizadas em paralelo por um
+  ``ProcessPoolExecutor`` (cada tarefa recebe só as tabelas pequenas da sua
+  figura).
+
+Além das figuras gerais, cada setor ganha uma figura própria com os seus
+melhores tickers e a valorização mensal.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+
+from b3analise.instrumentacao import etapa
+
+
+def _nomeArquivo(texto):
+    return re.sub(r"[^0-9a-z]+", "_", str(texto).lower()).strip("_") or "sem_nome"
+
+
+def _salvar(figura, caminho, dpi):
+    figura.savefig(caminho, dpi=dpi, bbox_inches="tight")
+    return caminho
+
+
+def _eixoMensal(ax, rotulos, passo=6):
+    # um rótulo a cada ``passo`` meses para o eixo continuar legível
+    posicoes = np.arange(len(rotulos))
+    ax.set_xticks(posicoes[::passo], labels=list(rotulos[::passo]), rotation=90, fontsize=9)
+
+
+def figuraPizzaSetores(contagens, caminho, dpi=100):
+    figura = Figure(figsize=(8, 6))
+    ax = figura.add_subplot()
+    ax.pie(contagens.to_numpy(), autopct="%1.1f%%", startangle=90, pctdistance=0.85,
+           textprops={"fontsize": 9})
+    ax.legend(contagens.index.astype(str), title="Setores", loc="upper left", bbox_to_anchor=(0.9, 0.8))
+    ax.set_title("Distribuição de Empresas por Setor")
+    ax.axis("equal")
+    return _salvar(figura, caminho, dpi)
+
+
+def figuraTopTickers(top, caminho, dpi=100):
+    figura = Figure(figsize=(10, 6))
+    ax = figura.add_subplot()
+    ax.bar(top["Ticker"].astype(str), top["Crescimento"], color="skyblue")
+    ax.set_xlabel("Ticker")
+    ax.set_ylabel("Crescimento (%)")
+    ax.set_title("Ações que com maior aumento")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.grid(axis="y")
+    return _salvar(figura, caminho, dpi)
+
+
+def figuraCrescimentoSetores(crescimento, caminho, dpi=100):
+    figura = Figure(figsize=(10, 6))
+    ax = figura.add_subplot()
+    cores = colormaps["viridis"](np.linspace(0, 1, max(len(crescimento), 1)))
+    ax.bar(crescimento["Setor"].astype(str), crescimento["sector_change"], color=cores)
+    ax.set_title("Crescimento no preço da Ação por Setor")
+    ax.set_xlabel("Setor")
+    ax.set_ylabel("Crescimento Médio(R$)")
+    ax.tick_params(axis="x", labelrotation=90)
+    return _salvar(figura, caminho, dpi)
+
+
+def _barrasTop(ax, dados, titulo):
+    cores = colormaps["tab10"](np.arange(len(dados)) % 10)
+    barras = ax.bar(dados["Ticker"].astype(str), dados["Crescimento"], color=cores)
+    # anota só as barras positivas, como no notebook
+    ax.bar_label(barras, labels=[f"{v:.2f}" if v > 0 else "" for v in dados["Crescimento"]])
+    ax.set_title(titulo)
+
+
+def figuraTopPorSetor(top_por_setor, caminho, dpi=100):
+    grupos = list(top_por_setor.groupby("Setor", sort=False, observed=True))
+    linhas = len(grupos) // 3 + 1
+    figura = Figure(figsize=(15, 4 * linhas))
+    eixos = figura.subplots(nrows=linhas, ncols=3).flatten()
+    for ax, (setor, dados) in zip(eixos, grupos):
+        _barrasTop(ax, dados, f"Setor: {setor}")
+    for ax in eixos[len(grupos):]:
+        figura.delaxes(ax)
+    figura.tight_layout()
+    return _salvar(figura, caminho, dpi)
+
+
+def figuraEvolucaoSetores(evolucao, caminho, dpi=100):
+    grupos = list(evolucao.groupby("Setor", sort=True, observed=True))
+    linhas = (len(grupos) + 1) // 2
+    figura = Figure(figsize=(18, 6 * max(linhas, 1)))
+    eixos = np.atleast_1d(figura.subplots(nrows=max(linhas, 1), ncols=2)).flatten()
+    cores = colormaps["tab10"](np.arange(len(grupos)) % 10)
+    for ax, cor, (setor, dados) in zip(eixos, cores, grupos):
+        ax.plot(np.arange(len(dados)), dados["Valorização"].to_numpy(), color=cor)
+        ax.set_title(f"Setor = {setor}")
+        _eixoMensal(ax, dados["rotulo"].to_numpy())
+    for ax in eixos[len(grupos):]:
+        figura.delaxes(ax)
+    figura.suptitle("Crescimento dos Setores ao Longo dos Anos (por Setor)", fontsize=16)
+    figura.subplots_adjust(bottom=0.2, top=0.95)
+    return _salvar(figura, caminho, dpi)
+
+
+def figuraSetor(setor, top, evolucao, caminho, dpi=100):
+    """Figura de um setor: melhores tickers e valorização mensal."""
+    figura = Figure(figsize=(14, 5))
+    ax_top, ax_evolucao = figura.subplots(ncols=2, width_ratios=(1, 2))
+    _barrasTop(ax_top, top, "Maiores crescimentos")
+    ax_evolucao.plot(np.arange(len(evolucao)), evolucao["Valorização"].to_numpy())
+    ax_evolucao.axhline(0, color="gray", linewidth=0.8)
+    ax_evolucao.set_title("Valorização mensal média (%)")
+    _eixoMensal(ax_evolucao, evolucao["rotulo"].to_numpy())
+    figura.suptitle(f"Setor: {setor}", fontsize=14)
+    figura.tight_layout()
+    return _salvar(figura, caminho, dpi)
+
+
+def _renderizar(tarefa):
+    funcao, argumentos = tarefa
+    return funcao(**argumentos)
+
+
+def tarefasRelatorio(rollup, ranking, stock_info_df, diretorio, n_top=20, n_setor=3,
+                     n_top_setor=10, formato="png", dpi=100):
+    """Lista de ``(função, argumentos)`` com todas as figuras do relatório."""
+    caminho = lambda nome: os.path.join(diretorio, f"{nome}.{formato}")
+    contagens = stock_info_df["Setor"].value_counts()
+    contagens = contagens[contagens > 0]
+
+    crescimento = ranking.crescimento().dropna(subset=["Setor"])
+    crescimento_setores = crescimento.groupby("Setor").agg(sector_change=("Crescimento", "mean")) \
+        .reset_index().sort_values("sector_change", ascending=False)
+    evolucao = rollup.porSetor("mes").dropna(subset=["Valorização"])
+
+    tarefas = [
+        (figuraPizzaSetores, {"contagens": contagens, "caminho": caminho("setores_pizza"), "dpi": dpi}),
+        (figuraTopTickers, {"top": ranking.top(n_top), "caminho": caminho(f"top_{n_top}"), "dpi": dpi}),
+        (figuraCrescimentoSetores, {"crescimento": crescimento_setores,
+                                    "caminho": caminho("crescimento_setores"), "dpi": dpi}),
+        (figuraTopPorSetor, {"top_por_setor": ranking.topPorSetor(n_setor),
+                             "caminho": caminho(f"top_{n_setor}_por_setor"), "dpi": dpi}),
+        (figuraEvolucaoSetores, {"evolucao": evolucao, "caminho": caminho("evolucao_setores"), "dpi": dpi}),
+    ]
+
+    # uma figura por setor, com os dados separados por um único groupby
+    top_setor = dict(list(ranking.topPorSetor(n_top_setor).groupby("Setor", sort=False)))
+    for setor, dados in evolucao.groupby("Setor", observed=True):
+        if setor not in top_setor:
+            continue
+        tarefas.append((figuraSetor, {
+            "setor": setor, "top": top_setor[setor], "evolucao": dados,
+            "caminho": os.path.join(diretorio, "setores", f"{_nomeArquivo(setor)}.{formato}"), "dpi": dpi
+        }))
+    return tarefas
+
+
+def gerarRelatorio(rollup, ranking, stock_info_df, diretorio="relatorio", max_workers=None, **opcoes):
+    """Renderiza todas as figuras em ``diretorio`` e devolve os arquivos e o tempo.
+
+    Com ``max_workers=1`` as figuras são geradas no próprio processo.
+    """
+    inicio = time.perf_counter()
+    os.makedirs(os.path.join(diretorio, "setores"), exist_ok=True)
+    with etapa("dados_figuras"):
+        tarefas = tarefasRelatorio(rollup, ranking, stock_info_df, diretorio, **opcoes)
+    max_workers = max_workers or os.cpu_count() or 1
+    with etapa("renderizacao", linhas_entrada=len(tarefas)) as medicao:
+        if max_workers == 1:
+            arquivos = [_renderizar(tarefa) for tarefa in tarefas]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                arquivos = list(executor.map(_renderizar, tarefas))
+        medicao.linhas_saida = len(arquivos)
+    return {"arquivos": arquivos, "figuras": len(arquivos), "segundos": time.perf_counter() - inicio}
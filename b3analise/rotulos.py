@@ -0,0 +1,111 @@
+"""Geração vetorizada dos rótulos de retorno futuro (coluna ``resultado``).
+
+O notebook criava o ``resultado`` com ``stock_data['Adj Close'].shift(-1)``
+sobre a base inteira: o deslocamento atravessava a fronteira entre tickers (o
+último dia de um ticker era comparado com o primeiro do ticker seguinte) e
+comparava o Adj Close de amanhã com o Close de hoje.
+
+``MotorRotulos`` ordena a base uma única vez por (Ticker, data), guarda o fim
+do bloco contíguo de cada ticker e calcula retornos e rótulos para qualquer
+horizonte com deslocamentos de array: a linha ``i`` só tem futuro em ``h``
+dias se ``i + h`` ainda estiver dentro do bloco do seu ticker. Vários
+horizontes e limiares reaproveitam a mesma ordenação.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def blocosContiguos(df, coluna_grupo="Ticker", coluna_data="Data Negociacao B3"):
+    """Organiza a base em blocos contíguos por ticker, ordenados por data.
+
+    Retorna ``(ordem, inicios, fins)``: ``ordem`` é a permutação que ordena a
+    base por (ticker, data), ou ``None`` se ela já estiver ordenada, e
+    ``inicios``/``fins`` são as posições (na ordem ordenada) de início e fim
+    (exclusivo) do bloco de cada ticker.
+    """
+    grupo = df[coluna_grupo]
+    if isinstance(grupo.dtype, pd.CategoricalDtype):
+        codigos = grupo.cat.codes.to_numpy()
+    else:
+        codigos = pd.factorize(grupo, sort=True)[0]
+    datas = df[coluna_data].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+    # só ordena se a base ainda não estiver em blocos contíguos por ticker
+    dif_grupo = np.diff(codigos)
+    dif_data = np.diff(datas)
+    if np.all((dif_grupo > 0) | ((dif_grupo == 0) & (dif_data >= 0))):
+        ordem = None
+    else:
+        ordem = np.lexsort((datas, codigos))
+        codigos = codigos[ordem]
+
+    inicios = np.concatenate(([0], np.flatnonzero(np.diff(codigos)) + 1)) if len(codigos) else np.empty(0, dtype=np.int64)
+    fins = np.append(inicios[1:], len(codigos))
+    return ordem, inicios, fins
+
+
+class MotorRotulos:
+
+    def __init__(self, df, coluna_grupo="Ticker", coluna_data="Data Negociacao B3"):
+        self.df = df
+        self.ordem, self.inicios, fins = blocosContiguos(df, coluna_grupo, coluna_data)
+        # fim (exclusivo) do bloco do ticker de cada linha, na ordem ordenada
+        self.fim_bloco = np.repeat(fins, fins - self.inicios)
+        self.posicoes = np.arange(len(df))
+
+    def _ordenado(self, coluna):
+        valores = self.df[coluna].to_numpy(dtype=np.float64, na_value=np.nan)
+        return valores if self.ordem is None else valores[self.ordem]
+
+    def _original(self, valores):
+        # devolve os valores na ordem original das linhas do DataFrame
+        if self.ordem is None:
+            return valores
+        saida = np.empty_like(valores)
+        saida[self.ordem] = valores
+        return saida
+
+    def retornoFuturo(self, horizonte=1, coluna="Adj Close"):
+        """Retorno de ``coluna`` entre hoje e ``horizonte`` pregões à frente.
+
+        NaN quando o ticker não tem ``horizonte`` pregões depois da linha.
+        """
+        precos = self._ordenado(coluna)
+        futuro = np.full(len(precos), np.nan)
+        futuro[:len(precos) - horizonte] = precos[horizonte:]
+        futuro[self.posicoes + horizonte >= self.fim_bloco] = np.nan
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._original(futuro / precos - 1)
+
+    def rotulo(self, horizonte=1, limiar=0.0, coluna="Adj Close", sem_futuro=0):
+        """1 se o retorno em ``horizonte`` pregões for maior que ``limiar``, senão 0.
+
+        Linhas sem futuro dentro do ticker recebem ``sem_futuro`` (0 por padrão,
+        como no notebook; use -1 para poder descartá-las).
+        """
+        retorno = self.retornoFuturo(horizonte, coluna)
+        rotulo = (retorno > limiar).astype(np.int8)
+        rotulo[np.isnan(retorno)] = sem_futuro
+        return rotulo
+
+    def gerar(self, horizontes=(1,), limiares=(0.0,), coluna="Adj Close", sem_futuro=0):
+        """Retornos e rótulos de vários horizontes/limiares de uma vez.
+
+        Colunas ``retorno_futuro_<h>d`` e ``resultado_<h>d`` (ou
+        ``resultado_<h>d_<limiar>`` quando há mais de um limiar), alinhadas
+        ao índice do DataFrame original. O retorno é o de hoje até ``h``
+        pregões à frente, por isso o nome não coincide com o ``retorno_1d``
+        dos indicadores (variação em relação ao pregão anterior): são alvos,
+        não features.
+        """
+        saida = {}
+        for horizonte in horizontes:
+            retorno = self.retornoFuturo(horizonte, coluna)
+            saida[f"retorno_futuro_{horizonte}d"] = retorno
+            for limiar in limiares:
+                rotulo = (retorno > limiar).astype(np.int8)
+                rotulo[np.isnan(retorno)] = sem_futuro
+                nome = f"resultado_{horizonte}d" if len(limiares) == 1 else f"resultado_{horizonte}d_{limiar:g}"
+                saida[nome] = rotulo
+        return pd.DataFrame(saida, index=self.df.index)
@@ -0,0 +1,167 @@
+"""Gerador determinístico de dados de mercado sintéticos.
+
+Medir desempenho exigia acessar o Yahoo e o Investing.com. ``GeradorSintetico``
+produz, para qualquer quantidade de tickers, setores e anos, os mesmos
+formatos que a coleta devolve:
+
+- ``stockInfo()``: registros no formato do ``stock_info`` (com uma fração de
+  tickers sem setor, como os ``'N/A'`` reais);
+- ``stockPrice()``: o ``stock_price`` já no esquema compacto, preenchido
+  direto nos arrays finais (sem um DataFrame por ticker), o que permite
+  chegar a 10 mil tickers × 20 anos;
+- ``download()`` e ``info()``: o gerador também funciona como downloader da
+  ingestão e como backend da coleta, para exercitar essas etapas sem rede.
+
+Os retornos têm um fator de mercado, um fator por setor e um componente
+próprio do ticker; tickers podem começar depois do início do período
+(listagem) e terminar antes do fim (deslistagem). Tudo é derivado da
+``seed`` e do nome do ticker, então a mesma configuração gera sempre os
+mesmos dados.
+"""
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from b3analise.esquema import COLUNAS_FLOAT32, SUFIXO_B3, diaInteiro, normalizarTicker
+from b3analise.ingestao import COLUNAS_PRECO
+
+
+SETORES = ["Basic Materials", "Communication Services", "Consumer Cyclical", "Consumer Defensive",
+           "Energy", "Financial Services", "Healthcare", "Industrials", "Real Estate",
+           "Technology", "Utilities"]
+CLASSES = ("3", "4", "11", "34")
+
+
+def nomeTicker(indice):
+    # Quatro letras (a partir do índice, em base 26) e a classe da ação
+    letras = ""
+    valor = indice * 7919 + 11881  # espalha os prefixos
+    for _ in range(4):
+        valor, resto = divmod(valor, 26)
+        letras += chr(ord("A") + resto)
+    return letras + CLASSES[indice % len(CLASSES)]
+
+
+class GeradorSintetico:
+
+    def __init__(self, n_tickers=900, n_setores=11, anos=5, inicio="2019-01-01", seed=0,
+                 taxa_sem_setor=0.1, taxa_listagem=0.1, taxa_deslistagem=0.05, taxa_anomalias=0.0):
+        """``taxa_anomalias`` é a fração de linhas com preços ruins (Adj Close
+        negativo, Low acima do High ou saltos), para exercitar a validação."""
+        self.n_tickers = n_tickers
+        self.setores = [SETORES[i] if i < len(SETORES) else f"Setor {i + 1}" for i in range(n_setores)]
+        self.seed = seed
+        self.taxa_anomalias = taxa_anomalias
+        self.datas = pd.bdate_range(inicio, periods=int(anos * 252), name="Date")
+        self.tickers = [nomeTicker(i) for i in range(n_tickers)]
+
+        rng = np.random.default_rng([seed, 0])
+        n = len(self.datas)
+        self.setor_ticker = rng.integers(0, n_setores, n_tickers)
+        self.sem_setor = rng.random(n_tickers) < taxa_sem_setor
+        self.industria_ticker = rng.integers(0, 4, n_tickers)
+        # primeiro e último pregão de cada ticker (índices em self.datas)
+        self.primeiro = np.where(rng.random(n_tickers) < taxa_listagem, rng.integers(0, n, n_tickers), 0)
+        self.ultimo = np.where(rng.random(n_tickers) < taxa_deslistagem,
+                               rng.integers(self.primeiro, n), n - 1)
+        self.listagem = pd.Timestamp("2000-01-01") + pd.to_timedelta(rng.integers(0, 8000, n_tickers), unit="D")
+
+        # fatores comuns: mercado e um por setor
+        self.fator_mercado = rng.normal(0.0003, 0.011, n)
+        self.fator_setor = rng.normal(0, 0.006, (n_setores, n)) + rng.normal(0, 0.0003, (n_setores, 1))
+        self._indice = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    # -- formato stock_info ----------------------------------------------------
+
+    def registro(self, i):
+        setor = self.setores[self.setor_ticker[i]]
+        return {
+            "Ticker": self.tickers[i],
+            "Nome": f"Empresa {self.tickers[i]}",
+            "Setor": "N/A" if self.sem_setor[i] else setor,
+            "Indústria": "N/A" if self.sem_setor[i] else f"{setor} {self.industria_ticker[i] + 1}",
+            "Data": int(self.listagem[i].timestamp())
+        }
+
+    def stockInfo(self):
+        return [self.registro(i) for i in range(self.n_tickers)]
+
+    def info(self, ticker):
+        """Backend da coleta: mesmo formato do ``yf.Ticker(...).info``."""
+        registro = self.registro(self._indice[ticker])
+        return {"longName": registro["Nome"], "sector": registro["Setor"],
+                "industry": registro["Indústria"], "firstTradeDateEpochUtc": registro["Data"]}
+
+    # -- formato stock_price ---------------------------------------------------
+
+    def serie(self, i):
+        """OHLCV do ticker ``i`` entre o seu primeiro e último pregão."""
+        rng = np.random.default_rng([self.seed, zlib.crc32(self.tickers[i].encode())])
+        inicio, fim = int(self.primeiro[i]), int(self.ultimo[i]) + 1
+        n = fim - inicio
+        beta = rng.uniform(0.5, 1.5)
+        retornos = (beta * self.fator_mercado[inicio:fim] + self.fator_setor[self.setor_ticker[i], inicio:fim]
+                    + rng.normal(0, rng.uniform(0.01, 0.03), n))
+        close = rng.uniform(2, 80) * np.exp(np.cumsum(retornos))
+        abertura = close * np.exp(rng.normal(0, 0.005, n))
+        amplitude = np.abs(rng.normal(0, 0.01, (2, n)))
+        # proventos: o ajuste acumulado reduz o Adj Close dos dias mais antigos
+        ajuste = np.exp(-rng.uniform(0, 0.08) * (n - 1 - np.arange(n)) / 252)
+        colunas = {
+            "Open": abertura,
+            "High": np.maximum(abertura, close) * (1 + amplitude[0]),
+            "Low": np.minimum(abertura, close) * (1 - amplitude[1]),
+            "Close": close,
+            "Adj Close": close * ajuste,
+            "Volume": np.round(rng.lognormal(12, 1.5, n))
+        }
+        if self.taxa_anomalias:
+            self._anomalias(rng, colunas, n)
+        return inicio, fim, colunas
+
+    def _anomalias(self, rng, colunas, n):
+        linhas = np.flatnonzero(rng.random(n) < self.taxa_anomalias)
+        tipo = rng.integers(0, 3, len(linhas))
+        colunas["Adj Close"][linhas[tipo == 0]] = -4791500013568.0
+        colunas["Low"][linhas[tipo == 1]] = colunas["High"][linhas[tipo == 1]] * 1.1
+        for coluna in ("Open", "High", "Low", "Close", "Adj Close"):
+            colunas[coluna][linhas[tipo == 2]] *= 10
+
+    def download(self, symbols, start_date, end_date):
+        """Downloader da ingestão: ``{symbol: DataFrame}`` no formato do yfinance."""
+        inicio, fim = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        frames = {}
+        for symbol in symbols:
+            ticker = symbol[:-len(SUFIXO_B3)] if symbol.endswith(SUFIXO_B3) else symbol
+            if ticker not in self._indice:
+                continue
+            primeiro, ultimo, colunas = self.serie(self._indice[ticker])
+            frame = pd.DataFrame(colunas, index=self.datas[primeiro:ultimo])
+            frames[symbol] = frame[(frame.index >= inicio) & (frame.index <= fim)]
+        return frames
+
+    def stockPrice(self):
+        """``stock_price`` de todos os tickers, no mesmo formato de ``montarStockPrice``."""
+        tamanhos = (self.ultimo - self.primeiro + 1).astype(np.int64)
+        total = int(tamanhos.sum())
+        datas = np.empty(total, dtype="datetime64[ns]")
+        colunas = {coluna: np.empty(total, dtype=np.float32 if coluna in COLUNAS_FLOAT32 else np.float64)
+                   for coluna in COLUNAS_PRECO}
+        valores_datas = self.datas.to_numpy()
+        posicao = 0
+        for i in range(self.n_tickers):
+            primeiro, ultimo, serie = self.serie(i)
+            proxima = posicao + ultimo - primeiro
+            datas[posicao:proxima] = valores_datas[primeiro:ultimo]
+            for coluna in COLUNAS_PRECO:
+                colunas[coluna][posicao:proxima] = serie[coluna]
+            posicao = proxima
+
+        stock_price = pd.DataFrame(colunas, index=pd.DatetimeIndex(datas, name="Date"))
+        codigos = np.repeat(np.arange(self.n_tickers, dtype=np.int32), tamanhos)
+        tickers = pd.Categorical.from_codes(codigos, categories=pd.Index(self.tickers, dtype=object))
+        stock_price["Ticker"] = normalizarTicker(pd.Series(tickers)).array
+        stock_price["Dia"] = diaInteiro(datas)
+        return stock_price
@@ -0,0 +1,112 @@
+"""Seleção do universo de tickers a partir dos metadados, antes dos preços.
+
+O notebook baixava os preços de todos os símbolos do ``stock_info`` e só
+depois, na limpeza do ``stock_info_df`` e nos merges, descartava os tickers
+com ``Setor == 'N/A'`` e as empresas listadas depois do início da janela —
+cerca de um terço do download e da montagem era jogado fora. ``IndiceUniverso``
+monta um índice colunar sobre os metadados já coletados (setor, indústria e
+``firstTradeDateEpochUtc``) e resolve os filtros sobre ele; só os tickers que
+sobram seguem para o downloader.
+
+Cada ticker podado recebe uma máscara de bits com os motivos, como na
+validação:
+
+- ``sem_setor``: setor ``'N/A'`` (mantido com ``manter_sem_setor=True``);
+- ``setor_fora``: setor fora de ``setores``;
+- ``industria_fora``: indústria fora de ``industrias``;
+- ``sem_data``: sem data de listagem, quando há filtro de listagem;
+- ``listagem_recente``: listado depois de ``listado_ate`` ou há menos de
+  ``idade_minima_anos`` anos da data de referência;
+- ``excluido``: presente na lista ``excluir``.
+"""
+
+import numpy as np
+import pandas as pd
+
+from b3analise.coleta import VALOR_AUSENTE
+from b3analise.instrumentacao import etapa
+
+
+MOTIVOS_PODA = {
+    "sem_setor": 1,
+    "setor_fora": 2,
+    "industria_fora": 4,
+    "sem_data": 8,
+    "listagem_recente": 16,
+    "excluido": 32
+}
+
+
+class IndiceUniverso:
+
+    def __init__(self, stock_info):
+        """``stock_info``: lista de registros (ou DataFrame) da coleta."""
+        if not isinstance(stock_info, pd.DataFrame):
+            stock_info = pd.DataFrame(list(stock_info), columns=["Ticker", "Setor", "Indústria", "Data"])
+        info = stock_info.drop_duplicates("Ticker")
+        self.tickers = info["Ticker"].astype(str).to_numpy(dtype=object)
+        self.setor = pd.Categorical(info["Setor"].astype(str))
+        self.industria = pd.Categorical(info["Indústria"].astype(str))
+        # segundos desde a época; 'N/A' vira NaN
+        self.listagem = pd.to_numeric(info["Data"], errors="coerce").to_numpy(dtype=np.float64)
+        self._posicao = pd.Index(self.tickers)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def contagemPorSetor(self):
+        return pd.Series(self.setor).value_counts()
+
+    def _mascaraCategorias(self, categorico, valores):
+        # Resolve a pertinência pelos códigos: compara uma vez por categoria, não por ticker
+        permitidas = categorico.categories.isin([str(valor) for valor in valores])
+        codigos = categorico.codes
+        return (codigos >= 0) & permitidas[codigos]
+
+    def motivos(self, setores=None, industrias=None, excluir=None, listado_ate=None,
+                idade_minima_anos=None, data_referencia=None, manter_sem_setor=False):
+        """Máscara de motivos de poda de cada ticker (0 = selecionado)."""
+        motivos = np.zeros(len(self), dtype=np.int8)
+        if not manter_sem_setor:
+            motivos[np.asarray(self.setor == VALOR_AUSENTE)] |= MOTIVOS_PODA["sem_setor"]
+        if setores is not None:
+            motivos[~self._mascaraCategorias(self.setor, setores)] |= MOTIVOS_PODA["setor_fora"]
+        if industrias is not None:
+            motivos[~self._mascaraCategorias(self.industria, industrias)] |= MOTIVOS_PODA["industria_fora"]
+
+        limites = []
+        if listado_ate is not None:
+            limites.append(pd.Timestamp(listado_ate).timestamp())
+        if idade_minima_anos is not None:
+            referencia = pd.Timestamp.now() if data_referencia is None else pd.Timestamp(data_referencia)
+            limites.append((referencia - pd.Timedelta(days=365.25 * idade_minima_anos)).timestamp())
+        if limites:
+            sem_data = np.isnan(self.listagem)
+            motivos[sem_data] |= MOTIVOS_PODA["sem_data"]
+            motivos[~sem_data & (self.listagem > min(limites))] |= MOTIVOS_PODA["listagem_recente"]
+
+        if excluir:
+            motivos[self._posicao.isin([str(ticker) for ticker in excluir])] |= MOTIVOS_PODA["excluido"]
+        return motivos
+
+    def selecionar(self, **filtros):
+        """Resolve os filtros (os parâmetros de ``motivos``) e devolve ``(tickers, relatorio)``.
+
+        ``tickers`` mantém a ordem do ``stock_info``; o relatório traz o total
+        podado e a contagem por motivo.
+        """
+        with etapa("universo", linhas_entrada=len(self)) as medicao:
+            motivos = self.motivos(**filtros)
+            selecionados = motivos == 0
+            medicao.linhas_saida = int(selecionados.sum())
+        relatorio = {nome: int(np.count_nonzero(motivos & bit)) for nome, bit in MOTIVOS_PODA.items()}
+        relatorio.update({
+            "tickers": len(self),
+            "selecionados": int(selecionados.sum()),
+            "podados": int((~selecionados).sum())
+        })
+        return self.tickers[selecionados].tolist(), relatorio
+
+
+def selecionarUniverso(stock_info, **filtros):
+    return IndiceUniverso(stock_info).selecionar(**filtros)
@@ -0,0 +1,208 @@
+"""Validação vetorizada do ``stock_price`` com quarentena das linhas ruins.
+
+Os problemas de dados eram achados olhando: a busca por
+``Adj Close == -4791500013568.0``, o filtro ``Setor == 'N/A'`` e os
+``dropna()``/``drop_duplicates()`` sobre a base inteira já mesclada. Aqui
+todas as regras rodam em uma passada vetorizada por coluna, sobre a base
+ordenada uma única vez por (Ticker, data), e cada linha recebe uma máscara de
+bits com os motivos em que foi reprovada:
+
+- ``preco_ausente``: algum preço OHLC ausente;
+- ``preco_nao_positivo``: algum preço menor ou igual a zero;
+- ``ohlc_inconsistente``: Low acima de Open/Close ou High abaixo deles;
+- ``salto_extremo``: Close variou mais que ``limite_salto`` em relação ao
+  pregão anterior do mesmo ticker (num pico isolado só o pico é marcado, não
+  o pregão em que o preço volta ao normal);
+- ``chave_duplicada``: (Ticker, Date) repetido (a primeira ocorrência fica);
+- ``setor_ausente``: ticker sem setor (``'N/A'``) ou fora do ``stock_info``;
+- ``ticker_deslistado``: último pregão do ticker há mais de
+  ``dias_inatividade`` dias da data de referência;
+- ``ticker_jovem``: ticker com menos de ``min_pregoes`` pregões.
+
+As linhas reprovadas vão para a tabela de quarentena, com a máscara
+(``motivos``) e os nomes dos motivos (``motivo``).
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from b3analise.instrumentacao import etapa
+from b3analise.rotulos import blocosContiguos
+
+
+MOTIVOS = {
+    "preco_ausente": 1,
+    "preco_nao_positivo": 2,
+    "ohlc_inconsistente": 4,
+    "salto_extremo": 8,
+    "chave_duplicada": 16,
+    "setor_ausente": 32,
+    "ticker_deslistado": 64,
+    "ticker_jovem": 128
+}
+COLUNAS_OHLC = ["Open", "High", "Low", "Close"]
+
+
+def descreverMotivos(motivos):
+    """Converte as máscaras em texto (``"motivo_a|motivo_b"``).
+
+    Só as máscaras distintas são formatadas, não as linhas.
+    """
+    unicas, posicoes = np.unique(np.asarray(motivos), return_inverse=True)
+    textos = np.array(["|".join(nome for nome, bit in MOTIVOS.items() if mascara & bit)
+                       for mascara in unicas.tolist()], dtype=object)
+    return textos[posicoes]
+
+
+class ValidadorPrecos:
+
+    def __init__(self, stock_info=None, limite_salto=1.0, dias_inatividade=30, min_pregoes=60,
+                 colunas_preco=("Open", "High", "Low", "Close", "Adj Close"), data_referencia=None):
+        """``stock_info`` (lista de registros ou DataFrame) habilita a regra de setor.
+
+        ``limite_salto=1.0`` marca variações acima de +100% ou abaixo de -50%.
+        Sem ``data_referencia`` a deslistagem é medida a partir da última data
+        da própria base.
+        """
+        self.setores = None
+        if stock_info is not None:
+            info = stock_info if isinstance(stock_info, pd.DataFrame) else pd.DataFrame(stock_info)
+            self.setores = info.assign(Ticker=info["Ticker"].astype(str)).drop_duplicates("Ticker") \
+                .set_index("Ticker")["Setor"].astype(object)
+        self.limite_salto = limite_salto
+        self.dias_inatividade = dias_inatividade
+        self.min_pregoes = min_pregoes
+        self.colunas_preco = list(colunas_preco)
+        self.data_referencia = data_referencia
+
+    def motivos(self, stock_price):
+        """Máscara de motivos de cada linha, alinhada às linhas do ``stock_price``."""
+        dados = stock_price.reset_index() if "Date" not in stock_price.columns else stock_price
+        ticker = dados["Ticker"]
+        if not isinstance(ticker.dtype, pd.CategoricalDtype):
+            ticker = ticker.astype("category")
+        chaves = pd.DataFrame({"Ticker": ticker, "Date": dados["Date"]})
+        ordem, inicios, fins = blocosContiguos(chaves, "Ticker", "Date")
+        posicoes = np.arange(len(dados)) if ordem is None else ordem
+        tamanhos = fins - inicios
+        motivos = np.zeros(len(dados), dtype=np.uint16)
+
+        # regras por linha, uma coluna de cada vez
+        precos = {coluna: dados[coluna].to_numpy(dtype=np.float64, na_value=np.nan)[posicoes]
+                  for coluna in self.colunas_preco if coluna in dados.columns}
+        for coluna in COLUNAS_OHLC:
+            motivos[np.isnan(precos[coluna])] |= MOTIVOS["preco_ausente"]
+        for valores in precos.values():
+            motivos[valores <= 0] |= MOTIVOS["preco_nao_positivo"]
+        abertura, maxima, minima, fechamento = (precos[coluna] for coluna in COLUNAS_OHLC)
+        inconsistente = ((minima > np.fmin(abertura, fechamento)) | (maxima < np.fmax(abertura, fechamento))
+                         | (minima > maxima))
+        motivos[inconsistente] |= MOTIVOS["ohlc_inconsistente"]
+
+        # regras entre pregões consecutivos do mesmo ticker
+        codigos = ticker.cat.codes.to_numpy()[posicoes]
+        datas = dados["Date"].to_numpy(dtype="datetime64[ns]")[posicoes]
+        mesmo_ticker = np.zeros(len(dados), dtype=bool)
+        mesmo_ticker[1:] = codigos[1:] == codigos[:-1]
+        duplicada = np.zeros(len(dados), dtype=bool)
+        duplicada[1:] = mesmo_ticker[1:] & (datas[1:] == datas[:-1])
+        motivos[duplicada] |= MOTIVOS["chave_duplicada"]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            razao = np.full(len(dados), np.nan)
+            razao[1:] = fechamento[1:] / fechamento[:-1]
+            razao[~mesmo_ticker | duplicada] = np.nan
+            razao[razao <= 0] = np.nan
+            log_razao = np.log(razao)
+        limite = np.log1p(self.limite_salto)
+        salto = np.abs(log_razao) > limite
+        # pico isolado: salta na entrada e volta na saída; a volta não é marcada
+        saida = np.zeros(len(dados), dtype=bool)
+        saida[:-1] = salto[1:] & (np.sign(log_razao[1:]) != np.sign(log_razao[:-1]))
+        pico = salto & saida
+        volta = np.zeros(len(dados), dtype=bool)
+        volta[1:] = pico[:-1]
+        motivos[salto & ~volta] |= MOTIVOS["salto_extremo"]
+
+        # regras por ticker, espalhadas para as linhas do bloco
+        if len(dados):
+            por_ticker = np.zeros(len(inicios), dtype=np.uint16)
+            ultima = datas[fins - 1]
+            referencia = (np.datetime64(pd.Timestamp(self.data_referencia), "ns")
+                          if self.data_referencia is not None else datas.max())
+            por_ticker[ultima < referencia - np.timedelta64(self.dias_inatividade, "D")] |= MOTIVOS["ticker_deslistado"]
+            por_ticker[tamanhos < self.min_pregoes] |= MOTIVOS["ticker_jovem"]
+            if self.setores is not None:
+                nomes = np.asarray(ticker.cat.categories, dtype=object)[codigos[inicios]]
+                setor = self.setores.reindex(pd.Index(nomes).astype(str)).to_numpy()
+                sem_setor = pd.isna(setor) | (setor == "N/A")
+                por_ticker[sem_setor] |= MOTIVOS["setor_ausente"]
+            motivos |= np.repeat(por_ticker, tamanhos)
+
+        # volta para a ordem original das linhas
+        saida_motivos = np.empty_like(motivos)
+        saida_motivos[posicoes] = motivos
+        return saida_motivos
+
+    def _separar(self, linhas, motivos, inicio):
+        reprovadas = motivos != 0
+        validos = linhas[~reprovadas]
+        quarentena = linhas[reprovadas].assign(motivos=motivos[reprovadas])
+        quarentena["motivo"] = descreverMotivos(quarentena["motivos"])
+        relatorio = {nome: int(np.count_nonzero(motivos & bit)) for nome, bit in MOTIVOS.items()}
+        relatorio.update({
+            "linhas": len(linhas),
+            "linhas_quarentena": int(reprovadas.sum()),
+            "segundos": time.perf_counter() - inicio
+        })
+        return validos, quarentena, relatorio
+
+    def validar(self, stock_price):
+        """Separa as linhas válidas da quarentena.
+
+        Retorna ``(validos, quarentena, relatorio)``; ``quarentena`` tem as
+        colunas originais mais ``motivos`` (máscara) e ``motivo`` (texto), e o
+        relatório traz a contagem de linhas por motivo.
+        """
+        inicio = time.perf_counter()
+        with etapa("validacao", linhas_entrada=len(stock_price)) as medicao:
+            motivos = self.motivos(stock_price)
+            resultado = self._separar(stock_price, motivos, inicio)
+            medicao.linhas_saida = len(resultado[0])
+        return resultado
+
+    def validarIncremento(self, novas, contexto):
+        """Valida as linhas ``novas`` de uma atualização contra o histórico gravado.
+
+        ``contexto`` são os pregões já aceitos dos mesmos tickers (ao menos o
+        último de cada um), usados nas regras entre pregões: o salto é medido
+        a partir do último Close gravado e um pregão já gravado conta como
+        chave repetida. Tickers com histórico no ``contexto`` já passaram pela
+        regra de histórico curto, que só vale para os tickers novos e é julgada
+        sobre todas as linhas novas de cada um: quem chama deve passar também
+        as linhas de um ticker novo que ficaram em quarentena nas atualizações
+        anteriores (a ``AtualizacaoIncremental`` passa todos os pregões que
+        ainda não estão no dataset), para que ele seja aceito quando completar
+        ``min_pregoes``. Só as linhas novas são devolvidas, como em ``validar``.
+        """
+        inicio = time.perf_counter()
+        with etapa("validacao", linhas_entrada=len(novas)) as medicao:
+            novas_colunas = novas.reset_index() if "Date" not in novas.columns else novas
+            contexto = contexto.reset_index() if "Date" not in contexto.columns else contexto
+            colunas = [coluna for coluna in novas_colunas.columns if coluna in contexto.columns]
+            # as novas vêm antes: a ordenação é estável, então num pregão repetido
+            # quem fica marcado é a cópia já gravada
+            juntas = pd.concat([novas_colunas[colunas].astype({"Ticker": str}),
+                                contexto[colunas].astype({"Ticker": str})], ignore_index=True)
+            motivos = self.motivos(juntas)[:len(novas)]
+            conhecidos = novas_colunas["Ticker"].astype(str).isin(set(contexto["Ticker"].astype(str))).to_numpy()
+            motivos[conhecidos] &= np.uint16(~MOTIVOS["ticker_jovem"] & 0xFFFF)
+            resultado = self._separar(novas, motivos, inicio)
+            medicao.linhas_saida = len(resultado[0])
+        return resultado
+
+
+def validarPrecos(stock_price, stock_info=None, **configuracao):
+    return ValidadorPrecos(stock_info, **configuracao).validar(stock_price)
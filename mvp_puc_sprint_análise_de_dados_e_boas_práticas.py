@@ -39,17 +39,21 @@ import warnings
 warnings.filterwarnings("ignore")
 
 # Importação de pacotes
+# (sklearn, seaborn e as bibliotecas de coleta são importados pelas etapas que
+# os usam; fora do Colab as mesmas etapas rodam com `python -m b3analise`)
+import contextlib
+
 import pandas as pd
 import yfinance as yf
-import numpy as np
-import missingno as ms # para tratamento de missings
-## Transformações Numéricas
-from sklearn.preprocessing import MinMaxScaler # para normalização
-from sklearn.preprocessing import StandardScaler # para padronização
-## Transformações Categóricas
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.preprocessing import OrdinalEncoder
-from sklearn.preprocessing import LabelEncoder
+
+from b3analise.instrumentacao import Instrumentacao
+
+# Instrumentação da execução inteira: as etapas marcadas pelo pacote (download,
+# montagem, validação, agregados, merge, rótulos, scaler, one-hot, figuras...)
+# são medidas até a última célula, que imprime a tabela de tempo por etapa
+instrumentacao = Instrumentacao()
+execucao = contextlib.ExitStack()
+execucao.enter_context(instrumentacao.ativar())
 
 ticker = "PETR4.SA"
 start_date = "2023-01-01"
@@ -90,8 +94,13 @@ logger.disabled = True
 logger.propagate = False
 
 import investpy
-import pandas as pd
-import yfinance as yf
+
+from b3analise.cache import CacheMercado
+
+# Cache local dos dados coletados; com MODO_OFFLINE = True o notebook usa apenas
+# o que já está em disco, sem acessar o Investing.com nem o Yahoo
+cache = CacheMercado("cache_b3", ttl_metadados=7 * 24 * 3600)
+MODO_OFFLINE = False
 
 
 # Função para obter todos os tickers da bolsa brasileira (B3)
@@ -100,64 +109,74 @@ def getTodosTickersBrasileiros():
     tickers = stocks['symbol'].tolist()
     return tickers
 
-def getTickerInfo(ticker):
-    stock = yf.Ticker(ticker + ".SA")
-    info = stock.info
-    # print(info)
-    return {
-        "nome": info.get("longName", "N/A"),
-        "setor": info.get("sector", "N/A"),
-        "indústria": info.get("industry", "N/A"),
-        "data_entrada_bolsa": info.get("firstTradeDateEpochUtc", "N/A")
-    }
-
-
-# Obtendo a lista de Tickers Brasileiros
-tickers = getTodosTickersBrasileiros()
-
-# Obtendo Informações da empresa para cada Ticker
-stock_info = []
-for ticker in tickers:
-    ticker_info = getTickerInfo(ticker)
-    if ticker_info:
-        stock_info.append({
-            "Ticker": ticker,
-            "Nome": ticker_info["nome"],
-            "Setor": ticker_info["setor"],
-            "Indústria": ticker_info["indústria"],
-            "Data": ticker_info["data_entrada_bolsa"]
-        })
+
+if MODO_OFFLINE:
+    stock_info = cache.carregarMetadados()
+    tickers = [stock["Ticker"] for stock in stock_info]
+else:
+    # Obtendo a lista de Tickers Brasileiros
+    tickers = getTodosTickersBrasileiros()
+
+    # Obtendo Informações da empresa para cada Ticker
+    # As consultas são feitas em paralelo (pool de threads limitado a 20 req/s),
+    # com novas tentativas; tickers sem retorno não são gravados no cache e são
+    # consultados de novo na próxima execução.
+    # Apenas tickers fora do cache (ou com cache expirado) são consultados
+    stock_info = cache.atualizarMetadados(tickers, max_workers=16, max_por_segundo=20)
 
 print("Lista de Tickers:")
 print(tickers)
 print("\nInfo dos 5 primeiros Tickers:")
 print(stock_info[:5])
 
+# Seleção do universo pelos metadados antes de baixar os preços: tickers sem
+# setor seriam descartados só depois da coleta, então nem entram no download.
+# Empresas listadas durante a janela continuam no universo, como na análise
+# original; para ficar só com o histórico completo, use
+# selecionar(listado_ate="2019-01-01")
+from b3analise.universo import IndiceUniverso
+
+universo, relatorio_universo = IndiceUniverso(stock_info).selecionar()
+print(relatorio_universo)
+
 """Para finalizar a etapa de coleta de dados e concluir a construção da nossa base, de forma que possamos avançar para a descrição, visualização e pré-processamento dos dados, precisamos utilizar o exemplo inicial criado para recuperar os dados de transações financeiras dos tickers, em que obtivemos os dados da Petrobras no período de janeiro a dezembro de 2023."""
 
-def downloadTickerData(ticker, start_date="2019-01-01", end_date="2024-12-31"):
-    try:
-        stock_data = yf.download(ticker, start=start_date, end=end_date)
-        stock_data["Ticker"] = ticker
+# Os tickers são baixados em lotes paralelos e o stock_price é montado uma única
+# vez ao final, em vez de concatenar o DataFrame a cada ticker baixado.
+# Só são baixados os dias posteriores ao que já está salvo no cache
+if MODO_OFFLINE:
+    stock_price = cache.carregarPrecos(universo, start_date="2019-01-01", end_date="2024-12-31")
+else:
+    stock_price, relatorio_ingestao = cache.atualizarPrecos(
+        universo,
+        start_date="2019-01-01",
+        end_date="2024-12-31"
+    )
+    print(f"Tickers atualizados: {relatorio_ingestao['tickers_atualizados']} | "
+          f"Linhas novas: {relatorio_ingestao['linhas_novas']} | "
+          f"Linhas: {relatorio_ingestao['linhas']}")
 
-        return stock_data
-    except KeyError:
-        print("Ticker Key error!", ticker)
-        return None
+stock_price = stock_price.reset_index()
+print(stock_price.head())
 
-stock_price = None
-for stock in stock_info:
-    price_info = downloadTickerData(stock["Ticker"]+".SA")
+from b3analise.armazenamento import DatasetPrecos
 
-    if stock_price is None:
-      stock_price = price_info
-      continue
+# Validação de cada ingestão: preços ausentes ou não positivos, OHLC
+# inconsistente, saltos extremos, (Ticker, Date) repetidos, tickers sem setor,
+# deslistados ou com histórico curto vão para a quarentena com o motivo
+import os
 
-    if price_info is not None:
-        stock_price = pd.concat([stock_price, price_info])
+from b3analise.validacao import MOTIVOS, ValidadorPrecos
 
-stock_price = stock_price.reset_index()
-print(stock_price.head())
+os.makedirs("dados_b3", exist_ok=True)
+stock_price, quarentena, relatorio_validacao = ValidadorPrecos(stock_info).validar(stock_price)
+quarentena.to_parquet("dados_b3/quarentena.parquet", index=False)
+print(relatorio_validacao)
+
+# Persistindo o stock_price particionado por Ticker/Ano, assim as análises
+# seguintes podem carregar só as colunas e os tickers que precisam
+dataset_precos = DatasetPrecos("dados_b3/precos")
+dataset_precos.salvar(stock_price)
 
 """# Estatísticas descritivas:
 
@@ -194,6 +213,13 @@ stock_info_df = stock_info_df[stock_info_df['Setor'] != 'N/A']
 
 # Único valor número é a Data que e está em epoch time
 stock_info_df['Data'] = pd.to_numeric(stock_info_df['Data'], errors='coerce')
+
+from b3analise.esquema import aplicarEsquemaInfo, usoMemoria
+
+# Nome, Setor e Indústria viram categóricos e o Ticker compartilha as categorias
+# do stock_price (que já chega da ingestão categórico e sem o sufixo .SA),
+# assim os merges seguintes são feitos pelos códigos inteiros
+stock_info_df = aplicarEsquemaInfo(stock_info_df, stock_price['Ticker'].cat.categories)
 # Cálculo do mínimo, máximo, mediana, moda, média e desvio padrão
 min_val = stock_info_df['Data'].min()
 max_val = stock_info_df['Data'].max()
@@ -246,34 +272,30 @@ stock_price = stock_price.reset_index()
 print(stock_price.columns)
 print(stock_price[stock_price['Date'] == '2019-01-02'])
 
-def calcEstatisticas(df, coluna):
-	# Cálculo do mínimo, máximo, mediana, moda, média e desvio padrão
-	min_val = df[coluna].min()
-	max_val = df[coluna].max()
-	median_val = df[coluna].median()
-	mode_val = df[coluna].mode().iloc[0]  # Obtém a primeira moda
-	mean_val = df[coluna].mean()
-	std_val = df[coluna].std()
+from b3analise.estatisticas import calcularEstatisticas
+
+# Todas as colunas numéricas são calculadas de uma vez (uma ordenação por coluna)
+estatisticas_precos = calcularEstatisticas(stock_price, ["Open", "Close", "Low", "High", "Adj Close", "Volume"])
 
-	# Contar valores ausentes
-	missing_values = df[coluna].isnull().sum()
+def calcEstatisticas(estatisticas, coluna):
+	resultado = estatisticas.loc[coluna]
 
 	# Exibir os resultados
 	print(f"-- Resultado Coluna {coluna} --")
-	print(f"Mínimo: {min_val}")
-	print(f"Máximo: {max_val}")
-	print(f"Mediana: {median_val}")
-	print(f"Moda: {mode_val}")
-	print(f"Média: {mean_val}")
-	print(f"Desvio Padrão: {std_val}")
-	print(f"Número de valores ausentes: {missing_values}\n")
-
-calcEstatisticas(stock_price, "Open")
-calcEstatisticas(stock_price, "Close")
-calcEstatisticas(stock_price, "Low")
-calcEstatisticas(stock_price, "High")
-calcEstatisticas(stock_price, "Adj Close")
-calcEstatisticas(stock_price, "Volume")
+	print(f"Mínimo: {resultado['Mínimo']}")
+	print(f"Máximo: {resultado['Máximo']}")
+	print(f"Mediana: {resultado['Mediana']}")
+	print(f"Moda: {resultado['Moda']}")
+	print(f"Média: {resultado['Média']}")
+	print(f"Desvio Padrão: {resultado['Desvio Padrão']}")
+	print(f"Número de valores ausentes: {int(resultado['Ausentes'])}\n")
+
+calcEstatisticas(estatisticas_precos, "Open")
+calcEstatisticas(estatisticas_precos, "Close")
+calcEstatisticas(estatisticas_precos, "Low")
+calcEstatisticas(estatisticas_precos, "High")
+calcEstatisticas(estatisticas_precos, "Adj Close")
+calcEstatisticas(estatisticas_precos, "Volume")
 
 # Número de atributos
 num_attributes = len(stock_price.columns)
@@ -284,7 +306,13 @@ num_instances = len(stock_price)
 print(f"Número de atributos: {num_attributes}")
 print(f"Número de instâncias: {num_instances}")
 
-stock_price[stock_price['Adj Close'] == -4791500013568.0]
+# Memória ocupada com os tipos compactos; a comparação com o formato antigo
+# (strings com .SA e float64) fica na suíte `python -m b3analise benchmark`
+print(f"stock_price: {usoMemoria(stock_price):.1f} MB")
+
+# Linhas retidas na validação (como o Adj Close de -4791500013568.0), por motivo
+print(quarentena.groupby('motivo').size())
+quarentena[quarentena['motivos'] & MOTIVOS['preco_nao_positivo'] > 0].head()
 
 """Ao analisar o ***stock_price***, notamos que ele possui alguns valores que parecem inconsistentes, como valores negativos para *Adj Close*. No entanto, isso se deve à forma como é calculado, pois essa conta envolve a dedução de custos de dividendos e desdobramentos de ações. Notamos também que, no ***stock_info***, temos dados de empresas que já estão fora da bolsa, ou seja, precisamos tratar esses dados para remover ações que não estão mais listadas para compra. Em resumo, temos:
 
@@ -310,7 +338,8 @@ Nessa etapa vamos criar as primeiras visualizações para facilitar a avaliaçã
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-setor_counts = stock_info_df['Setor'].value_counts()
+# Distribuição dos tickers do universo selecionado (os que têm preços)
+setor_counts = stock_info_df[stock_info_df['Ticker'].isin(universo)]['Setor'].value_counts()
 # Configurando o estilo do Seaborn
 sns.set(style="whitegrid")
 
@@ -339,20 +368,41 @@ import pandas as pd
 # Convertendo a coluna 'Data' para datetime
 stock_price['Date'] = pd.to_datetime(stock_price['Date'])
 
-# Ordenando o DataFrame por Ticker e Data
-stock_price_sorted = stock_price.sort_values(by=['Ticker', 'Date'])
+from b3analise.agregados import RollupSetores
+from b3analise.memoizacao import CacheAnalises
+
+# As tabelas derivadas abaixo ficam memoizadas pela versão dos dados e pelos
+# parâmetros: executar as células de novo (ou abrir outra sessão, que lê de
+# dados_b3/cache_analises) não recalcula nada enquanto o dataset de preços e o
+# stock_info_df não mudarem. No disco ficam no máximo 512 MB, e arquivos sem
+# uso há mais de 30 dias (versões antigas dos dados) são apagados
+cache_analises = CacheAnalises(max_itens=32, diretorio="dados_b3/cache_analises",
+                               max_bytes_disco=512 * 2**20, max_idade_disco=30 * 24 * 3600)
+
+
+# Agregados por Ticker/Setor em dia, mês e ano, calculados uma única vez e
+# usados por todas as análises de crescimento abaixo. Para isso basta o Close
+# e o Volume, então lemos só essas colunas do dataset particionado
+def construirRollup(dataset_precos, stock_info_df):
+    return RollupSetores(stock_info_df).construir(dataset_precos.carregar(colunas=['Close', 'Volume']))
+
+
+rollup = cache_analises.obter("rollup", construirRollup, dataset_precos, stock_info_df)
+rollup.salvar("dados_b3/agregados")
+
+# Preço inicial, final e a variação do preço de cada empresa (Ticker)
+stock_price_sorted = cache_analises.obter("crescimento_tickers", RollupSetores.crescimentoTickers, rollup)
+stock_price_sorted = stock_price_sorted[['preco_inicio', 'preco_fim', 'Crescimento']]
 
-# Calculando o preço inicial e final de cada empresa (Ticker)
-stock_price_sorted = stock_price_sorted.groupby('Ticker').agg(
-    preco_inicio=('Close', 'first'),
-    preco_fim=('Close', 'last')
-)
+from b3analise.ranking import RankingCrescimento
 
-# Calculando a variação do preço
-stock_price_sorted['Crescimento'] = stock_price_sorted['preco_fim'] - stock_price_sorted['preco_inicio']
+# Ranking sobre a tabela de crescimento por ticker: seleção parcial dos N
+# maiores (argpartition) em vez de ordenar todas as empresas. Também aceita
+# janelas de datas, ex.: ranking.top(20, inicio='2023-01-01', fim='2023-12-31')
+ranking = RankingCrescimento(rollup)
 
-# Ordenando as empresas pela variação de preço em ordem decrescente e pegando as top 20
-top_20 = stock_price_sorted.sort_values(by='Crescimento', ascending=False).head(20).reset_index()
+# Pegando as 20 empresas com maior variação de preço, em ordem decrescente
+top_20 = ranking.top(20, metrica='absoluto')
 
 print(top_20)
 # Criando o gráfico
@@ -367,12 +417,17 @@ plt.grid(axis='y')
 plt.show()
 
 stock_price_sorted = stock_price_sorted.reset_index()
-stock_price_sorted['Ticker'] = stock_price_sorted['Ticker'].str.replace('.SA', '', regex=False)
 
-stock_merged_data = stock_price_sorted.merge(stock_info_df, on='Ticker')
 
 # Calculando o crescimento médio por setor
-sector_growth = stock_merged_data.groupby('Setor').agg(sector_change=('Crescimento', 'mean'))
+def crescimentoSetores(stock_price_sorted, stock_info_df):
+    stock_merged_data = stock_price_sorted.merge(stock_info_df, on='Ticker')
+    sector_growth = stock_merged_data.groupby('Setor', observed=True).agg(sector_change=('Crescimento', 'mean'))
+    return stock_merged_data, sector_growth
+
+
+stock_merged_data, sector_growth = cache_analises.obter("crescimento_setores", crescimentoSetores,
+                                                        stock_price_sorted, stock_info_df)
 
 # Setor com maior e menor crescimento
 max_growth_sector = sector_growth.idxmax()
@@ -414,13 +469,15 @@ import matplotlib.pyplot as plt
 
 
 stock_merged_data['Valorização'] = stock_merged_data['Crescimento']
-stock_merged_data_sorted = stock_merged_data.sort_values(by='Crescimento', ascending=False)
 
-top3_por_setor = stock_merged_data_sorted.groupby('Setor').head(3)
+# Top 3 de cada setor pelo índice de setores do ranking, já agrupado por setor
+# (setores na ordem do seu melhor ticker)
+top3_por_setor = cache_analises.obter("top_por_setor", RankingCrescimento.topPorSetor, ranking, 3,
+                                      metrica='absoluto')
+top3_por_setor['Valorização'] = top3_por_setor['Crescimento']
 # print(top3_por_setor)
 
-top3_por_setor['Setor'] = pd.Categorical(top3_por_setor['Setor'], categories=top3_por_setor['Setor'].unique(), ordered=True)
-df_sorted = top3_por_setor.sort_values(by='Setor')
+df_sorted = top3_por_setor
 
 # Get the unique sectors
 sectors = df_sorted['Setor'].unique()
@@ -430,9 +487,8 @@ fig, axes = plt.subplots(nrows=len(sectors)//3 + 1, ncols=3, figsize=(15, 20))
 axes = axes.flatten()
 
 # Plot each sector in a separate subplot
-for i, setor in enumerate(sectors):
-    # Filter the data for the current sector
-    df_sector = df_sorted[df_sorted['Setor'] == setor]
+# (as linhas de cada setor são contíguas, então um único groupby substitui os filtros por setor)
+for i, (setor, df_sector) in enumerate(df_sorted.groupby('Setor', sort=False)):
 
     # Plot on the corresponding subplot
     sns.barplot(x='Ticker', y='Valorização',hue='Ticker', data=df_sector, ax=axes[i])
@@ -468,16 +524,12 @@ stock_price
 
 import seaborn as sns
 
-stock_merged_data2 = stock_price
-stock_merged_data2['Ticker'] = stock_merged_data2['Ticker'].str.replace('.SA', '', regex=False)
-stock_merged_data2 = stock_merged_data2.merge(stock_info_df, on='Ticker')
-
-# Agrupar por 'Setor' e 'MonthYear', a criação do MonthYear foi para reduzir o ruido e deixar os graficos mais legiveis
-stock_merged_data2['MonthYear'] = stock_merged_data2['Date'].dt.strftime('%m/%y')
-sector_growth = stock_merged_data2.groupby(['Setor', 'MonthYear'])['Close'].mean().reset_index()
-
-# Calcular o crescimento percentual ano a ano
-sector_growth['Valorização'] = sector_growth.groupby('Setor')['Close'].pct_change() * 100
+# Agrupar por 'Setor' e mês, o agrupamento mensal foi para reduzir o ruido e deixar os graficos mais legiveis.
+# O agregado mensal já vem dos agregados por ticker, com chave inteira de mês
+# (ordem cronológica) e a variação percentual entre meses em 'Valorização'
+sector_growth = cache_analises.obter("setores_mensal", RollupSetores.porSetor, rollup, 'mes')
+sector_growth = sector_growth.rename(columns={'rotulo': 'MonthYear'})
+print(cache_analises.estatisticas)
 
 # Remover valores nulos (pois o primeiro ano de cada setor não terá crescimento)
 sector_growth = sector_growth.dropna()
@@ -495,6 +547,24 @@ plt.subplots_adjust(top=.95)
 g.fig.suptitle('Crescimento dos Setores ao Longo dos Anos (por Setor)', fontsize=16)
 plt.show()
 
+# Modo relatório: as mesmas figuras (e uma por setor) geradas sem tela, direto
+# em arquivos, a partir dos agregados já calculados e em paralelo
+from b3analise.relatorio import gerarRelatorio
+
+relatorio_figuras = gerarRelatorio(rollup, ranking, stock_info_df, diretorio="dados_b3/relatorio")
+print(f"{relatorio_figuras['figuras']} figuras em {relatorio_figuras['segundos']:.1f}s")
+
+# Painel ticker × pregão (Close e Volume em float32, NaN nos dias sem negócio)
+# montado uma única vez: correlação entre setores e beta de cada ação contra a
+# média do seu setor sem pivot nem merge da base longa
+from b3analise.painel import MotorCorrelacao, PainelPrecos
+
+painel = PainelPrecos.deStockPrice(dataset_precos.carregar(colunas=['Close', 'Volume']), stock_info_df)
+motor_correlacao = MotorCorrelacao(painel)
+print(motor_correlacao.correlacaoSetores().round(2))
+betas_setor = motor_correlacao.betasMoveis(janela=60)
+print(betas_setor.iloc[:, -1].dropna().describe())
+
 """Após responder as cinco questões propostas e gerar visulizações para melhor compreender nossos dados, podemos avançar para a fase de ajustes e finalização do pré-processamento dos dados.
 
 # Pré-processamento de dados:
@@ -503,72 +573,64 @@ Nesse ponto, focaremos nas transformações essenciais na etapa de preparação
 """
 
 # Para utilizar os dados coletados para treino vamos primeiramente fazer um merge das informação similarmente ao que foi feito durante algumas etapas da visualização dos dados. Formando uma base de dados unica.
-stock_data = stock_price
-stock_data['Ticker'] = stock_data['Ticker'].str.replace('.SA', '', regex=False)
-stock_data = stock_data.merge(stock_info_df, on='Ticker')
-stock_data = stock_data.reset_index()
+# A base inteira não é montada em memória: o pipeline aplica o merge e todos os
+# passos abaixo bloco a bloco de tickers, lendo o dataset particionado. Para
+# visualizar o resultado de cada passo preparamos só o primeiro bloco.
+from b3analise.preprocessamento import PipelinePreprocessamento, blocosPorTicker
 
-stock_data
+pipeline = PipelinePreprocessamento(stock_info_df,
+                                    colunas_numericas=['Open', 'High', 'Low', 'Adj Close', 'Close', 'Volume'],
+                                    colunas_one_hot=['Ticker', 'Setor'],
+                                    coluna_label='Indústria',
+                                    indicadores=True)
 
-"""Primeiramente vamos começar removendo as colunas level_0 e index que foram introduzidas durante o processo de formação da base. Visto que esses indexes não tem relevancia para nossa base e futuro treinamento. Além delas, vamos remover a coluna Nome, pois acreito que não tem um valor siginificativo para o treinamento de um modelo que deseja prever o variação de ações com base em seu setores."""
+bloco_exemplo = next(blocosPorTicker(dataset_precos, tickers_por_bloco=50))
 
-stock_data = stock_data.drop(['level_0', 'index', "Nome"], axis=1)
-stock_data.columns
+"""Em cada bloco o pipeline:
 
-"""Em seguida vamos remover possiveis registros repetidos"""
+1. faz o merge com o ***stock_info_df*** e remove as colunas level_0 e index que foram introduzidas durante o processo de formação da base, visto que esses indexes não tem relevancia para nossa base e futuro treinamento. Além delas, remove a coluna Nome, pois acreito que não tem um valor siginificativo para o treinamento de um modelo que deseja prever o variação de ações com base em seu setores;
+2. remove possiveis registros repetidos e linhas com valores ausentes;
+3. converte as colunas Date e Data para datetime e as renomeia (Data Negociacao B3 e Data Entrada B3) para facilitar a compreenção dos seu significado;
+4. garante que os valores de Open, High, Low, Close Adj, Close, Volume são númericos;
+5. introduz uma coluna nova relevante para o treinamento do modelo supervisionado, uma coluna chamada resultado que representará se devemos ou não ter comprado a ação naquele dia.
 
-stock_data.drop_duplicates(inplace=True)
-stock_data.dropna(inplace=True)
-
-"""Próximo passo é converter e renomear as colunas Date e Data para datetime e renomea-las para facilitar a compreenção dos seu significado."""
-
-stock_data["Data Entrada B3"] = pd.to_datetime(stock_data["Data"], unit='s')
-stock_data["Data Negociacao B3"] = pd.to_datetime(stock_data["Date"])
-
-stock_data = stock_data.drop(['Data', 'Date'], axis=1)
-
-stock_data
-
-"""Agora vamos garantir que os valores de Open,	High, Low, Close Adj, Close,	Volume são númericos"""
-
-stock_data['Open'] = pd.to_numeric(stock_data['Open'])
-stock_data['High'] = pd.to_numeric(stock_data['High'])
-stock_data['Low'] = pd.to_numeric(stock_data['Low'])
-stock_data['Adj Close'] = pd.to_numeric(stock_data['Adj Close'], errors='coerce')
-stock_data['Close'] = pd.to_numeric(stock_data['Close'])
-stock_data['Volume'] = pd.to_numeric(stock_data['Volume'])
+O dia seguinte é buscado dentro do bloco de cada Ticker (o último pregão de um ticker não é comparado com o primeiro do ticker seguinte), comparando o Adj Close de amanhã com o Adj Close de hoje."""
 
+stock_data = pipeline.prepararBloco(bloco_exemplo)
 stock_data.head()
 
-"""Agora vamos introduzir uma coluna nova relevante para o treinamento do modelo supervisionado, uma coluna chamada resultado que representará se devemos ou não ter comprado a ação naquele dia."""
-
-stock_data = stock_data.sort_values(by=['Ticker', 'Data Negociacao B3'])
-
-# Step 2: Group by 'Ticker' and shift the 'Close' column by -1 within each group
-stock_data['Tomorrow_Close'] = stock_data['Adj Close'].shift(-1)
-
-# Step 3: Create the 'resultado' column (1 if tomorrow's Close is greater than today's, 0 otherwise)
-stock_data['resultado'] = (stock_data['Tomorrow_Close'] > stock_data['Close']).astype(int)
+# O motor de rótulos usado pelo pipeline gera outros horizontes sem reordenar
+# o bloco; as colunas retorno_futuro_<h>d e resultado_<h>d são alvos (olham o
+# futuro) e não devem entrar como features ao lado dos indicadores, ex.:
+# from b3analise.rotulos import MotorRotulos
+# MotorRotulos(stock_data).gerar(horizontes=(1, 5, 20), limiares=(0.0, 0.02))
 
-# Step 4: Drop the 'Tomorrow_Close' column (optional)
-stock_data = stock_data.drop(columns=['Tomorrow_Close'])
+# Em máquinas com vários núcleos, rótulos e indicadores de uma base já em
+# memória podem ser calculados por fatias de tickers em um pool de processos
+# (as colunas de preço vão para memória compartilhada, sem serializar
+# DataFrames), ex.:
+# from b3analise.paralelo import EstagioParalelo
+# EstagioParalelo(tickers_por_tarefa=25).executar(stock_price)
 
 # print(stock_data[(stock_data['Ticker'] == 'AALL34') & (stock_data['Data Negociacao B3'] == '2019-10-09')])
 # print(stock_data[(stock_data['Ticker'] == 'AALL34') & (stock_data['Data Negociacao B3'] == '2019-10-08')])
 
 """Próxima etapa é normailizar nossos valores númericos, como um dos nosso objetivos é treinar um modelo para fazer predições, a normalização pode levar a uma convergência mais rápida durante o treinamento, principalmente para algoritmos baseados em gradiente descendente, como regressão linear e redes neurais."""
 
-scaler = MinMaxScaler()
-stock_data[['Open', 'High', 'Low', 'Adj Close', 'Close', 'Volume']] = scaler.fit_transform(stock_data[['Open', 'High', 'Low', 'Adj Close', 'Close', 'Volume']])
-
-stock_data.head()
+# A normalização e as codificações abaixo são feitas pelo mesmo pipeline em
+# blocos de tickers: uma primeira passada ajusta o MinMaxScaler e coleta as
+# categorias dos encoders, e a segunda transforma cada bloco e grava o
+# resultado em disco.
+# Com indicadores=True cada bloco ganha retornos, médias móveis, volatilidade,
+# RSI, z-score do volume e defasagens do Close, calculados por ticker com
+# somas acumuladas (sem groupby().rolling(); a comparação de tempo com o pandas
+# fica na suíte `python -m b3analise benchmark`)
 
 """Proximo passo é aplicar OneHotEncoding nas nossas variaveis categoricas Setor,
 Indústria e Ticker. No entanto Indústria e Tickers possuem muitas categorias, o que estourou o limite de memoria do colabs. Logo para este caso vamos aplicar um label encoder para a coluna de indústria.
-"""
 
-label_encoder = LabelEncoder()
-stock_data['Indústria'] = label_encoder.fit_transform(stock_data['Indústria'])
+Com o processamento em blocos o OneHotEncoder de Ticker e Setor é aplicado apenas sobre as linhas de cada bloco, e o resultado é gravado de forma incremental em ***dados_b3/final_df.parquet***, sem que a base inteira codificada precise estar em memória.
+"""
 
 # num_sectors = stock_data['Setor'].nunique()
 # num_industries = stock_data['Indústria'].nunique()
@@ -579,19 +641,82 @@ stock_data['Indústria'] = label_encoder.fit_transform(stock_data['Indústria'])
 # print(f'Number of unique industries: {num_industries}')
 # print(len(stock_data))
 
-# Step 2: Apply One-Hot Encoding
-encoder = OneHotEncoder(sparse_output=False)
-encoded_features = encoder.fit_transform(stock_data[['Ticker', 'Setor']])
+linhas_gravadas = pipeline.executar(lambda: blocosPorTicker(dataset_precos, tickers_por_bloco=50),
+                                    "dados_b3/final_df.parquet")
+print(f"Linhas gravadas: {linhas_gravadas}")
+print(f"Mínimos usados na normalização: {pipeline.scaler.data_min_}")
+print(f"Máximos usados na normalização: {pipeline.scaler.data_max_}")
 
-# Create a DataFrame for the One-Hot Encoded features
-encoded_df = pd.DataFrame(encoded_features, columns=encoder.get_feature_names_out(['Ticker', 'Setor']))
-
-# Combine the original DataFrame with the encoded features
-final_df = pd.concat([stock_data, encoded_df], axis=1)
+import pyarrow.parquet as pq
 
+# Visualizando apenas o primeiro bloco gravado
+final_df = pq.ParquetFile("dados_b3/final_df.parquet").read_row_group(0).to_pandas()
 final_df.head()
 
-final_df = final_df.drop(['Ticker', 'Setor'], axis=1)
-final_df.head()
+"""Para o treinamento também exportamos X/y sem o one-hot denso: as features numéricas em float32 e os códigos inteiros de Ticker e Setor em arrays mapeados em memória (ou, com formato="npz", matrizes esparsas CSR por bloco)."""
+
+from b3analise.preprocessamento import exportarMatrizTreino
+
+metadados_treino = exportarMatrizTreino(pipeline,
+                                        lambda: blocosPorTicker(dataset_precos, tickers_por_bloco=50),
+                                        "dados_b3/treino", formato="memmap")
+print(metadados_treino["formas"])
+
+"""Para avaliar um modelo sem que o treino veja o futuro, as dobras de treino e teste seguem o calendário (walk-forward): o treino termina sempre antes do teste, com uma purga de um pregão porque o resultado de cada dia usa o preço do dia seguinte. Cada dobra é um conjunto de faixas de linhas sobre os arrays já gravados, sem copiar DataFrames."""
+
+import numpy as np
+
+from b3analise.divisao import DivisaoTemporal
+
+n_linhas = metadados_treino["linhas"]
+dias_treino = np.memmap("dados_b3/treino/dias.i32", dtype=np.int32, mode="r", shape=(n_linhas,))
+y_treino = np.memmap("dados_b3/treino/y.i8", dtype=np.int8, mode="r", shape=(n_linhas,))
+
+divisao = DivisaoTemporal(n_dobras=5, modo="expansivo", purga=1)
+for dobra in divisao.dividir(dias_treino):
+    # fatias dos memmaps, sem cópia: a taxa de alta do teste de cada dobra
+    altas = sum(int(fatia.sum()) for fatia in dobra.teste.visoes(y_treino))
+    print(dobra, f"| alta no teste: {altas / len(dobra.teste):.1%}")
+
+"""Agora, nosso conjunto de dados foi completamente processado e podemos utilizar o DataFrame ***final_df*** (gravado em blocos em ***dados_b3/final_df.parquet***) para treinar um modelo de previsão, tendo a coluna Resultado como a variável alvo (saída esperada). E assim, o modelo poderá decidir se devemos ou não adquirir a ação, indicando se o preço tende a subir ou não."""
+
+"""## Atualização diária
+
+Para incluir os pregões novos não é preciso rodar o notebook inteiro: a atualização incremental baixa apenas os dias que faltam, regrava só as partições atingidas, atualiza os agregados por ticker/setor e grava as features das linhas novas (e do último pregão anterior de cada ticker, cujo resultado passa a ter o dia seguinte) com o scaler e os encoders já ajustados. O ajuste completo só acontece com `reajustar=True` ou quando aparece um ticker, setor ou indústria novo.
+
+A atualização acessa a rede e vai além da janela 2019–2024 da análise, então só roda com `ATUALIZACAO_DIARIA = True` (e nunca com `MODO_OFFLINE = True`). Ela trabalha em ***dados_b3_diario***, criado na primeira execução como uma cópia da base da análise: o dataset, os agregados e o ***final_df*** de ***dados_b3*** continuam com a janela fixa. Os pregões novos também ficam no cache, mas as leituras da análise são filtradas pela janela."""
+
+pipeline.salvar("dados_b3/pipeline.pkl")
+ATUALIZACAO_DIARIA = False
+
+if ATUALIZACAO_DIARIA and not MODO_OFFLINE:
+    import shutil
+
+    from b3analise.incremental import AtualizacaoIncremental
+
+    if not os.path.isdir("dados_b3_diario"):
+        # cópia da base da análise; para recomeçar de uma nova base basta apagar o diretório
+        shutil.copytree("dados_b3/precos", "dados_b3_diario/precos")
+        shutil.copy("dados_b3/final_df.parquet", "dados_b3_diario/final_df.parquet")
+        shutil.copy("dados_b3/pipeline.pkl", "dados_b3_diario/pipeline.pkl")
+        rollup.salvar("dados_b3_diario/rollup")
+
+    atualizacao = AtualizacaoIncremental(cache, DatasetPrecos("dados_b3_diario/precos"),
+                                         RollupSetores.carregar("dados_b3_diario/rollup", stock_info_df),
+                                         PipelinePreprocessamento.carregar("dados_b3_diario/pipeline.pkl"),
+                                         diretorio="dados_b3_diario")
+
+    relatorio_diario = atualizacao.atualizar(
+        universo,
+        start_date="2019-01-01",
+        end_date=datetime.date.today().strftime("%Y-%m-%d")
+    )
+    print(relatorio_diario)
+
+    # Base de treino atualizada: final_df mais os incrementos diários
+    final_df_atualizado = atualizacao.lerFeatures()
 
-"""Agora, nosso conjunto de dados foi completamente processado e podemos utilizar o DataFrame ***final_df*** para treinar um modelo de previsão, tendo a coluna Resultado como a variável alvo (saída esperada). E assim, o modelo poderá decidir se devemos ou não adquirir a ação, indicando se o preço tende a subir ou não."""
\ No newline at end of file
+# Fim da execução: tempo de parede, CPU, linhas e memória de cada etapa
+execucao.close()
+print(instrumentacao.tabela())
+instrumentacao.salvarResumo("dados_b3/execucao.json")
@@ -0,0 +1,29 @@
+"""Fixtures comuns: bases pequenas do ``GeradorSintetico``, sem rede."""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from b3analise.esquema import aplicarEsquemaInfo  # noqa: E402
+from b3analise.sintetico import GeradorSintetico  # noqa: E402
+
+
+@pytest.fixture
+def gerador():
+    # tickers que entram e saem no meio do período exercitam os limites dos blocos
+    return GeradorSintetico(n_tickers=12, n_setores=4, anos=1, seed=7, taxa_sem_setor=0.0,
+                            taxa_listagem=0.25, taxa_deslistagem=0.25)
+
+
+@pytest.fixture
+def stock_price(gerador):
+    return gerador.stockPrice()
+
+
+@pytest.fixture
+def stock_info_df(gerador, stock_price):
+    return aplicarEsquemaInfo(pd.DataFrame(gerador.stockInfo()), stock_price["Ticker"].cat.categories)
@@ -0,0 +1,54 @@
+"""Agregados por ticker e setor contra o ``groupby`` das linhas originais."""
+
+import numpy as np
+import pandas as pd
+
+from b3analise.agregados import RollupSetores
+
+
+def test_rollup_atualizado_igual_ao_construido(gerador, stock_info_df, stock_price):
+    corte = gerador.datas[-25]
+    rollup = RollupSetores(stock_info_df).construir(stock_price[stock_price.index <= corte])
+    # pregões novos em duas levas, a primeira no meio de um mês já agregado
+    meio = gerador.datas[-10]
+    rollup.atualizar(stock_price[(stock_price.index > corte) & (stock_price.index <= meio)])
+    rollup.atualizar(stock_price[stock_price.index > meio])
+
+    construido = RollupSetores(stock_info_df).construir(stock_price)
+    for grao in construido.graos:
+        pd.testing.assert_frame_equal(rollup.tickers[grao].astype({"Ticker": str}),
+                                      construido.tickers[grao].astype({"Ticker": str}),
+                                      check_dtype=False)
+    pd.testing.assert_frame_equal(rollup.porSetor("mes"), construido.porSetor("mes"), check_dtype=False)
+    pd.testing.assert_frame_equal(rollup.crescimentoTickers(), construido.crescimentoTickers(),
+                                  check_dtype=False, check_index_type=False)
+
+
+
+def test_setor_mensal_igual_ao_groupby(stock_price, stock_info_df):
+    rollup = RollupSetores(stock_info_df).construir(stock_price)
+    setor = rollup.porSetor("mes").set_index(["Setor", "rotulo"])
+
+    # o cálculo do notebook: merge, mês/ano em texto e média do Close
+    dados = stock_price.reset_index().astype({"Ticker": str}).merge(
+        stock_info_df.astype({"Ticker": str, "Setor": str}), on="Ticker")
+    dados["MonthYear"] = dados["Date"].dt.strftime("%m/%y")
+    esperado = dados.groupby(["Setor", "MonthYear"])["Close"].mean()
+    np.testing.assert_allclose(setor["Close"].reindex(esperado.index).to_numpy(), esperado.to_numpy(), rtol=1e-6)
+    assert len(setor) == len(esperado)
+
+
+def test_crescimento_e_persistencia(stock_price, stock_info_df, tmp_path):
+    rollup = RollupSetores(stock_info_df).construir(stock_price)
+    crescimento = rollup.crescimentoTickers()
+    ordenados = stock_price.reset_index().sort_values(["Ticker", "Date"])
+    grupos = ordenados.groupby("Ticker", observed=True)["Close"]
+    esperado = (grupos.last() - grupos.first()).astype(np.float64)
+    esperado.index = esperado.index.astype(str)
+    np.testing.assert_allclose(crescimento["Crescimento"].rename(index=str).reindex(esperado.index),
+                               esperado, rtol=1e-6)
+
+    rollup.salvar(str(tmp_path))
+    lido = RollupSetores.carregar(str(tmp_path), stock_info_df)
+    pd.testing.assert_frame_equal(lido.porSetor("ano"), rollup.porSetor("ano"), check_dtype=False,
+                                  check_categorical=False)
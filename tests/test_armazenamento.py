@@ -0,0 +1,55 @@
+"""Dataset particionado: leitura filtrada igual ao filtro em pandas."""
+
+import numpy as np
+import pandas as pd
+
+from b3analise.armazenamento import DatasetPrecos
+
+
+def _ordenado(df):
+    df = df.reset_index() if "Date" not in df.columns else df
+    return df.astype({"Ticker": str}).sort_values(["Ticker", "Date"], ignore_index=True)
+
+
+def test_leitura_filtrada(stock_price, stock_info_df, tmp_path):
+    dataset = DatasetPrecos(str(tmp_path / "precos"))
+    # ordem de gravação diferente da alfabética
+    dataset.salvar(stock_price.iloc[::-1])
+
+    lido = dataset.carregar()
+    assert list(lido["Ticker"].cat.categories) == sorted(map(str, stock_price["Ticker"].unique()))
+    pd.testing.assert_frame_equal(_ordenado(lido)[["Date", "Ticker", "Close", "Volume"]],
+                                  _ordenado(stock_price)[["Date", "Ticker", "Close", "Volume"]],
+                                  check_dtype=False)
+
+    setor = stock_info_df["Setor"].astype(str).iloc[0]
+    do_setor = set(stock_info_df.loc[stock_info_df["Setor"] == setor, "Ticker"].astype(str))
+    tickers = sorted(map(str, stock_price["Ticker"].unique()))[:6]
+    inicio, fim = stock_price.index[100], stock_price.index[100] + pd.Timedelta(days=60)
+    parcial = dataset.carregar(colunas=["Close"], tickers=tickers, setores=[setor],
+                               stock_info=stock_info_df, inicio=inicio, fim=fim)
+    assert list(parcial.columns) == ["Date", "Ticker", "Close"]
+    esperado = stock_price[stock_price["Ticker"].astype(str).isin(do_setor & set(tickers))
+                           & (stock_price.index >= inicio) & (stock_price.index <= fim)]
+    pd.testing.assert_frame_equal(_ordenado(parcial), _ordenado(esperado)[["Date", "Ticker", "Close"]],
+                                  check_dtype=False)
+
+
+def test_reconstrucao_e_acrescimo(stock_price, tmp_path):
+    dataset = DatasetPrecos(str(tmp_path / "precos"))
+    dataset.salvar(stock_price)
+    removido = str(stock_price["Ticker"].iloc[0])
+
+    # a reconstrução não deixa partições de tickers que saíram
+    sem_ticker = stock_price[stock_price["Ticker"].astype(str) != removido]
+    dataset.salvar(sem_ticker)
+    assert removido not in set(dataset.carregar(colunas=["Close"])["Ticker"].astype(str))
+
+    # o acréscimo só troca as partições atingidas e substitui pregões repetidos
+    novas = stock_price[stock_price["Ticker"].astype(str) == removido]
+    repetida = sem_ticker.iloc[[5]].assign(Close=np.float32(-1.0))
+    dataset.acrescentar(pd.concat([novas, repetida]))
+    lido = _ordenado(dataset.carregar())
+    assert len(lido) == len(stock_price)
+    chave = (lido["Ticker"] == str(repetida["Ticker"].iloc[0])) & (lido["Date"] == repetida.index[0])
+    assert lido.loc[chave, "Close"].tolist() == [-1.0]
@@ -0,0 +1,88 @@
+"""Cache de preços e metadados: só o que falta é baixado, e nada se perde offline."""
+
+import pandas as pd
+
+from b3analise.cache import CacheMercado
+from b3analise.coleta import FakeBackend
+
+
+class DownloaderContado:
+    """Repassa ao gerador e guarda a janela pedida para cada ticker."""
+
+    def __init__(self, gerador):
+        self.gerador = gerador
+        self.pedidos = []
+
+    def download(self, symbols, start_date, end_date):
+        self.pedidos += [(symbol[:-3], start_date, end_date) for symbol in symbols]
+        return self.gerador.download(symbols, start_date, end_date)
+
+    def inicios(self, ticker):
+        return [inicio for nome, inicio, _ in self.pedidos if nome == ticker]
+
+
+def test_so_os_dias_faltantes_sao_baixados(gerador, tmp_path):
+    cache = CacheMercado(str(tmp_path))
+    downloader = DownloaderContado(gerador)
+    ticker = gerador.tickers[1]
+    datas = gerador.datas
+    cache.baixarFaltantes([ticker], downloader=downloader, start_date="2019-01-01", end_date=str(datas[99].date()))
+    novas, relatorio = cache.baixarFaltantes([ticker], downloader=downloader, start_date="2019-01-01",
+                                             end_date=str(datas[-1].date()))
+    assert downloader.inicios(ticker) == ["2019-01-01", str((datas[99] + pd.Timedelta(days=1)).date())]
+    assert novas.index.min() > datas[99]
+    assert relatorio["linhas_novas"] == len(novas)
+
+    # a janela de leitura recorta o que está em disco
+    janela = cache.carregarPrecos([ticker], start_date=datas[10], end_date=datas[20])
+    assert list(janela.index) == list(datas[10:21])
+
+
+def test_ticker_sem_dados_nao_baixa_a_janela_inteira_de_novo(gerador, tmp_path):
+    cache = CacheMercado(str(tmp_path))
+    downloader = DownloaderContado(gerador)
+    _, relatorio = cache.baixarFaltantes(["AUSENTE3"], downloader=downloader, start_date="2019-01-01",
+                                         end_date="2019-06-30")
+    assert relatorio["tickers_sem_dados"] == 1
+    cache.baixarFaltantes(["AUSENTE3"], downloader=downloader, start_date="2019-01-01", end_date="2019-06-30")
+    cache.baixarFaltantes(["AUSENTE3"], downloader=downloader, start_date="2019-01-01", end_date="2019-07-10")
+    # dentro do prazo só os dias depois da janela já consultada
+    assert downloader.inicios("AUSENTE3") == ["2019-01-01", "2019-06-30"]
+
+    # vencido o prazo, a janela inteira volta a ser consultada
+    vencido = CacheMercado(str(tmp_path), ttl_vazios=-1)
+    vencido.baixarFaltantes(["AUSENTE3"], downloader=downloader, start_date="2019-01-01", end_date="2019-07-10")
+    assert downloader.inicios("AUSENTE3")[-1] == "2019-01-01"
+
+
+def test_ticker_listado_depois_entra_quando_surgem_dados(gerador, tmp_path):
+    cache = CacheMercado(str(tmp_path))
+    indice = int(gerador.primeiro.argmax())
+    ticker, primeiro = gerador.tickers[indice], gerador.datas[gerador.primeiro[indice]]
+    antes = str((primeiro - pd.Timedelta(days=10)).date())
+    cache.baixarFaltantes([ticker], downloader=gerador, start_date="2019-01-01", end_date=antes)
+    assert ticker not in cache.ultimasDatas()
+    novas, _ = cache.baixarFaltantes([ticker], downloader=gerador, start_date="2019-01-01",
+                                     end_date=str(gerador.datas[-1].date()))
+    assert novas.index.min() == primeiro
+    assert ticker in cache.ultimasDatas()
+
+
+def test_metadados_expirados_continuam_legiveis(tmp_path):
+    cache = CacheMercado(str(tmp_path), ttl_metadados=10)
+    cache.salvarMetadados([{"Ticker": "PETR4", "Nome": "Petrobras", "Setor": "Energy",
+                            "Indústria": "Oil", "Data": 0}], agora=0)
+    assert cache.expirados(["PETR4"]) == ["PETR4"]
+    assert cache.carregarMetadados(["PETR4"])[0]["Setor"] == "Energy"
+
+    # consulta que falha não grava um registro "N/A" por cima do anterior
+    stock_info = cache.atualizarMetadados(["PETR4", "VALE3"], backend=FakeBackend(latencia=0, taxa_falha=1.0),
+                                          tentativas=1, max_por_segundo=None)
+    assert [registro["Ticker"] for registro in stock_info] == ["PETR4"]
+    assert stock_info[0]["Setor"] == "Energy"
+    assert cache.expirados(["PETR4", "VALE3"]) == ["PETR4", "VALE3"]
+
+    stock_info = cache.atualizarMetadados(["PETR4", "VALE3"], backend=FakeBackend(latencia=0),
+                                          max_por_segundo=None)
+    assert [registro["Setor"] for registro in stock_info] == ["Industrials", "Industrials"]
+    assert cache.expirados(["PETR4", "VALE3"]) == []
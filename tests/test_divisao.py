@@ -0,0 +1,70 @@
+"""Dobras walk-forward: faixas iguais à seleção direta por data e purga respeitada."""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from b3analise.divisao import COLUNA_DATA, DivisaoTemporal, datasFinalDf
+
+
+@pytest.fixture
+def datas(stock_price):
+    # mesma disposição do final_df: blocos de tickers, cada um ordenado por data
+    return stock_price.reset_index().sort_values(["Ticker", "Date"])["Date"].to_numpy()
+
+
+@pytest.mark.parametrize("modo, purga, embargo", [("expansivo", 1, 0), ("deslizante", 3, 0),
+                                                  ("purgado", 2, 5)])
+def test_dobras_iguais_a_selecao_por_data(datas, modo, purga, embargo):
+    divisao = DivisaoTemporal(n_dobras=4, modo=modo, purga=purga, embargo=embargo)
+    calendario = np.unique(datas)
+    posicao = np.searchsorted(calendario, datas)
+    intervalos = divisao.intervalos(len(calendario))
+
+    dobras = list(divisao.dividir(datas))
+    assert len(dobras) == 4
+    for dobra, (treino, (inicio_teste, fim_teste)) in zip(dobras, intervalos):
+        teste = dobra.teste.mascara(len(datas))
+        np.testing.assert_array_equal(teste, (posicao >= inicio_teste) & (posicao < fim_teste))
+        esperado = np.zeros(len(datas), dtype=bool)
+        for inicio, fim in treino:
+            esperado |= (posicao >= inicio) & (posicao < fim)
+        treino_mascara = dobra.treino.mascara(len(datas))
+        np.testing.assert_array_equal(treino_mascara, esperado)
+        np.testing.assert_array_equal(np.sort(dobra.treino.indices()), np.flatnonzero(esperado))
+
+        # nenhum pregão de treino a menos de ``purga`` antes ou ``embargo`` depois do teste
+        dias_treino = posicao[treino_mascara]
+        assert not (teste & treino_mascara).any()
+        assert not ((dias_treino >= inicio_teste - purga) & (dias_treino < fim_teste + embargo)).any()
+        if modo != "purgado":
+            assert dias_treino.max() == inicio_teste - purga - 1
+
+
+def test_pregoes_insuficientes():
+    with pytest.raises(ValueError):
+        list(DivisaoTemporal(n_dobras=5).dividir(np.arange(4, dtype=np.int32)))
+
+
+def test_visoes_sem_copia(stock_price, tmp_path):
+    # final_df gravado em Parquet: as datas lidas do arquivo dão as mesmas dobras
+    final_df = stock_price.reset_index().sort_values(["Ticker", "Date"], ignore_index=True) \
+        .rename(columns={"Date": COLUNA_DATA})[["Ticker", COLUNA_DATA, "Close"]]
+    final_df.to_parquet(tmp_path / "final_df.parquet", index=False)
+    datas = datasFinalDf(str(tmp_path / "final_df.parquet"))
+    linhas = np.arange(len(final_df), dtype=np.int64)
+
+    dobra = list(DivisaoTemporal(n_dobras=3, modo="purgado", purga=2, embargo=2).dividir(datas))[1]
+    indices = dobra.treino.indices()
+    assert len(dobra.treino.fatias()) > 1
+
+    # ndarray: visões do mesmo buffer
+    visoes = dobra.treino.visoes(linhas)
+    assert all(np.shares_memory(visao, linhas) for visao in visoes)
+    np.testing.assert_array_equal(np.concatenate(visoes), indices)
+    # DataFrame e pyarrow.Table: as mesmas linhas, na ordem das faixas
+    pd.testing.assert_frame_equal(pd.concat(dobra.treino.visoes(final_df)), final_df.iloc[indices])
+    tabela = pa.Table.from_pandas(final_df, preserve_index=False)
+    juntas = pa.concat_tables(dobra.treino.visoes(tabela))
+    assert juntas.equals(tabela.take(pa.array(indices)))
@@ -0,0 +1,75 @@
+"""Estatísticas descritivas contra o cálculo coluna a coluna do pandas."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from b3analise.armazenamento import DatasetPrecos
+from b3analise.cli import main
+from b3analise.estatisticas import (EsbocoEstatisticas, calcularEstatisticas, calcularEstatisticasPorGrupo,
+                                    calcularEstatisticasAproximadas)
+
+
+COLUNAS = ["Open", "Close", "Volume"]
+
+
+@pytest.fixture
+def precos(stock_price):
+    # alguns ausentes e valores repetidos, para a contagem e a moda
+    precos = stock_price.reset_index(drop=True)[COLUNAS + ["Ticker"]].astype({"Open": np.float64})
+    precos.loc[::37, "Open"] = np.nan
+    precos["Close"] = precos["Close"].round(0)
+    return precos
+
+
+def _esperado(df, coluna):
+    serie = df[coluna].astype(np.float64)
+    return [serie.min(), serie.max(), serie.median(), serie.mode().iloc[0], serie.mean(), serie.std(),
+            serie.isnull().sum()]
+
+
+def test_estatisticas_iguais_ao_pandas(precos):
+    estatisticas = calcularEstatisticas(precos, COLUNAS)
+    for coluna in COLUNAS:
+        np.testing.assert_allclose(estatisticas.loc[coluna].to_numpy(dtype=np.float64),
+                                   _esperado(precos, coluna), rtol=1e-9)
+
+
+def test_estatisticas_por_grupo(precos):
+    estatisticas = calcularEstatisticasPorGrupo(precos, ["Open", "Close"], por="Ticker")
+    for (ticker, coluna), linha in estatisticas.iterrows():
+        grupo = precos[precos["Ticker"] == ticker]
+        np.testing.assert_allclose(linha.to_numpy(dtype=np.float64), _esperado(grupo, coluna), rtol=1e-9)
+
+
+def test_esboco_por_blocos(precos):
+    blocos = [precos.iloc[i:i + 300] for i in range(0, len(precos), 300)]
+    # amostra maior que a base: mediana exata; momentos sempre exatos
+    aproximadas = calcularEstatisticasAproximadas(blocos, COLUNAS, tamanho_amostra=len(precos), casas_decimais=6)
+    exatas = calcularEstatisticas(precos, COLUNAS)
+    colunas = ["Mínimo", "Máximo", "Mediana", "Média", "Desvio Padrão", "Ausentes"]
+    np.testing.assert_allclose(aproximadas[colunas].to_numpy(dtype=np.float64),
+                               exatas[colunas].to_numpy(dtype=np.float64), rtol=1e-6)
+    assert aproximadas.loc["Close", "Moda"] == exatas.loc["Close", "Moda"]
+
+
+def test_esboco_sem_valor_frequente():
+    # 100 valores distintos e só 10 contadores: Misra-Gries zera todos
+    esboco = EsbocoEstatisticas(["x"], k_moda=10)
+    esboco.atualizar(pd.DataFrame({"x": np.arange(100, dtype=np.float64)}))
+    moda = esboco.resultado().loc["x", "Moda"]
+    assert 0 <= moda < 100
+
+    # um valor que domina a base sobrevive aos descontos
+    esboco.atualizar(pd.DataFrame({"x": np.full(500, 7.0)}))
+    esboco.atualizar(pd.DataFrame({"x": np.arange(100, 300, dtype=np.float64)}))
+    assert esboco.resultado().loc["x", "Moda"] == 7.0
+
+
+def test_etapa_stats_aproximada(stock_price, tmp_path):
+    DatasetPrecos(str(tmp_path / "precos")).salvar(stock_price)
+    main(["stats", "--dados", str(tmp_path), "--aproximado", "--colunas", "Close", "Volume"])
+    lidas = pd.read_csv(tmp_path / "estatisticas.csv", index_col=0)
+    exatas = calcularEstatisticas(stock_price, ["Close", "Volume"])
+    np.testing.assert_allclose(lidas[["Mínimo", "Máximo", "Média"]].to_numpy(),
+                               exatas[["Mínimo", "Máximo", "Média"]].to_numpy(), rtol=1e-6)
@@ -0,0 +1,119 @@
+"""Atualização incremental: o resultado tem de ser o mesmo do recálculo completo."""
+
+import numpy as np
+import pandas as pd
+
+from b3analise.agregados import RollupSetores
+from b3analise.armazenamento import DatasetPrecos
+from b3analise.cache import CacheMercado
+from b3analise.incremental import AtualizacaoIncremental
+from b3analise.preprocessamento import PipelinePreprocessamento, blocosPorTicker
+from b3analise.validacao import ValidadorPrecos
+
+
+def _montarBase(gerador, stock_info_df, diretorio, corte, cache=None):
+    # Base inicial até ``corte``, como o build do CLI a deixaria; com ``cache``
+    # a base é semeada do cache existente, que pode já ter dias posteriores
+    inicio = gerador.datas[0].strftime("%Y-%m-%d")
+    if cache is None:
+        cache = CacheMercado(str(diretorio / "cache"))
+        stock_price, _ = cache.baixarFaltantes(gerador.tickers, downloader=gerador,
+                                               start_date=inicio, end_date=corte)
+    else:
+        stock_price = cache.carregarPrecos(start_date=inicio, end_date=pd.Timestamp(corte) - pd.Timedelta(days=1))
+    dataset_precos = DatasetPrecos(str(diretorio / "dados" / "precos"))
+    dataset_precos.salvar(stock_price)
+    rollup = RollupSetores(stock_info_df).construir(stock_price)
+    pipeline = PipelinePreprocessamento(stock_info_df, indicadores=True)
+    pipeline.executar(lambda: blocosPorTicker(dataset_precos, tickers_por_bloco=5),
+                      str(diretorio / "dados" / "final_df.parquet"))
+    atualizacao = AtualizacaoIncremental(cache, dataset_precos, rollup, pipeline,
+                                         diretorio=str(diretorio / "dados"), tickers_por_bloco=5)
+    return atualizacao, inicio
+
+
+def _conferirRecalculo(atualizacao):
+    # recálculo completo com o mesmo pipeline ajustado, sobre todos os pregões gravados
+    incremental = atualizacao.lerFeatures()
+    pipeline = atualizacao.pipeline
+    completo = pd.concat(pipeline.transformar(blocosPorTicker(atualizacao.dataset_precos, tickers_por_bloco=5)),
+                         ignore_index=True)
+    colunas = [f"Ticker_{categoria}" for categoria in pipeline.encoder.categories_[0]]
+    completo.insert(0, "Ticker", np.asarray(pipeline.encoder.categories_[0], dtype=object)[
+        completo[colunas].to_numpy().argmax(axis=1)])
+    completo = completo.sort_values(["Ticker", "Data Negociacao B3"], ignore_index=True)
+
+    assert list(incremental.columns) == list(completo.columns)
+    pd.testing.assert_frame_equal(incremental, completo, check_dtype=False, rtol=1e-9, atol=1e-9)
+    return completo
+
+
+def test_incremento_igual_ao_recalculo(gerador, stock_info_df, tmp_path):
+    corte = gerador.datas[-40].strftime("%Y-%m-%d")
+    atualizacao, inicio = _montarBase(gerador, stock_info_df, tmp_path, corte)
+
+    # dois pregões de cada vez, para que incrementos substituam linhas de incrementos
+    for data in gerador.datas[-39::2]:
+        relatorio = atualizacao.atualizar(gerador.tickers, downloader=gerador, start_date=inicio,
+                                          end_date=data.strftime("%Y-%m-%d"))
+        assert not relatorio["reajuste"]
+
+    # só ficam de fora os pregões dos tickers listados depois do corte, que
+    # ainda não têm o histórico mínimo (como na validação da base inteira);
+    # revalidados a cada atualização, aparecem uma vez só na quarentena
+    tamanhos = gerador.ultimo - gerador.primeiro + 1
+    jovens = (gerador.primeiro > len(gerador.datas) - 40) & (tamanhos < atualizacao.validador.min_pregoes)
+    assert jovens.any()
+    quarentena = pd.read_parquet(atualizacao.arquivo_quarentena)
+    assert len(quarentena) == tamanhos[jovens].sum()
+    assert not quarentena.duplicated(["Ticker", "Date"]).any()
+
+    completo = _conferirRecalculo(atualizacao)
+    assert len(completo) == tamanhos[~jovens].sum()
+
+
+def test_retomada_com_cache_adiantado(gerador, stock_info_df, tmp_path):
+    # o cache já tem pregões posteriores à base: eles entram no dataset na
+    # próxima atualização, mesmo sem nada novo para baixar
+    corte = gerador.datas[-40].strftime("%Y-%m-%d")
+    primeira, inicio = _montarBase(gerador, stock_info_df, tmp_path / "primeira", corte)
+    primeira.atualizar(gerador.tickers, downloader=gerador, start_date=inicio,
+                       end_date=gerador.datas[-20].strftime("%Y-%m-%d"))
+
+    retomada, _ = _montarBase(gerador, stock_info_df, tmp_path / "retomada", corte, cache=primeira.cache)
+    base = set(retomada.dataset_precos.ultimasDatas())
+    fim = gerador.datas[-10]
+    relatorio = retomada.atualizar(gerador.tickers, downloader=gerador, start_date=inicio,
+                                   end_date=fim.strftime("%Y-%m-%d"))
+    assert relatorio["linhas_pendentes"] > relatorio["linhas_novas"]
+
+    gravadas = retomada.dataset_precos.carregar().astype({"Ticker": str})
+    esperadas = primeira.cache.carregarPrecos(sorted(base), end_date=fim).reset_index()
+    chaves = ["Ticker", "Date"]
+    pd.testing.assert_frame_equal(
+        gravadas[chaves].sort_values(chaves, ignore_index=True),
+        esperadas.astype({"Ticker": str})[chaves].sort_values(chaves, ignore_index=True))
+    _conferirRecalculo(retomada)
+
+
+def test_ticker_novo_sai_da_quarentena(gerador, stock_info_df, tmp_path):
+    # com histórico mínimo de 20 pregões, o ticker listado depois do corte fica
+    # em quarentena nas primeiras atualizações e entra inteiro quando completa 20
+    corte = gerador.datas[-40].strftime("%Y-%m-%d")
+    atualizacao, inicio = _montarBase(gerador, stock_info_df, tmp_path, corte)
+    atualizacao.validador = ValidadorPrecos(stock_info_df, min_pregoes=20)
+    novos = [ticker for ticker, primeiro in zip(gerador.tickers, gerador.primeiro)
+             if primeiro > len(gerador.datas) - 40]
+    assert novos
+
+    quarentenas = []
+    for data in gerador.datas[-39::4]:
+        relatorio = atualizacao.atualizar(gerador.tickers, downloader=gerador, start_date=inicio,
+                                          end_date=data.strftime("%Y-%m-%d"))
+        quarentenas.append(relatorio["linhas_quarentena"])
+    assert max(quarentenas) > 0 and quarentenas[-1] == 0
+
+    gravadas = atualizacao.dataset_precos.carregar(tickers=novos)
+    assert len(gravadas) == len(atualizacao.cache.carregarPrecos(novos))
+    assert pd.read_parquet(atualizacao.arquivo_quarentena).empty
+    _conferirRecalculo(atualizacao)
@@ -0,0 +1,60 @@
+"""Indicadores por ticker contra ``groupby().rolling()`` do pandas."""
+
+import numpy as np
+import pandas as pd
+
+from b3analise.indicadores import MotorIndicadores
+
+
+def _embaralhado(stock_price):
+    # linhas fora de ordem e com o índice trocado: o motor deve reordenar
+    dados = stock_price.reset_index().sample(frac=1.0, random_state=3)
+    return dados.set_index(pd.RangeIndex(len(dados))[::-1])
+
+
+def test_janelas_iguais_ao_groupby_rolling(stock_price):
+    dados = _embaralhado(stock_price)
+    indicadores = MotorIndicadores(dados).calcular(janelas_media=(5, 20), janela_vol=10, janela_volume=20,
+                                                   lags=(1, 5))
+
+    ordenados = dados.sort_values(["Ticker", "Date"]).astype({"Close": np.float64, "Volume": np.float64})
+    grupos = ordenados.groupby("Ticker", observed=True)
+    log_retorno = np.log(ordenados["Close"] / grupos["Close"].shift(1))
+    esperado = pd.DataFrame({
+        "mm_5": grupos["Close"].rolling(5).mean().droplevel(0),
+        "mm_20": grupos["Close"].rolling(20).mean().droplevel(0),
+        "vol_10": log_retorno.groupby(ordenados["Ticker"], observed=True).rolling(10).std().droplevel(0),
+        "close_lag_1": grupos["Close"].shift(1),
+        "close_lag_5": grupos["Close"].shift(5)
+    }).reindex(dados.index)
+    media_volume = grupos["Volume"].rolling(20).mean().droplevel(0)
+    desvio_volume = grupos["Volume"].rolling(20).std().droplevel(0)
+    esperado["volume_z_20"] = ((ordenados["Volume"] - media_volume) / desvio_volume).reindex(dados.index)
+
+    for coluna in esperado.columns:
+        np.testing.assert_allclose(indicadores[coluna].to_numpy(), esperado[coluna].to_numpy(),
+                                   rtol=1e-7, atol=1e-9, err_msg=coluna)
+    # a primeira janela de cada ticker fica vazia, sem herdar o ticker anterior
+    primeiros = ordenados.groupby("Ticker", observed=True).head(4).index
+    assert indicadores.loc[primeiros, "mm_5"].isna().all()
+
+
+def test_rsi_e_alvos_separados(stock_price):
+    dados = stock_price.reset_index()
+    indicadores = MotorIndicadores(dados).calcular(janela_rsi=14)
+    ordenados = dados.sort_values(["Ticker", "Date"])
+    variacao = ordenados.groupby("Ticker", observed=True)["Close"].diff().astype(np.float64)
+    grupos = variacao.groupby(ordenados["Ticker"], observed=True)
+    altas = grupos.transform(lambda serie: serie.clip(lower=0).rolling(14).sum())
+    baixas = grupos.transform(lambda serie: (-serie).clip(lower=0).rolling(14).sum())
+    np.testing.assert_allclose(indicadores["rsi_14"], (100 * altas / (altas + baixas)).reindex(dados.index),
+                               rtol=1e-7)
+
+    # os alvos do MotorRotulos não colidem com as features e olham para frente
+    from b3analise.rotulos import MotorRotulos
+
+    alvos = MotorRotulos(dados, coluna_data="Date").gerar(horizontes=(1,), coluna="Close")
+    assert not set(alvos.columns) & set(indicadores.columns)
+    close = ordenados["Close"].astype(np.float64)
+    proximo = close.groupby(ordenados["Ticker"], observed=True).shift(-1)
+    np.testing.assert_allclose(alvos["retorno_futuro_1d"], (proximo / close - 1).reindex(dados.index), rtol=1e-9)
@@ -0,0 +1,76 @@
+"""Chaves do ``CacheAnalises``: dados, parâmetros e código; acertos em disco e poda."""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from b3analise.armazenamento import DatasetPrecos
+from b3analise.memoizacao import CacheAnalises, impressaoDigital, versaoCodigo
+
+
+def _mediaPorTicker(stock_price, coluna="Close"):
+    return stock_price.groupby("Ticker", observed=True)[coluna].mean()
+
+
+def test_chave_muda_com_dados_parametros_e_codigo(stock_price):
+    cache = CacheAnalises()
+    chave = cache.chave("media", _mediaPorTicker, [stock_price], {"coluna": "Close"})
+    assert chave == CacheAnalises().chave("media", _mediaPorTicker, [stock_price.copy()], {"coluna": "Close"})
+
+    alterado = stock_price.copy()
+    alterado.iloc[0, alterado.columns.get_loc("Close")] += 1
+    assert cache.chave("media", _mediaPorTicker, [alterado], {"coluna": "Close"}) != chave
+    assert cache.chave("media", _mediaPorTicker, [stock_price], {"coluna": "Open"}) != chave
+    outra_versao = CacheAnalises(versao_codigo="outra")
+    assert outra_versao.chave("media", _mediaPorTicker, [stock_price], {"coluna": "Close"}) != chave
+
+
+def test_versao_codigo_acompanha_os_fontes(tmp_path):
+    (tmp_path / "modulo.py").write_text("VALOR = 1\n")
+    (tmp_path / "notas.txt").write_text("fora da versão\n")
+    antes = versaoCodigo(str(tmp_path))
+    (tmp_path / "notas.txt").write_text("mudou\n")
+    versaoCodigo.cache_clear()
+    assert versaoCodigo(str(tmp_path)) == antes
+    (tmp_path / "modulo.py").write_text("VALOR = 2\n")
+    versaoCodigo.cache_clear()
+    assert versaoCodigo(str(tmp_path)) != antes
+    assert CacheAnalises().versao_codigo == versaoCodigo()
+
+
+def test_versao_do_dataset(stock_price, tmp_path):
+    # a versão do dataset vem dos arquivos e muda quando uma partição é regravada
+    dataset_precos = DatasetPrecos(str(tmp_path / "precos"))
+    dataset_precos.salvar(stock_price)
+    antes = impressaoDigital(dataset_precos)
+    assert impressaoDigital(dataset_precos) == antes
+    novas = stock_price.iloc[-3:].reset_index()
+    novas["Date"] += pd.Timedelta(days=7)
+    dataset_precos.acrescentar(novas)
+    assert impressaoDigital(dataset_precos) != antes
+
+
+def test_acertos_em_disco_e_poda(stock_price, tmp_path):
+    cache = CacheAnalises(diretorio=str(tmp_path))
+    esperado = _mediaPorTicker(stock_price)
+    resultado = cache.obter("media", _mediaPorTicker, stock_price)
+    pd.testing.assert_series_equal(resultado, esperado)
+    # alterar o que foi devolvido não altera o cache
+    resultado.iloc[:] = np.nan
+    pd.testing.assert_series_equal(cache.obter("media", _mediaPorTicker, stock_price), esperado)
+    assert cache.estatisticas["calculos"] == 1 and cache.estatisticas["acertos_memoria"] == 1
+
+    # nova sessão: lê do disco sem recalcular
+    nova = CacheAnalises(diretorio=str(tmp_path))
+    pd.testing.assert_series_equal(nova.obter("media", _mediaPorTicker, stock_price), esperado)
+    assert nova.estatisticas == {**nova.estatisticas, "acertos_disco": 1, "calculos": 0}
+
+    # acima do limite de bytes saem os arquivos usados há mais tempo
+    nova.obter("media", _mediaPorTicker, stock_price, coluna="Open")
+    arquivos = sorted(tmp_path.glob("*.pkl"), key=os.path.getmtime)
+    assert len(arquivos) == 2
+    os.utime(arquivos[0], (1, 1))
+    limitado = CacheAnalises(diretorio=str(tmp_path), max_bytes_disco=os.path.getsize(arquivos[1]))
+    assert limitado.estatisticas["descartes_disco"] == 1
+    assert [arquivo.name for arquivo in tmp_path.glob("*.pkl")] == [arquivos[1].name]
@@ -0,0 +1,68 @@
+"""Painel ticker × pregão e motor de correlação contra pivot/corr/cov do pandas."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from b3analise.painel import MotorCorrelacao, PainelPrecos
+
+
+@pytest.fixture
+def painel(stock_price, stock_info_df):
+    return PainelPrecos.deStockPrice(stock_price, stock_info_df)
+
+
+@pytest.fixture
+def pivot(stock_price):
+    return stock_price.reset_index().astype({"Ticker": str}).pivot_table(
+        index="Date", columns="Ticker", values="Close", observed=True).astype(np.float64)
+
+
+def test_painel_igual_ao_pivot(painel, pivot):
+    close = painel.paraDataFrame("Close").T
+    assert close.index.equals(pivot.index.rename("Date"))
+    assert close.columns.tolist() == pivot.columns.tolist()
+    np.testing.assert_array_equal(close.to_numpy(dtype=np.float64), pivot.to_numpy())
+    assert painel.negociado.sum() == pivot.notna().to_numpy().sum()
+
+    retornos = pivot.pct_change(fill_method=None).to_numpy().T
+    np.testing.assert_allclose(painel.retornos(), retornos, rtol=1e-5, atol=1e-7)
+
+
+def test_correlacao_covariancia_pairwise(painel):
+    # blocos menores que o número de tickers exercitam a montagem por faixas
+    motor = MotorCorrelacao(painel, min_periodos=20, tamanho_bloco=5)
+    retornos = pd.DataFrame(motor.retornos.T.astype(np.float64), columns=painel.tickers)
+    pd.testing.assert_frame_equal(motor.correlacaoTickers(), retornos.corr(min_periods=20),
+                                  check_names=False, rtol=1e-6, atol=1e-9)
+    pd.testing.assert_frame_equal(motor.covarianciaTickers(), retornos.cov(min_periods=20),
+                                  check_names=False, rtol=1e-6, atol=1e-12)
+
+
+def test_setores_e_betas(painel, stock_info_df):
+    motor = MotorCorrelacao(painel, tamanho_bloco=5)
+    retornos = pd.DataFrame(motor.retornos.T.astype(np.float64), index=painel.datas, columns=painel.tickers)
+    setores = stock_info_df.astype({"Ticker": str, "Setor": str}).set_index("Ticker")["Setor"]
+    esperado = retornos.T.groupby(setores.reindex(painel.tickers).to_numpy()).mean().T
+    por_setor = motor.retornosSetores()
+    np.testing.assert_allclose(por_setor.T[esperado.columns].to_numpy(dtype=np.float64), esperado.to_numpy(),
+                               rtol=1e-5, atol=1e-7)
+    pd.testing.assert_frame_equal(motor.correlacaoSetores(),
+                                  por_setor.T.astype(np.float64).corr(min_periods=20),
+                                  check_names=False, rtol=1e-6, atol=1e-9)
+
+    # beta de referência: regressão em cada janela, só com os pregões em comum
+    janela = 30
+    betas = motor.betasMoveis(janela)
+    x_setor = por_setor.to_numpy(dtype=np.float64)
+    for linha, ticker in enumerate(painel.tickers[:4]):
+        x = x_setor[painel.setores.codes[linha]]
+        y = retornos[ticker].to_numpy()
+        for t in range(0, len(y), 7):
+            xs, ys = x[max(0, t - janela + 1):t + 1], y[max(0, t - janela + 1):t + 1]
+            comum = ~(np.isnan(xs) | np.isnan(ys))
+            if comum.sum() < janela // 2:
+                assert np.isnan(betas.iloc[linha, t])
+                continue
+            esperado_beta = np.cov(xs[comum], ys[comum])[0, 1] / np.var(xs[comum], ddof=1)
+            np.testing.assert_allclose(betas.iloc[linha, t], esperado_beta, rtol=1e-4, atol=1e-5)
@@ -0,0 +1,27 @@
+"""Estágio paralelo contra o cálculo serial de rótulos e indicadores."""
+
+import numpy as np
+import pandas as pd
+
+from b3analise.indicadores import CONFIGURACAO_PADRAO
+from b3analise.paralelo import EstagioParalelo, transformacaoPadrao
+from b3analise.preprocessamento import PipelinePreprocessamento, blocosDeDataFrame
+
+
+def test_estagio_igual_ao_serial(stock_price):
+    esperado = transformacaoPadrao(stock_price.reset_index().sort_values(["Ticker", "Date"]))
+    esperado = esperado.sort_index()
+    resultado = EstagioParalelo(max_workers=2, tickers_por_tarefa=3).executar(stock_price)
+    pd.testing.assert_index_equal(resultado.index, stock_price.index)
+    np.testing.assert_allclose(resultado[esperado.columns].to_numpy(dtype=np.float64),
+                               esperado.to_numpy(dtype=np.float64), rtol=1e-9, equal_nan=True)
+
+
+def test_pipeline_com_processos(stock_price, stock_info_df):
+    blocos = lambda: blocosDeDataFrame(stock_price, 6)
+    serial = PipelinePreprocessamento(stock_info_df, indicadores=CONFIGURACAO_PADRAO)
+    paralelo = PipelinePreprocessamento(stock_info_df, indicadores=CONFIGURACAO_PADRAO, processos=2)
+    esperado = pd.concat(serial.ajustar(blocos()).transformar(blocos()), ignore_index=True)
+    final_df = pd.concat(paralelo.ajustar(blocos()).transformar(blocos()), ignore_index=True)
+    assert final_df.columns.tolist() == esperado.columns.tolist()
+    pd.testing.assert_frame_equal(final_df, esperado, check_exact=False, rtol=1e-9)
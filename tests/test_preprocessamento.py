@@ -0,0 +1,79 @@
+"""Matriz de treino esparsa/memmap igual ao ``final_df`` denso, com categorias novas."""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from b3analise.preprocessamento import PipelinePreprocessamento, blocosDeDataFrame, exportarMatrizTreino
+
+
+@pytest.fixture
+def base(stock_price, stock_info_df):
+    # um ticker com uma indústria que não existe nos tickers do ajuste
+    stock_info_df = stock_info_df.astype({"Indústria": str, "Setor": str})
+    tickers = sorted(map(str, stock_price["Ticker"].unique()))
+    stock_info_df.loc[stock_info_df["Ticker"] == tickers[-1], "Indústria"] = "Indústria nova"
+    ajuste = stock_price[stock_price["Ticker"].astype(str).isin(tickers[:-3])]
+    return stock_price, stock_info_df, ajuste, set(tickers[-3:])
+
+
+def _denso(pipeline, stock_price):
+    # referência: o OneHotEncoder (handle_unknown="ignore") sobre o bloco inteiro
+    stock_data = pipeline.prepararBloco(stock_price)
+    numerico = np.column_stack([pipeline.scaler.transform(stock_data[pipeline.colunas_numericas]),
+                                pipeline.codigosLabel(stock_data)])
+    one_hot = pipeline.encoder.transform(stock_data[pipeline.colunas_one_hot])
+    return stock_data, np.hstack([numerico, one_hot]), stock_data["resultado"].to_numpy()
+
+
+def test_npz_com_categorias_novas(base, tmp_path):
+    stock_price, stock_info_df, ajuste, novos = base
+    pipeline = PipelinePreprocessamento(stock_info_df).ajustar(blocosDeDataFrame(ajuste, 4))
+    assert "Indústria nova" not in pipeline.label_encoder.classes_
+
+    # um bloco só, para comparar na mesma ordem de linhas da referência
+    metadados = exportarMatrizTreino(pipeline, lambda: [stock_price], str(tmp_path), formato="npz")
+    X = sp.load_npz(tmp_path / "X_00000.npz").toarray()
+    y = np.load(tmp_path / "y_00000.npy")
+    stock_data, esperado, y_esperado = _denso(pipeline, stock_price)
+    assert X.shape == (metadados["linhas"], len(metadados["features"]))
+    np.testing.assert_allclose(X, esperado, rtol=1e-6, atol=1e-6)
+    np.testing.assert_array_equal(y, y_esperado)
+
+    # tickers novos: nenhuma coluna de Ticker ativa; indústria nova: código -1
+    colunas_ticker = [i for i, nome in enumerate(metadados["features"]) if nome.startswith("Ticker_")]
+    de_novos = stock_data["Ticker"].astype(str).isin(novos).to_numpy()
+    assert (X[de_novos][:, colunas_ticker] == 0).all()
+    assert (X[~de_novos][:, colunas_ticker].sum(axis=1) == 1).all()
+    industria = metadados["features"].index(pipeline.coluna_label)
+    assert (X[:, industria][(stock_data["Indústria"] == "Indústria nova").to_numpy()] == -1).all()
+
+
+def test_memmap_igual_ao_npz(base, tmp_path):
+    stock_price, stock_info_df, ajuste, novos = base
+    pipeline = PipelinePreprocessamento(stock_info_df).ajustar(blocosDeDataFrame(ajuste, 4))
+    gerar_blocos = lambda: blocosDeDataFrame(stock_price, 5)
+    exportarMatrizTreino(pipeline, gerar_blocos, str(tmp_path / "npz"), formato="npz")
+    metadados = exportarMatrizTreino(pipeline, gerar_blocos, str(tmp_path / "memmap"), formato="memmap")
+    with open(tmp_path / "memmap" / "metadados.json", encoding="utf-8") as arquivo:
+        assert json.load(arquivo)["formas"] == metadados["formas"]
+
+    n = metadados["linhas"]
+    numerico = np.memmap(tmp_path / "memmap" / "X_numerico.f32", dtype=np.float32, mode="r",
+                         shape=tuple(metadados["formas"]["X_numerico"]))
+    codigos = np.memmap(tmp_path / "memmap" / "X_codigos.i32", dtype=np.int32, mode="r", shape=(n, 2))
+    X = sp.vstack([sp.load_npz(caminho) for caminho in sorted((tmp_path / "npz").glob("X_*.npz"))]).toarray()
+    np.testing.assert_array_equal(X[:, :numerico.shape[1]], numerico)
+
+    # os códigos reconstroem o one-hot do npz; -1 onde não há coluna ativa
+    tamanhos = [len(categorias) for categorias in pipeline.encoder.categories_]
+    inicio = numerico.shape[1]
+    for j, tamanho in enumerate(tamanhos):
+        bloco = X[:, inicio:inicio + tamanho]
+        esperado = np.where(bloco.any(axis=1), bloco.argmax(axis=1), -1)
+        np.testing.assert_array_equal(codigos[:, j], esperado)
+        inicio += tamanho
+    assert (codigos[:, 0] == -1).sum() == pd.Series(stock_price["Ticker"].astype(str)).isin(novos).sum()
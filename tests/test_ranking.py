@@ -0,0 +1,55 @@
+"""Rankings de crescimento contra ``sort_values().head()`` sobre a tabela inteira."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from b3analise.agregados import RollupSetores
+from b3analise.ranking import RankingCrescimento
+
+
+@pytest.fixture
+def ranking(stock_price, stock_info_df):
+    return RankingCrescimento(RollupSetores(stock_info_df).construir(stock_price))
+
+
+def _crescimentoJanela(stock_price, stock_info_df, inicio=None, fim=None):
+    # referência: primeiro e último Close de cada ticker dentro da janela
+    dados = stock_price.reset_index().astype({"Ticker": str})
+    if inicio is not None:
+        dados = dados[dados["Date"] >= inicio]
+    if fim is not None:
+        dados = dados[dados["Date"] <= fim]
+    grupos = dados.sort_values("Date").groupby("Ticker")["Close"]
+    tabela = pd.DataFrame({"preco_inicio": grupos.first(), "preco_fim": grupos.last()}).astype(np.float64)
+    tabela["Crescimento"] = tabela["preco_fim"] - tabela["preco_inicio"]
+    tabela["Crescimento (%)"] = (tabela["preco_fim"] / tabela["preco_inicio"] - 1) * 100
+    setores = stock_info_df.astype({"Ticker": str, "Setor": str}).set_index("Ticker")["Setor"]
+    return tabela.join(setores)
+
+
+@pytest.mark.parametrize("metrica, maiores", [("absoluto", True), ("percentual", True), ("percentual", False)])
+def test_top_igual_a_ordenacao(ranking, stock_price, stock_info_df, metrica, maiores):
+    inicio, fim = stock_price.index.min() + pd.Timedelta(days=40), stock_price.index.max() - pd.Timedelta(days=30)
+    esperado = _crescimentoJanela(stock_price, stock_info_df, inicio, fim)
+    coluna = "Crescimento" if metrica == "absoluto" else "Crescimento (%)"
+    ordenado = esperado.sort_values(coluna, ascending=not maiores, kind="stable")
+
+    top = ranking.top(5, metrica=metrica, maiores=maiores, inicio=inicio, fim=fim)
+    assert top["Ticker"].tolist() == ordenado.index[:5].tolist()
+    np.testing.assert_allclose(top[coluna], ordenado[coluna].iloc[:5], rtol=1e-6)
+
+    por_setor = ranking.topPorSetor(2, metrica=metrica, maiores=maiores, inicio=inicio, fim=fim)
+    # setores na ordem do seu melhor ticker, cada um com os seus 2 primeiros
+    esperado_setor = ordenado.groupby("Setor", sort=False).head(2)
+    ordem_setor = {setor: i for i, setor in enumerate(esperado_setor["Setor"].unique())}
+    esperado_setor = esperado_setor.sort_values("Setor", key=lambda setor: setor.map(ordem_setor), kind="stable")
+    assert por_setor["Ticker"].tolist() == esperado_setor.index.tolist()
+
+
+def test_janela_sem_pregoes(ranking, stock_price):
+    # tickers sem pregões na janela ficam NaN e fora do ranking
+    depois = stock_price.index.max() + pd.Timedelta(days=5)
+    tabela = ranking.crescimento(depois, depois + pd.Timedelta(days=10))
+    assert tabela["Crescimento"].isna().all()
+    assert ranking.top(5, inicio=depois, fim=depois + pd.Timedelta(days=10)).empty
@@ -0,0 +1,47 @@
+"""Rótulos de retorno futuro por ticker contra ``groupby().shift`` do pandas."""
+
+import numpy as np
+import pandas as pd
+
+from b3analise.rotulos import MotorRotulos, blocosContiguos
+
+
+def _embaralhado(stock_price):
+    # linhas fora de ordem e com o índice trocado: o motor deve reordenar
+    dados = stock_price.reset_index().sample(frac=1.0, random_state=3)
+    return dados.set_index(pd.RangeIndex(len(dados))[::-1])
+
+
+def test_rotulos_nao_cruzam_tickers(stock_price):
+    dados = _embaralhado(stock_price)
+    motor = MotorRotulos(dados, coluna_data="Date")
+
+    ordenados = dados.sort_values(["Ticker", "Date"])
+    futuro = ordenados.groupby("Ticker", observed=True)["Adj Close"].shift(-3)
+    esperado = (futuro.astype(np.float64) / ordenados["Adj Close"].astype(np.float64) - 1).reindex(dados.index)
+
+    np.testing.assert_allclose(motor.retornoFuturo(3), esperado.to_numpy(), rtol=1e-12)
+    rotulo = motor.rotulo(horizonte=3, sem_futuro=-1)
+    assert (rotulo[esperado.isna().to_numpy()] == -1).all()
+    assert (rotulo == np.where(esperado.isna(), -1, esperado > 0)).all()
+    # o último pregão de cada ticker não tem futuro
+    ultimos = dados.groupby("Ticker", observed=True)["Date"].transform("max") == dados["Date"]
+    assert (motor.rotulo(horizonte=1, sem_futuro=-1)[ultimos.to_numpy()] == -1).all()
+
+
+def test_varios_horizontes_e_limiares(stock_price):
+    dados = _embaralhado(stock_price)
+    motor = MotorRotulos(dados, coluna_data="Date")
+    gerado = motor.gerar(horizontes=(1, 5), limiares=(0.0, 0.02))
+    assert list(gerado.columns) == ["retorno_futuro_1d", "resultado_1d_0", "resultado_1d_0.02",
+                                    "retorno_futuro_5d", "resultado_5d_0", "resultado_5d_0.02"]
+    assert gerado.index.equals(dados.index)
+    np.testing.assert_array_equal(gerado["resultado_5d_0.02"], motor.rotulo(horizonte=5, limiar=0.02))
+
+
+def test_blocos_contiguos(stock_price):
+    ordenados = stock_price.reset_index().sort_values(["Ticker", "Date"], ignore_index=True)
+    ordem, inicios, fins = blocosContiguos(ordenados, coluna_data="Date")
+    # base já em blocos: nenhuma reordenação
+    assert ordem is None
+    np.testing.assert_array_equal(fins - inicios, ordenados.groupby("Ticker", observed=True).size().to_numpy())
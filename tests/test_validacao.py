@@ -0,0 +1,82 @@
+"""Regras da validação e a validação de incrementos contra o histórico gravado."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from b3analise.validacao import MOTIVOS, ValidadorPrecos, descreverMotivos
+
+
+def _precos(ticker, n, inicio="2023-01-02", close=10.0):
+    datas = pd.bdate_range(inicio, periods=n)
+    fechamento = np.full(n, close)
+    return pd.DataFrame({"Date": datas, "Ticker": ticker, "Open": fechamento, "High": fechamento * 1.01,
+                         "Low": fechamento * 0.99, "Close": fechamento, "Adj Close": fechamento,
+                         "Volume": np.full(n, 1000.0)})
+
+
+@pytest.fixture
+def validador():
+    info = [{"Ticker": "AAAA3", "Setor": "Energia"}, {"Ticker": "BBBB4", "Setor": "N/A"},
+            {"Ticker": "CCCC3", "Setor": "Energia"}]
+    return ValidadorPrecos(info, min_pregoes=5)
+
+
+def test_motivos_por_regra(validador):
+    a = _precos("AAAA3", 10)
+    a.loc[1, "Open"] = np.nan
+    a.loc[2, "Adj Close"] = -4791500013568.0
+    a.loc[3, "Low"] = a.loc[3, "High"] * 1.1
+    # pico isolado: só o pico é marcado, não a volta ao preço normal
+    a.loc[5, ["Open", "High", "Low", "Close"]] *= 10
+    a = pd.concat([a, a.iloc[[8]]], ignore_index=True)
+    b = _precos("BBBB4", 10)
+    c = _precos("CCCC3", 3, inicio="2023-01-09")
+    # as linhas fora de ordem voltam alinhadas à entrada
+    base = pd.concat([a, b, c], ignore_index=True).sample(frac=1, random_state=0)
+
+    motivos = pd.Series(validador.motivos(base), index=base.index).sort_index()
+    assert motivos[1] == MOTIVOS["preco_ausente"]
+    assert motivos[2] == MOTIVOS["preco_nao_positivo"]
+    assert motivos[3] == MOTIVOS["ohlc_inconsistente"]
+    assert motivos[5] == MOTIVOS["salto_extremo"]
+    assert motivos[6] == 0
+    # a primeira das duas cópias na ordem da entrada fica
+    assert sorted([motivos[8], motivos[10]]) == [0, MOTIVOS["chave_duplicada"]]
+    assert (motivos.loc[11:20] == MOTIVOS["setor_ausente"]).all()
+    assert (motivos.loc[21:] == MOTIVOS["ticker_jovem"]).all()
+    assert descreverMotivos([MOTIVOS["preco_ausente"] | MOTIVOS["ticker_jovem"]])[0] == "preco_ausente|ticker_jovem"
+
+
+def test_deslistado(validador):
+    base = pd.concat([_precos("AAAA3", 40), _precos("CCCC3", 10)], ignore_index=True)
+    validos, quarentena, relatorio = validador.validar(base)
+    assert set(quarentena["Ticker"]) == {"CCCC3"}
+    assert (quarentena["motivo"] == "ticker_deslistado").all()
+    assert relatorio["linhas_quarentena"] == 10 and len(validos) == 40
+
+
+def test_incremento_contra_contexto(validador):
+    gravadas = _precos("AAAA3", 10)
+    novas = _precos("AAAA3", 3, inicio=gravadas["Date"].iloc[-1])
+    # o primeiro pregão novo repete o último gravado e o substitui; o segundo
+    # salta a partir do último Close gravado e o terceiro fica no mesmo nível
+    novas.loc[1:, ["Open", "High", "Low", "Close", "Adj Close"]] *= 3
+    validos, quarentena, _ = validador.validarIncremento(novas, gravadas.iloc[-1:])
+    assert quarentena["motivo"].tolist() == ["salto_extremo"]
+    assert quarentena["Date"].tolist() == [novas["Date"].iloc[1]]
+    assert validos["Date"].tolist() == novas["Date"].iloc[[0, 2]].tolist()
+
+
+def test_incremento_ticker_novo(validador):
+    # o histórico curto de um ticker novo é julgado sobre todas as linhas passadas
+    gravadas = _precos("AAAA3", 10)
+    poucas = _precos("CCCC3", 4, inicio="2023-01-10")
+    _, quarentena, _ = validador.validarIncremento(poucas, gravadas)
+    assert (quarentena["motivo"] == "ticker_jovem").all() and len(quarentena) == 4
+
+    validos, quarentena, _ = validador.validarIncremento(_precos("CCCC3", 5, inicio="2023-01-10"), gravadas)
+    assert len(validos) == 5 and quarentena.empty
+    # ticker com histórico gravado não volta a ser julgado pelo tamanho
+    validos, _, _ = validador.validarIncremento(_precos("AAAA3", 1, inicio="2023-01-16"), gravadas)
+    assert len(validos) == 1